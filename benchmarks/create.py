@@ -0,0 +1,286 @@
+'''End-to-end benchmark of 'nawah create --default-config', against local server of synthetic artifacts.
+
+Run from repo root:
+	python benchmarks/create.py [--runs 3] [--template-size 2M] [--wheel-size 8M] [--stubs-size 1M]
+		[--output create.json] [--compare earlier.json]
+
+Every run creates app in new process, once with empty cache (cold), and once with artifacts cached
+(warm), reporting wall time, time of every step, artifacts throughput, and peak RSS.
+'''
+
+from typing import Dict, List, Any
+
+import argparse, os, sys, io, json, time, shutil, random, statistics, subprocess, tempfile, tarfile, zipfile, threading, functools, http.server
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+from nawah_cli.cache import parse_size, format_size
+
+API_LEVEL = '1.0'
+
+# [DOC] Runs in child process, timing steps of 'create' by wrapping functions it calls
+CHILD_SCRIPT = '''
+import sys, json, time, functools, subprocess
+import nawah_cli.create
+
+timings_path = sys.argv[1]
+steps = {}
+
+windows = {}
+
+def timed(step, func):
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		start = time.perf_counter()
+		try:
+			return func(*args, **kwargs)
+		finally:
+			end = time.perf_counter()
+			# [DOC] Calls of step can overlap, so step time is from first call start to last call end
+			first, last = windows.get(step, (start, end))
+			windows[step] = (min(first, start), max(last, end))
+			steps[step] = windows[step][1] - windows[step][0]
+	return wrapper
+
+for step, func_name in [
+	('config', 'create_step_config'),
+	('artifacts', 'stream_artifact'),
+	('template', 'materialise_template'),
+	('requirements', 'install_requirements'),
+	('files', 'replace_file'),
+]:
+	setattr(nawah_cli.create, func_name, timed(step, getattr(nawah_cli.create, func_name)))
+subprocess_call, git_call = subprocess.call, timed('git', subprocess.call)
+subprocess.call = lambda command, **kwargs: (
+	git_call if command[0] == 'git' else subprocess_call
+)(command, **kwargs)
+
+sys.argv = ['nawah'] + sys.argv[2:]
+start = time.perf_counter()
+try:
+	from nawah_cli.cli import nawah_cli
+	nawah_cli()
+finally:
+	steps['total'] = time.perf_counter() - start
+	with open(timings_path, 'w') as timings_file:
+		timings_file.write(json.dumps(steps))
+'''
+
+
+class ArtifactsHandler(http.server.SimpleHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def log_message(self, format, *args):
+		pass
+
+
+def random_text(size: int) -> bytes:
+	return random.getrandbits(size * 4).to_bytes(size // 2 + 1, 'big').hex()[:size].encode('utf-8')
+
+
+def make_artifacts(
+	*, path: str, template_size: int, template_files: int, wheel_size: int, stubs_size: int
+) -> Dict[str, int]:
+	'''Writes synthetic artifacts of API_LEVEL to path, laid out as upstream, returning size of every artifact'''
+	os.makedirs(os.path.join(path, API_LEVEL))
+	root_path = f'nawah_app_template-APIv{API_LEVEL}'
+
+	def add_file(archive: tarfile.TarFile, name: str, content: bytes):
+		file_info = tarfile.TarInfo(name)
+		file_info.size = len(content)
+		archive.addfile(file_info, io.BytesIO(content))
+
+	with tarfile.open(os.path.join(path, f'APIv{API_LEVEL}.tar.gz'), 'w:gz') as archive:
+		add_file(
+			archive,
+			f'{root_path}/nawah_app.py',
+			b'from nawah.classes import APP_CONFIG\nconfig = APP_CONFIG(name=\'__PROJECT_NAME__\', data_name=\'__DATA_NAME__\', admin_doc={\'email\': \'__ADMIN_DOC_EMAIL__\'}, admin_password=\'__ADMIN_PASSWORD__\')\n',
+		)
+		add_file(archive, f'{root_path}/.gitignore', b'__pycache__/\nPROJECT_NAME.log\n')
+		add_file(archive, f'{root_path}/packages/PROJECT_NAME/__init__.py', b'')
+		for i in range(template_files):
+			add_file(
+				archive,
+				f'{root_path}/packages/PROJECT_NAME/module_{i}.py',
+				random_text(template_size // template_files),
+			)
+
+	with zipfile.ZipFile(os.path.join(path, API_LEVEL, 'nawah.whl'), 'w') as wheel:
+		wheel.writestr('nawah/__init__.py', '')
+		for i in range(max(1, wheel_size // (256 * 1024))):
+			wheel.writestr(f'nawah/module_{i}.py', random_text(256 * 1024))
+
+	with tarfile.open(os.path.join(path, API_LEVEL, 'stubs.tar.gz'), 'w:gz') as archive:
+		for i in range(max(1, stubs_size // (64 * 1024))):
+			add_file(archive, f'./module_{i}.pyi', random_text(64 * 1024))
+
+	with open(os.path.join(path, API_LEVEL, 'requirements.txt'), 'w') as req_file:
+		req_file.write('# Synthetic requirements, installing nothing\n')
+
+	return {
+		'template': os.path.getsize(os.path.join(path, f'APIv{API_LEVEL}.tar.gz')),
+		'framework': os.path.getsize(os.path.join(path, API_LEVEL, 'nawah.whl')),
+		'stubs': os.path.getsize(os.path.join(path, API_LEVEL, 'stubs.tar.gz')),
+		'requirements': os.path.getsize(os.path.join(path, API_LEVEL, 'requirements.txt')),
+	}
+
+
+def create_app(*, base_url: str, work_path: str, cache_path: str, app_name: str) -> Dict[str, Any]:
+	'''Creates app in child process, returning its wall time, steps timings, and peak RSS'''
+	timings_path = os.path.join(work_path, f'{app_name}.timings.json')
+	env = {
+		**os.environ,
+		'PYTHONPATH': REPO_PATH,
+		'NAWAH_CACHE_DIR': cache_path,
+		'NAWAH_MIRROR_URL': base_url,
+		# [DOC] Keep requirements installation off user site of machine running benchmark
+		'PYTHONUSERBASE': os.path.join(work_path, 'userbase'),
+	}
+	start = time.perf_counter()
+	with open(os.path.join(work_path, f'{app_name}.log'), 'w') as log_file:
+		process = subprocess.Popen(
+			[
+				sys.executable,
+				'-c',
+				CHILD_SCRIPT,
+				timings_path,
+				'create',
+				app_name,
+				work_path,
+				'--default-config',
+				'--api-level',
+				API_LEVEL,
+			],
+			env=env,
+			cwd=work_path,
+			stdout=log_file,
+			stderr=subprocess.STDOUT,
+		)
+		_, status, rusage = os.wait4(process.pid, 0)
+	wall = time.perf_counter() - start
+	if os.waitstatus_to_exitcode(status) != 0:
+		raise Exception(
+			f'Creating app \'{app_name}\' failed. Check log at: {os.path.join(work_path, f"{app_name}.log")}'
+		)
+	with open(timings_path, 'r') as timings_file:
+		steps = json.loads(timings_file.read())
+	return {
+		'wall': wall,
+		'steps': steps,
+		# [DOC] ru_maxrss is in KiB on Linux, and bytes on macOS
+		'peak_rss': rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+	}
+
+
+def summarise(runs: List[Dict[str, Any]], *, artifacts_size: int) -> Dict[str, Any]:
+	steps = sorted({step for run in runs for step in run['steps']})
+	summary = {
+		'wall': round(statistics.median(run['wall'] for run in runs), 4),
+		'steps': {
+			step: round(statistics.median(run['steps'].get(step, 0) for run in runs), 4)
+			for step in steps
+		},
+		'peak_rss': max(run['peak_rss'] for run in runs),
+	}
+	# [DOC] Throughput of getting all artifacts, either from server, or from cache
+	if summary['steps'].get('artifacts'):
+		summary['throughput'] = round(artifacts_size / summary['steps']['artifacts'])
+	return summary
+
+
+def compare(*, results: Dict[str, Any], earlier: Dict[str, Any]):
+	print(f'Comparison with earlier results (Nawah CLI v{earlier.get("version")}):')
+	for scenario, summary in results['scenarios'].items():
+		earlier_summary = earlier.get('scenarios', {}).get(scenario)
+		if not earlier_summary:
+			continue
+		for step, duration in [('wall', summary['wall'])] + list(summary['steps'].items()):
+			earlier_duration = (
+				earlier_summary['wall']
+				if step == 'wall'
+				else earlier_summary['steps'].get(step)
+			)
+			if not earlier_duration:
+				continue
+			print(
+				f'- {scenario}.{step}: {earlier_duration:.3f}s -> {duration:.3f}s ({(duration - earlier_duration) / earlier_duration:+.1%})'
+			)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark Nawah CLI \'create\' command')
+	parser.add_argument('--runs', type=int, default=3, help='Number of runs per scenario')
+	parser.add_argument('--template-size', type=parse_size, default='2M')
+	parser.add_argument('--template-files', type=int, default=200)
+	parser.add_argument('--wheel-size', type=parse_size, default='8M')
+	parser.add_argument('--stubs-size', type=parse_size, default='1M')
+	parser.add_argument('--output', help='Path to write results JSON to')
+	parser.add_argument('--compare', help='Path of earlier results JSON to compare with')
+	args = parser.parse_args()
+
+	from nawah_cli import __version__
+
+	with tempfile.TemporaryDirectory() as bench_path:
+		artifacts_path = os.path.join(bench_path, 'artifacts')
+		artifacts_sizes = make_artifacts(
+			path=artifacts_path,
+			template_size=args.template_size,
+			template_files=args.template_files,
+			wheel_size=args.wheel_size,
+			stubs_size=args.stubs_size,
+		)
+		artifacts_size = sum(artifacts_sizes.values())
+		print(f'Serving synthetic artifacts of {format_size(artifacts_size)}.')
+
+		server = http.server.ThreadingHTTPServer(
+			('127.0.0.1', 0), functools.partial(ArtifactsHandler, directory=artifacts_path)
+		)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+		scenarios: Dict[str, List[Dict[str, Any]]] = {'cold': [], 'warm': []}
+		try:
+			for run in range(args.runs):
+				work_path = os.path.join(bench_path, f'run_{run}')
+				os.makedirs(work_path)
+				cache_path = os.path.join(work_path, 'cache')
+				for scenario in scenarios:
+					# [DOC] Cold run starts with empty cache, that warm run then uses
+					scenarios[scenario].append(
+						create_app(
+							base_url=base_url,
+							work_path=work_path,
+							cache_path=cache_path,
+							app_name=f'{scenario}_app',
+						)
+					)
+					print(
+						f'Run {run + 1}/{args.runs}, {scenario}: {scenarios[scenario][-1]["wall"]:.3f}s'
+					)
+				shutil.rmtree(work_path)
+		finally:
+			server.shutdown()
+
+	results = {
+		'version': __version__,
+		'python': sys.version.split()[0],
+		'platform': sys.platform,
+		'runs': args.runs,
+		'artifacts': artifacts_sizes,
+		'scenarios': {
+			scenario: summarise(runs, artifacts_size=artifacts_size)
+			for scenario, runs in scenarios.items()
+		},
+	}
+	print(json.dumps(results, indent=2))
+	if args.output:
+		with open(args.output, 'w') as output_file:
+			output_file.write(json.dumps(results, indent=2))
+	if args.compare:
+		with open(args.compare, 'r') as earlier_file:
+			compare(results=results, earlier=json.loads(earlier_file.read()))
+
+
+if __name__ == '__main__':
+	main()
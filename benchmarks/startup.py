@@ -0,0 +1,158 @@
+'''Benchmark of Nawah CLI startup time, for 'nawah --version', and 'nawah --help'.
+
+Run from repo root:
+	python benchmarks/startup.py [--runs 20] [--output startup.json] [--update-baseline]
+
+Exits with non-zero status if a command imports any of HEAVY_MODULES, or if its warm startup
+overhead, over bare interpreter startup, regressed beyond tolerance of baseline in
+'benchmarks/startup_baseline.json'.
+'''
+
+from typing import Dict, List, Any
+
+import argparse, os, sys, json, time, statistics, subprocess, tempfile
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASELINE_PATH = os.path.join(REPO_PATH, 'benchmarks', 'startup_baseline.json')
+
+COMMANDS = {
+	'version': ['-m', 'nawah_cli', '--version'],
+	'help': ['-m', 'nawah_cli', '--help'],
+}
+
+# [DOC] Modules that should only be imported once a command that needs them runs
+HEAVY_MODULES = [
+	'asyncio',
+	'urllib.request',
+	'http.client',
+	'tarfile',
+	'tempfile',
+	'subprocess',
+	'concurrent.futures',
+	'hashlib',
+	'json',
+	'nawah_cli.create',
+	'nawah_cli.cache',
+	'nawah_cli.download',
+	'nawah_cli.template',
+]
+
+# [DOC] Regression is reported if overhead exceeds baseline * TOLERANCE_RATIO + TOLERANCE_MS
+TOLERANCE_RATIO = 1.5
+TOLERANCE_MS = 5.0
+
+
+def run(*, argv: List[str], env: Dict[str, str], cwd: str) -> float:
+	start = time.perf_counter()
+	subprocess.run(
+		[sys.executable] + argv,
+		env=env,
+		cwd=cwd,
+		stdout=subprocess.DEVNULL,
+		stderr=subprocess.DEVNULL,
+		check=True,
+	)
+	return (time.perf_counter() - start) * 1000
+
+
+def imported_modules(*, argv: List[str], env: Dict[str, str], cwd: str) -> List[str]:
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime'] + argv,
+		env=env,
+		cwd=cwd,
+		stdout=subprocess.DEVNULL,
+		stderr=subprocess.PIPE,
+		universal_newlines=True,
+	)
+	return [
+		line.split('|')[-1].strip()
+		for line in result.stderr.splitlines()
+		if line.startswith('import time:') and '|' in line
+	]
+
+
+def benchmark(*, runs: int) -> Dict[str, Any]:
+	env = {**os.environ, 'PYTHONPATH': REPO_PATH}
+	env.pop('PYTHONPYCACHEPREFIX', None)
+	results: Dict[str, Any] = {'python': sys.version.split()[0], 'runs': runs, 'commands': {}}
+
+	# [DOC] Run from empty dir, so Nawah CLI doesn't attempt to load framework CLI
+	with tempfile.TemporaryDirectory() as cwd:
+		bare = [run(argv=['-c', 'pass'], env=env, cwd=cwd) for _ in range(runs)]
+		results['bare_ms'] = round(statistics.median(bare), 2)
+
+		for command, argv in COMMANDS.items():
+			# [DOC] Cold runs compile bytecode from scratch, through empty pycache prefix
+			cold = []
+			for _ in range(max(1, runs // 4)):
+				with tempfile.TemporaryDirectory() as pycache_path:
+					cold.append(
+						run(argv=argv, env={**env, 'PYTHONPYCACHEPREFIX': pycache_path}, cwd=cwd)
+					)
+			run(argv=argv, env=env, cwd=cwd)
+			warm = [run(argv=argv, env=env, cwd=cwd) for _ in range(runs)]
+			modules = imported_modules(argv=argv, env=env, cwd=cwd)
+			results['commands'][command] = {
+				'cold_ms': round(statistics.median(cold), 2),
+				'warm_ms': round(statistics.median(warm), 2),
+				'warm_overhead_ms': round(statistics.median(warm) - results['bare_ms'], 2),
+				'modules': len(modules),
+				'heavy_modules': [module for module in HEAVY_MODULES if module in modules],
+			}
+
+	return results
+
+
+def check(*, results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+	failures = []
+	for command, command_results in results['commands'].items():
+		if command_results['heavy_modules']:
+			failures.append(
+				f'\'{command}\' imports heavy modules: {", ".join(command_results["heavy_modules"])}'
+			)
+		if command not in baseline.get('commands', {}):
+			continue
+		budget = (
+			baseline['commands'][command]['warm_overhead_ms'] * TOLERANCE_RATIO + TOLERANCE_MS
+		)
+		if command_results['warm_overhead_ms'] > budget:
+			failures.append(
+				f'\'{command}\' warm startup overhead {command_results["warm_overhead_ms"]}ms exceeds budget {budget:.2f}ms'
+			)
+	return failures
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark Nawah CLI startup time')
+	parser.add_argument('--runs', type=int, default=20, help='Number of warm runs per command')
+	parser.add_argument('--output', help='Path to write results JSON to')
+	parser.add_argument(
+		'--update-baseline', action='store_true', help='Write results as new baseline'
+	)
+	args = parser.parse_args()
+
+	results = benchmark(runs=args.runs)
+	print(json.dumps(results, indent=2))
+	if args.output:
+		with open(args.output, 'w') as output_file:
+			output_file.write(json.dumps(results, indent=2))
+
+	if args.update_baseline:
+		with open(BASELINE_PATH, 'w') as baseline_file:
+			baseline_file.write(json.dumps(results, indent=2) + '\n')
+		print(f'Baseline written to: {BASELINE_PATH}')
+		return
+
+	baseline = {}
+	if os.path.exists(BASELINE_PATH):
+		with open(BASELINE_PATH, 'r') as baseline_file:
+			baseline = json.loads(baseline_file.read())
+	if failures := check(results=results, baseline=baseline):
+		for failure in failures:
+			print(f'FAIL: {failure}', file=sys.stderr)
+		exit(1)
+	print('Startup benchmark passed.')
+
+
+if __name__ == '__main__':
+	main()
@@ -1,19 +1,79 @@
 import os
 
 
+def load_framework_cli(*, nawah_path: str = None):
+	'''Returns Framework CLI of app in working directory, loading requirements from app virtualenv, if any, and framework from nawah_path, if passed, or from wheel of app'''
+	# [REF] https://stackoverflow.com/a/3964691/2393762
+	import sys, glob
+
+	# [DOC] Load requirements from app virtualenv, if app was created with one for this interpreter
+	venv_site = glob.glob(
+		os.path.join(
+			'.venv', 'lib', f'python{sys.version_info[0]}.{sys.version_info[1]}', 'site-packages'
+		)
+	) + glob.glob(os.path.join('.venv', 'Lib', 'site-packages'))
+	if venv_site:
+		import site
+
+		print('Found app virtualenv. Attempting to load Nawah framework requirements from it.')
+		sys.path.insert(0, os.path.realpath(venv_site[0]))
+		site.addsitedir(os.path.realpath(venv_site[0]))
+
+	if nawah_path:
+		sys.path.insert(0, nawah_path)
+
+	# [DOC] Fall back to wheel
+	else:
+		try:
+			print('Attempting to locate Nawah framework wheel file.')
+			whl_name = glob.glob('framework-*.whl')
+			if not whl_name:
+				print('Failed.')
+
+			whl_name = whl_name[0]
+			print(f'Found wheel file: \'{whl_name}\'. Attempting to load it.')
+		except:
+			print('No Nawah Framework wheel file was found. Exiting.')
+			exit(1)
+
+		# [DOC] Load framework unpacked, and compiled, in app by 'compile', or in cache, rather than importing it from wheel with no bytecode
+		try:
+			from nawah_cli.framework import app_framework_path, cached_framework_path
+
+			sys.path.insert(
+				0, app_framework_path(whl_path=whl_name) or cached_framework_path(whl_path=whl_name)
+			)
+		except Exception as e:
+			print(f'Failed to load cached Nawah framework: {e}. Falling back to wheel file.')
+			# [REF] http://avrilomics.blogspot.com/2015/11/import-python-module-from-egg-file.html
+			sys.path.insert(0, os.path.join('.', whl_name))
+
+	# [DOC] Attempt to import Framework CLI
+	try:
+		from nawah.cli import nawah_cli
+	except:
+		print('Failed to import Nawah Framework CLI.')
+		print(
+			'If you are using \'nawah_path\' CLI Arg, confirm the framework path again. Make sure it is pointing to top-level framework directory, and not \'nawah\' inside it.'
+		)
+		print('Exiting.')
+		exit(1)
+
+	return nawah_cli
+
+
 def main():
 	# [DOC] If Nawah CLI is started from app context, use Framework CLI
 	if os.path.exists(os.path.join('.', 'nawah_app.py')):
 		print('Nawah CLI is running from Nawah project directory. Attempting to load framework CLI.')
-		# [REF] https://stackoverflow.com/a/3964691/2393762
-		import sys, glob
+		import sys
 
+		nawah_path = None
 		# [DOC] Check if alt framework is provided
 		if '--nawah-path' in sys.argv:
 			try:
 				nawah_path_index = sys.argv.index('--nawah-path')
 				nawah_path = os.path.realpath(sys.argv[nawah_path_index + 1])
-				sys.path.insert(0, nawah_path)
 				# [DOC] Remove nawah_path CLI Arg and value from sys.argv
 				sys.argv.pop(nawah_path_index)
 				sys.argv.pop(nawah_path_index)
@@ -21,36 +81,17 @@ def main():
 				print('Either no value for \'nawah_path\' CLI Arg, or invalid. Exiting.')
 				exit(1)
 
-		# [DOC] Fall back to wheel
-		else:
-			try:
-				print('Attempting to locate Nawah framework wheel file.')
-				whl_name = glob.glob('framework-*.whl')
-				if not whl_name:
-					print('Failed.')
-				
-				whl_name = whl_name[0]
-
-				# [REF] http://avrilomics.blogspot.com/2015/11/import-python-module-from-egg-file.html
-				sys.path.insert(0, os.path.join('.', whl_name))
-				
-				print(f'Found wheel file: \'{whl_name}\'. Attempting to load it.')
-			except:
-				print('No Nawah Framework wheel file was found. Exiting.')
-				exit(1)
+		# [DOC] Run command in pre-warmed Framework CLI daemon of app, if enabled
+		if '--nawah-daemon-stop' in sys.argv or os.environ.get('NAWAH_DAEMON') in ['1', 'true']:
+			from nawah_cli.daemon import run_in_daemon, stop_daemon
 
-		# [DOC] Attempt to import Framework CLI
-		try:
-			from nawah.cli import nawah_cli
-		except:
-			print('Failed to import Nawah Framework CLI.')
-			print(
-				'If you are using \'nawah_path\' CLI Arg, confirm the framework path again. Make sure it is pointing to top-level framework directory, and not \'nawah\' inside it.'
-			)
-			print('Exiting.')
-			exit(1)
+			if '--nawah-daemon-stop' in sys.argv:
+				stop_daemon(app_path=os.getcwd(), nawah_path=nawah_path)
+				exit(0)
+			if (exit_code := run_in_daemon(app_path=os.getcwd(), nawah_path=nawah_path)) is not None:
+				exit(exit_code)
 
-		nawah_cli()
+		load_framework_cli(nawah_path=nawah_path)()
 
 	else:
 		from nawah_cli.cli import nawah_cli
@@ -0,0 +1,60 @@
+'''Library API of Nawah CLI, to create apps from other code, such as services, without running Nawah CLI once per app'''
+
+from nawah_cli.create import (
+	CreateError,
+	InvalidArgError,
+	ProgressError,
+	CreateStepError,
+	run_create,
+)
+from nawah_cli.template import MATERIALISE_METHOD
+from nawah_cli.store import LINK_METHOD
+from nawah_cli.bytecode import INVALIDATION_MODE
+
+from typing import Dict, Any, Optional
+
+import argparse, asyncio, functools
+
+
+async def create_app(
+	*,
+	app_name: str,
+	app_path: str = '.',
+	api_level: str = '1.0',
+	config: Dict[str, Any] = None,
+	template: str = None,
+	template_method: MATERIALISE_METHOD = 'auto',
+	venv: bool = False,
+	link_framework: Optional[LINK_METHOD] = None,
+	compile: bool = False,
+	git_commit: bool = False,
+	invalidation_mode: INVALIDATION_MODE = 'checked-hash',
+	use_cache: bool = True,
+	max_concurrency: int = None,
+) -> Dict[str, Any]:
+	'''Creates app, as 'create' command does, and returns its name, path, API Level, Config Attrs, and steps completed. Values in config, keyed as Config Attrs of 'create_step_config', override defaults, as in batch manifest, and are never prompted for. Many apps can be created concurrently, with 'asyncio.gather'. Raises InvalidArgError if args, or config are invalid, ProgressError if app exists with no progress that can be continued, and CreateStepError if step fails, with progress kept, for app to be created again from it'''
+	args = argparse.Namespace(
+		app_name=app_name,
+		app_path=app_path,
+		api_level=api_level,
+		default_config=True,
+		config=config or {},
+		template=template,
+		template_method=template_method,
+		batch=None,
+		jobs=None,
+		no_cache=not use_cache,
+		venv=venv,
+		link_framework=link_framework,
+		compile=compile,
+		git_commit=git_commit,
+		watch=False,
+		invalidation_mode=invalidation_mode,
+		max_concurrency=max_concurrency,
+		trace=None,
+		profile=None,
+	)
+	# [DOC] Creating app is blocking, with downloads, and subprocesses, so it runs in executor of loop
+	return await asyncio.get_running_loop().run_in_executor(
+		None, functools.partial(run_create, args)
+	)
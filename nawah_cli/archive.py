@@ -0,0 +1,43 @@
+from nawah_cli.download import CHUNK_SIZE
+
+from typing import IO, Dict, Iterator
+
+import tarfile, shutil
+
+
+def archive_members(
+	*, archive: tarfile.TarFile, root_path: str, search_path: str = None
+) -> Iterator[tarfile.TarInfo]:
+	'''Yields members of archive under root_path, relative to it. Members are read as archive is iterated, so this works with archives opened in stream mode'''
+	l = len(f'{root_path}/')
+	for member in archive:
+		if member.path.startswith(f'{root_path}/{search_path or ""}'):
+			member.path = member.path[l:]
+			yield member
+
+
+def extract_archive(
+	*, fileobj: IO[bytes], path: str, root_path: str, search_path: str = None
+) -> Dict[str, int]:
+	'''Extracts gzipped tar archive from fileobj to path in a single forward pass, without seeking, or indexing archive members first. Returns number of files, and bytes extracted'''
+	stats = {'files': 0, 'bytes': 0}
+
+	def counted_members(archive: tarfile.TarFile) -> Iterator[tarfile.TarInfo]:
+		for member in archive_members(
+			archive=archive, root_path=root_path, search_path=search_path
+		):
+			if member.isfile():
+				stats['files'] += 1
+				stats['bytes'] += member.size
+			yield member
+
+	# [REF] https://docs.python.org/3/library/tarfile.html#tarfile.open
+	with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+		archive.extractall(path=path, members=counted_members(archive))
+	return stats
+
+
+def write_file(*, fileobj: IO[bytes], path: str):
+	'''Writes fileobj to path in fixed-size chunks'''
+	with open(path, 'wb') as f:
+		shutil.copyfileobj(fileobj, f, CHUNK_SIZE)
@@ -0,0 +1,63 @@
+from typing import Dict, List, Literal
+
+import os
+
+ARTIFACT = Literal['template', 'framework', 'stubs', 'requirements']
+
+# [DOC] Upstream base URLs of artifacts required to create Nawah app
+ARTIFACTS_BASE_URLS: Dict[str, str] = {
+	'template': 'https://github.com/nawah-io/nawah_app_template/archive',
+	'framework': 'https://github.com/nawah-io/nawah_framework_wheels/raw/master',
+	'stubs': 'https://github.com/nawah-io/nawah_framework_wheels/raw/master',
+	'requirements': 'https://github.com/nawah-io/nawah_framework_wheels/raw/master',
+}
+
+# [DOC] Paths of artifacts, per API Level, relative to base URLs. Paths don't overlap, so mirrors
+# [DOC] serve all artifacts under one base URL
+ARTIFACTS_PATHS: Dict[str, str] = {
+	'template': 'APIv{api_level}.tar.gz',
+	'framework': '{api_level}/nawah.whl',
+	'stubs': '{api_level}/stubs.tar.gz',
+	'requirements': '{api_level}/requirements.txt',
+}
+
+
+# [DOC] Path of index of API Levels, and hashes of their artifacts, relative to base URLs of framework
+INDEX_PATH = 'index.json'
+
+
+def artifact_base_urls(*, artifact: ARTIFACT) -> List[str]:
+	'''Returns base URLs of sources of artifact, honouring 'NAWAH_{ARTIFACT}_BASE_URL', then 'NAWAH_MIRROR_URL' Env Variables. Env Variables can list many comma-separated base URLs, with 'default' for upstream base URL'''
+	base_urls = (
+		os.environ.get(f'NAWAH_{artifact.upper()}_BASE_URL')
+		or os.environ.get('NAWAH_MIRROR_URL')
+		or 'default'
+	)
+	return [
+		(ARTIFACTS_BASE_URLS[artifact] if base_url == 'default' else base_url).rstrip('/')
+		for base_url in (base_url.strip() for base_url in base_urls.split(','))
+		if base_url
+	]
+
+
+def artifact_urls(*, api_level: str, artifact: ARTIFACT) -> List[str]:
+	return [
+		f'{base_url}/{ARTIFACTS_PATHS[artifact].format(api_level=api_level)}'
+		for base_url in artifact_base_urls(artifact=artifact)
+	]
+
+
+def index_urls() -> List[str]:
+	return [f'{base_url}/{INDEX_PATH}' for base_url in artifact_base_urls(artifact='framework')]
+
+
+def cache_dir() -> str:
+	'''Returns path of Nawah CLI artifacts cache, honouring 'NAWAH_CACHE_DIR' Env Variable'''
+	if os.environ.get('NAWAH_CACHE_DIR'):
+		return os.path.realpath(os.environ['NAWAH_CACHE_DIR'])
+	if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+		return os.path.join(os.environ['LOCALAPPDATA'], 'nawah', 'cache')
+	return os.path.join(
+		os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+		'nawah',
+	)
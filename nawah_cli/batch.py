@@ -0,0 +1,174 @@
+from nawah_cli.cache import fetch_artifacts
+from nawah_cli.create import create
+from nawah_cli.index import resolve_api_level
+from nawah_cli.wheelhouse import install_requirements
+from nawah_cli.venvs import golden_venv
+
+from typing import Dict, List, Any
+
+import argparse, os, re, sys, json, time, logging, contextlib, concurrent.futures
+
+logger = logging.getLogger('nawah')
+
+# [DOC] Attrs of app in batch manifest, besides 'config', setting 'create' CLI Args of same name
+BATCH_APP_ATTRS = ['app_name', 'app_path', 'api_level', 'template']
+
+
+def read_batch(*, batch_path: str, args: argparse.Namespace) -> List[argparse.Namespace]:
+	'''Returns 'create' CLI Args of every app in batch manifest. Manifest is JSON list of apps attrs, with 'config' of Config Attrs values keyed as in 'create_step_config' '''
+	with open(batch_path, 'r') as batch_file:
+		batch = json.loads(batch_file.read())
+	if not isinstance(batch, list):
+		raise ValueError('Batch manifest should be a list of apps')
+
+	apps_args = []
+	for app in batch:
+		if not isinstance(app, dict) or not app.get('app_name'):
+			raise ValueError(f'App \'{app}\' in batch manifest has no \'app_name\'')
+		if invalid_attrs := set(app.keys()) - set(BATCH_APP_ATTRS + ['config']):
+			raise ValueError(
+				f'App \'{app["app_name"]}\' in batch manifest has invalid attrs: {", ".join(invalid_attrs)}'
+			)
+		app_args = argparse.Namespace(
+			**{
+				**vars(args),
+				'batch': None,
+				# [DOC] Tracing of batch is of shared artifacts only, as apps are created in other processes
+				'trace': None,
+				'profile': None,
+				'app_path': '.',
+				# [DOC] Apps are created in parallel already, so each is compiled in one process
+				'jobs': 1,
+				'default_config': True,
+				**{attr: app[attr] for attr in BATCH_APP_ATTRS if attr in app},
+				'config': app.get('config', {}),
+			}
+		)
+		if app_args.api_level != 'latest' and not re.match(
+			r'^[0-9]\.[0-9]{1,2}$', app_args.api_level
+		):
+			raise ValueError(f'API Level of app \'{app_args.app_name}\' is invalid')
+		app_args.api_level = resolve_api_level(app_args.api_level)
+		apps_args.append(app_args)
+
+	app_paths = [
+		os.path.realpath(os.path.join(app_args.app_path, app_args.app_name))
+		for app_args in apps_args
+	]
+	if len(set(app_paths)) != len(app_paths):
+		raise ValueError('Batch manifest has more than one app with same path')
+	return apps_args
+
+
+@contextlib.contextmanager
+def _app_logging(app_name: str):
+	'''Logs messages of app with handler of its own, prefixing them with app name. Handlers worker inherited from CLI, if forked, are restored once app is created, as one worker creates many apps'''
+	handler = logging.StreamHandler()
+	handler.setFormatter(
+		logging.Formatter(f'%(asctime)s  [%(levelname)s]  [{app_name}]  %(message)s')
+	)
+	inherited_handlers, inherited_level = list(logger.handlers), logger.level
+	for inherited_handler in inherited_handlers:
+		logger.removeHandler(inherited_handler)
+	logger.addHandler(handler)
+	logger.setLevel(logging.INFO)
+	try:
+		yield
+	finally:
+		logger.removeHandler(handler)
+		for inherited_handler in inherited_handlers:
+			logger.addHandler(inherited_handler)
+		logger.setLevel(inherited_level)
+
+
+def create_batch_app(app_args: argparse.Namespace) -> Dict[str, Any]:
+	'''Creates one app of batch in worker process, returning result of it, rather than exiting'''
+	start = time.perf_counter()
+	exit_code = 0
+	with _app_logging(app_args.app_name):
+		try:
+			create(app_args)
+		except SystemExit as e:
+			exit_code = e.code if isinstance(e.code, int) else 1
+		except Exception as e:
+			logger.error(f'Exception details: {e}')
+			exit_code = 1
+	return {
+		'app_name': app_args.app_name,
+		'app_path': os.path.realpath(os.path.join(app_args.app_path, app_args.app_name)),
+		'api_level': app_args.api_level,
+		'status': 'created' if not exit_code else 'failed',
+		'exit_code': exit_code,
+		'duration': round(time.perf_counter() - start, 3),
+	}
+
+
+def create_batch(args: argparse.Namespace):
+	if args.app_name or args.app_path != '.':
+		logger.error('\'batch\' CLI Arg can\'t be used with \'app_name\', or \'app_path\'. Exiting.')
+		exit(1)
+	if args.no_cache:
+		logger.error(
+			'\'batch\' CLI Arg can\'t be used with \'no-cache\', as artifacts are shared through cache. Exiting.'
+		)
+		exit(1)
+
+	try:
+		apps_args = read_batch(batch_path=args.batch, args=args)
+	except Exception as e:
+		logger.error('An exception occurred while attempting to read batch manifest.')
+		logger.error(f'Exception details: {e}')
+		logger.error('Exiting.')
+		exit(1)
+
+	# [DOC] Fetch artifacts, and install requirements, or build golden venv of them, once per API Level, for all apps to share
+	for api_level in sorted({app_args.api_level for app_args in apps_args}):
+		logger.info(f'Attempting to fetch shared artifacts for API Level {api_level}.')
+		try:
+			artifacts_paths = fetch_artifacts(
+				api_level=api_level,
+				artifacts=(
+					['template']
+					if any(
+						not app_args.template
+						for app_args in apps_args
+						if app_args.api_level == api_level
+					)
+					else []
+				)
+				+ ['framework', 'stubs', 'requirements'],
+				max_concurrency=args.max_concurrency,
+			)
+			if args.venv:
+				golden_venv(
+					req_path=artifacts_paths['requirements'], max_workers=args.max_concurrency
+				)
+			else:
+				install_requirements(
+					req_path=artifacts_paths['requirements'], max_workers=args.max_concurrency
+				)
+		except Exception as e:
+			logger.error(
+				f'An exception occurred while attempting to prepare API Level {api_level}.'
+			)
+			logger.error(f'Exception details: {e}')
+			logger.error('Exiting.')
+			exit(1)
+
+	logger.info(
+		f'Attempting to create {len(apps_args)} apps, with {args.jobs or os.cpu_count()} workers.'
+	)
+	results = []
+	with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+		for result in executor.map(create_batch_app, apps_args):
+			# [DOC] Results are written as JSON Lines to stdout, one per app
+			print(json.dumps(result), file=sys.stdout, flush=True)
+			results.append(result)
+
+	failed = [result for result in results if result['status'] != 'created']
+	logger.info(f'Created {len(results) - len(failed)} of {len(results)} apps.')
+	if failed:
+		logger.error(
+			f'Failed to create apps: {", ".join(result["app_name"] for result in failed)}'
+		)
+		exit(1)
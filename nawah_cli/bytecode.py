@@ -0,0 +1,111 @@
+from nawah_cli.trace import span
+
+from typing import Dict, Any, Literal
+
+import argparse, os, re, glob, logging
+
+logger = logging.getLogger('nawah')
+
+INVALIDATION_MODE = Literal['checked-hash', 'unchecked-hash', 'timestamp']
+
+# [DOC] Dirs of app not compiled, as they are not app sources, or are compiled by pip
+SKIP_DIRS = ['.git', '.venv', 'node_modules']
+SKIP_RX = re.compile(r'[/\\](' + '|'.join(re.escape(skip_dir) for skip_dir in SKIP_DIRS) + r')[/\\]')
+
+
+def _invalidation_mode(invalidation_mode: INVALIDATION_MODE):
+	import py_compile
+
+	return {
+		'checked-hash': py_compile.PycInvalidationMode.CHECKED_HASH,
+		'unchecked-hash': py_compile.PycInvalidationMode.UNCHECKED_HASH,
+		'timestamp': py_compile.PycInvalidationMode.TIMESTAMP,
+	}[invalidation_mode]
+
+
+def app_invalidation_mode(*, app_path: str) -> INVALIDATION_MODE:
+	'''Returns invalidation mode app was compiled with, by flags of bytecode of 'nawah_app.py', defaulting to 'checked-hash' if it has none'''
+	import importlib.util
+
+	try:
+		with open(importlib.util.cache_from_source(os.path.join(app_path, 'nawah_app.py')), 'rb') as pyc_file:
+			flags = int.from_bytes(pyc_file.read(8)[4:8], 'little')
+	except FileNotFoundError:
+		return 'checked-hash'
+	# [REF] https://peps.python.org/pep-0552/
+	return {0: 'timestamp', 1: 'unchecked-hash'}.get(flags, 'checked-hash')
+
+
+def compile_app(
+	*, app_path: str, invalidation_mode: INVALIDATION_MODE = 'checked-hash', workers: int = 0
+) -> Dict[str, Any]:
+	'''Unpacks framework of app next to its wheel, and compiles Python files of app, and framework to bytecode, with pool of workers processes, or one per CPU if workers is 0. Hash-based bytecode stays valid if app is copied, such as into container images, as it is not checked against mtimes of files. Returns number of files, and bytes compiled, and paths of files failed to compile'''
+	import compileall, py_compile
+
+	from nawah_cli.framework import unpack_app_framework
+
+	# [DOC] Framework is unpacked into app, for its bytecode to be shipped with app
+	for whl_path in glob.glob(os.path.join(app_path, 'framework-*.whl')):
+		with span('unpack framework', category='compile'):
+			unpack_app_framework(whl_path=whl_path)
+
+	stats: Dict[str, Any] = {'files': 0, 'bytes': 0, 'failed': []}
+	py_paths = []
+	for root, dirs, root_files in os.walk(app_path):
+		dirs[:] = [root_dir for root_dir in dirs if root_dir not in SKIP_DIRS]
+		for root_file in root_files:
+			if root_file.endswith('.py'):
+				py_paths.append(os.path.join(root, root_file))
+				stats['bytes'] += os.path.getsize(os.path.join(root, root_file))
+	stats['files'] = len(py_paths)
+
+	with span('compile app', category='compile') as compile_span:
+		compile_span.files, compile_span.bytes = stats['files'], stats['bytes']
+		# [DOC] Pool of workers is only worth starting for more files than one process compiles quickly
+		if not compileall.compile_dir(
+			app_path,
+			quiet=2,
+			rx=SKIP_RX,
+			workers=workers if stats['files'] > 32 else 1,
+			invalidation_mode=_invalidation_mode(invalidation_mode),
+		):
+			# [DOC] Workers don't report files they failed to compile, so files are checked again, only if any failed
+			for py_path in py_paths:
+				try:
+					py_compile.compile(
+						py_path, doraise=True, invalidation_mode=_invalidation_mode(invalidation_mode)
+					)
+				except py_compile.PyCompileError:
+					stats['failed'].append(os.path.relpath(py_path, app_path))
+	return stats
+
+
+def compile_command(args: argparse.Namespace):
+	failed = False
+	for app_path in (os.path.realpath(app_path) for app_path in args.app_paths):
+		if not os.path.exists(os.path.join(app_path, 'nawah_app.py')):
+			logger.error(f'\'{app_path}\' is not a Nawah app. Exiting.')
+			exit(1)
+		logger.info(f'Attempting to compile app at \'{app_path}\'.')
+		try:
+			stats = compile_app(
+				app_path=app_path,
+				invalidation_mode=args.invalidation_mode,
+				workers=args.jobs or 0,
+			)
+		except Exception as e:
+			logger.error(f'An exception occurred while attempting to compile app at \'{app_path}\'.')
+			logger.error(f'Exception details: {e}')
+			failed = True
+			continue
+		if stats['failed']:
+			logger.error(f'Failed to compile {len(stats["failed"])} files of app at \'{app_path}\':')
+			for failed_path in stats['failed']:
+				logger.error(f'- {failed_path}')
+			failed = True
+			continue
+		logger.info(f'App at \'{app_path}\' compiled successfully, with {stats["files"]} files!')
+
+	if failed:
+		logger.error('Exiting.')
+		exit(1)
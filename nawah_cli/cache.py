@@ -0,0 +1,571 @@
+from nawah_cli.artifacts import ARTIFACT, ARTIFACTS_PATHS, artifact_urls, cache_dir
+from nawah_cli.download import CHUNK_SIZE, DownloadError, DownloadManager, SourceStats, TeeReader
+from nawah_cli.index import artifact_hash, resolve_api_level
+from nawah_cli.journal import JournaledFile, ProgressJournal
+from nawah_cli.trace import span
+
+from typing import IO, Dict, List, Tuple, Callable, Any, Optional
+
+import argparse, os, logging, json, time, hashlib, tempfile, shutil, contextlib, re, threading
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+logger = logging.getLogger('nawah')
+
+DEFAULT_MAX_SIZE = 1024 ** 3
+STALE_TMP_AGE = 7 * 24 * 60 * 60
+
+
+def parse_size(value: str) -> int:
+	'''Converts human-readable size, such as '512M', or '2G', into number of bytes'''
+	match = re.match(r'^([0-9]+)\s*([KMGT]?)i?B?$', value.strip(), re.IGNORECASE)
+	if not match:
+		raise ValueError(f'Size \'{value}\' is invalid')
+	return int(match.group(1)) * 1024 ** ' KMGT'.index(match.group(2).upper() or ' ')
+
+
+def format_size(size: int) -> str:
+	for unit in ['B', 'KiB', 'MiB', 'GiB']:
+		if size < 1024 or unit == 'GiB':
+			break
+		size /= 1024
+	return f'{size:.1f} {unit}' if unit != 'B' else f'{size} B'
+
+
+def cache_max_size() -> int:
+	if os.environ.get('NAWAH_CACHE_MAX_SIZE'):
+		return parse_size(os.environ['NAWAH_CACHE_MAX_SIZE'])
+	return DEFAULT_MAX_SIZE
+
+
+def _object_path(object_hash: str) -> str:
+	return os.path.join(cache_dir(), 'objects', object_hash[:2], object_hash)
+
+
+def _entry_key(*, api_level: str, artifact: ARTIFACT) -> str:
+	return f'{api_level}:{artifact}'
+
+
+@contextlib.contextmanager
+def _index_lock():
+	os.makedirs(cache_dir(), exist_ok=True)
+	with open(os.path.join(cache_dir(), '.lock'), 'a') as lock_file:
+		if fcntl:
+			fcntl.flock(lock_file, fcntl.LOCK_EX)
+		try:
+			yield
+		finally:
+			if fcntl:
+				fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_index() -> Dict[str, Any]:
+	try:
+		with open(os.path.join(cache_dir(), 'index.json'), 'r') as index_file:
+			return json.loads(index_file.read())
+	except (FileNotFoundError, json.JSONDecodeError):
+		return {'entries': {}}
+
+
+def _write_index(index: Dict[str, Any]):
+	index_path = os.path.join(cache_dir(), 'index.json')
+	# [DOC] Write to temp file first, then replace, to never leave partial index behind
+	with open(f'{index_path}.{os.getpid()}', 'w') as index_file:
+		index_file.write(json.dumps(index, indent=1))
+	os.replace(f'{index_path}.{os.getpid()}', index_path)
+
+
+def hash_file(path: str) -> str:
+	file_hash = hashlib.sha256()
+	with open(path, 'rb') as f:
+		while chunk := f.read(CHUNK_SIZE):
+			file_hash.update(chunk)
+	return file_hash.hexdigest()
+
+
+def cache_get(
+	*, api_level: str, artifact: ARTIFACT, expected_hash: str = None
+) -> Optional[str]:
+	'''Returns path of cached object for artifact of API Level, if any, and marks it as recently used. If expected_hash is passed, and cached object has other hash, it is stale, and None is returned'''
+	with _index_lock():
+		index = _read_index()
+		entry_key = _entry_key(api_level=api_level, artifact=artifact)
+		if entry_key not in index['entries']:
+			return None
+		entry = index['entries'][entry_key]
+		object_path = _object_path(entry['hash'])
+		if (
+			not os.path.exists(object_path)
+			or os.path.getsize(object_path) != entry['size']
+		):
+			logger.warning(
+				f'Cached object for \'{entry_key}\' is missing or corrupted. Dropping it.'
+			)
+			del index['entries'][entry_key]
+			_write_index(index)
+			return None
+		if expected_hash and entry['hash'] != expected_hash:
+			logger.info(
+				f'Cached object for \'{entry_key}\' is stale, as artifact changed at its sources.'
+			)
+			return None
+		entry['accessed'] = time.time()
+		_write_index(index)
+		return object_path
+
+
+def cache_put(
+	*, api_level: str, artifact: ARTIFACT, path: str, url: str, object_hash: str = None
+) -> str:
+	'''Moves file at path into cache as object for artifact of API Level, and returns object path. object_hash is computed from file if not passed'''
+	object_hash = object_hash or hash_file(path)
+	object_path = _object_path(object_hash)
+	os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+	entry_key = _entry_key(api_level=api_level, artifact=artifact)
+	# [DOC] Object is moved into place under lock, as concurrent creates put same objects, and prune them
+	with _index_lock():
+		if os.path.exists(object_path):
+			os.remove(path)
+		else:
+			try:
+				os.replace(path, object_path)
+			except OSError:
+				# [DOC] Downloads outside cache, such as on other file systems, are copied, then moved
+				shutil.copyfile(path, f'{object_path}.{os.getpid()}.{threading.get_ident()}')
+				os.replace(f'{object_path}.{os.getpid()}.{threading.get_ident()}', object_path)
+				os.remove(path)
+		index = _read_index()
+		index['entries'][entry_key] = {
+			'api_level': api_level,
+			'artifact': artifact,
+			'hash': object_hash,
+			'size': os.path.getsize(object_path),
+			'url': url,
+			'added': time.time(),
+			'accessed': time.time(),
+		}
+		_write_index(index)
+
+	cache_prune(max_size=cache_max_size(), keep=[entry_key])
+	return object_path
+
+
+def cache_entries() -> List[Dict[str, Any]]:
+	with _index_lock():
+		return sorted(
+			_read_index()['entries'].values(),
+			key=lambda entry: (entry['api_level'], entry['artifact']),
+		)
+
+
+def api_level_cached(*, api_level: str) -> bool:
+	'''Checks whether all artifacts of API Level are cached, with no request to artifacts sources'''
+	with _index_lock():
+		entries = _read_index()['entries']
+	return all(
+		_entry_key(api_level=api_level, artifact=artifact) in entries
+		and os.path.exists(
+			_object_path(entries[_entry_key(api_level=api_level, artifact=artifact)]['hash'])
+		)
+		for artifact in ARTIFACTS_PATHS.keys()
+	)
+
+
+def cache_prune(*, max_size: int, keep: List[str] = None) -> List[Dict[str, Any]]:
+	'''Evicts least recently used entries until cache objects total size is within max_size. Entries in keep are never evicted'''
+	removed_entries = []
+	with _index_lock():
+		index = _read_index()
+		entries = sorted(
+			index['entries'].items(),
+			key=lambda item: (item[0] in (keep or []), item[1]['accessed']),
+		)
+
+		def total_size():
+			return sum(
+				{entry['hash']: entry['size'] for _, entry in entries}.values()
+			)
+
+		while entries and entries[0][0] not in (keep or []) and total_size() > max_size:
+			entry_key, entry = entries.pop(0)
+			del index['entries'][entry_key]
+			removed_entries.append(entry)
+
+		# [DOC] Delete objects no longer referenced by any entry
+		hashes = {entry['hash'] for _, entry in entries}
+		for entry in removed_entries:
+			if entry['hash'] not in hashes and os.path.exists(_object_path(entry['hash'])):
+				os.remove(_object_path(entry['hash']))
+
+		if removed_entries:
+			_write_index(index)
+
+		# [DOC] Delete partial downloads abandoned for longer than STALE_TMP_AGE
+		if os.path.exists(os.path.join(cache_dir(), 'tmp')):
+			for tmp_file in os.scandir(os.path.join(cache_dir(), 'tmp')):
+				# [DOC] Downloads of other apps, and threads are moved into cache while scanned
+				try:
+					if time.time() - tmp_file.stat().st_mtime > STALE_TMP_AGE:
+						os.remove(tmp_file.path)
+				except FileNotFoundError:
+					pass
+
+	return removed_entries
+
+
+def download_manager(*, max_concurrency: int = None) -> DownloadManager:
+	'''Returns DownloadManager that ranks sources of artifacts by their latency, recorded in cache'''
+	return DownloadManager(
+		**({'max_concurrency': max_concurrency} if max_concurrency else {}),
+		sources=SourceStats(path=os.path.join(cache_dir(), 'sources.json')),
+	)
+
+
+def fetch_artifact(
+	*,
+	api_level: str,
+	artifact: ARTIFACT,
+	use_cache: bool = True,
+	manager: DownloadManager = None,
+) -> str:
+	'''Returns local path of artifact of API Level, downloading it only if it is not cached'''
+	if not manager:
+		with download_manager() as manager:
+			return fetch_artifact(
+				api_level=api_level, artifact=artifact, use_cache=use_cache, manager=manager
+			)
+
+	urls = artifact_urls(api_level=api_level, artifact=artifact)
+
+	if use_cache and (
+		object_path := cache_get(
+			api_level=api_level,
+			artifact=artifact,
+			expected_hash=artifact_hash(api_level=api_level, artifact=artifact),
+		)
+	):
+		logger.info(f'Found \'{artifact}\' artifact for API Level {api_level} in cache.')
+		return object_path
+
+	logger.info(f'Attempting to download \'{artifact}\' artifact from: {", ".join(urls)}')
+	if not use_cache:
+		download_path = tempfile.NamedTemporaryFile(delete=False).name
+		with span(f'download {artifact}', category='download') as download_span:
+			url = manager.download(urls=urls, path=download_path)
+			download_span.args['url'] = url
+			download_span.bytes = os.path.getsize(download_path)
+		logger.info(f'\'{artifact}\' artifact downloaded successfully from: {url}')
+		return download_path
+
+	os.makedirs(os.path.join(cache_dir(), 'tmp'), exist_ok=True)
+	download_path = tempfile.NamedTemporaryFile(
+		dir=os.path.join(cache_dir(), 'tmp'), delete=False
+	).name
+	download_hash = hashlib.sha256()
+	try:
+		with span(f'download {artifact}', category='download') as download_span:
+			url = manager.download(urls=urls, path=download_path, on_chunk=download_hash.update)
+			download_span.args['url'] = url
+			download_span.bytes = os.path.getsize(download_path)
+	except:
+		os.remove(download_path)
+		raise
+	logger.info(f'\'{artifact}\' artifact downloaded successfully from: {url}')
+	return cache_put(
+		api_level=api_level,
+		artifact=artifact,
+		path=download_path,
+		url=url,
+		object_hash=download_hash.hexdigest(),
+	)
+
+
+def stream_artifact(
+	*,
+	api_level: str,
+	artifact: ARTIFACT,
+	consume: Callable[[IO[bytes]], Any],
+	use_cache: bool = True,
+	manager: DownloadManager,
+	journal: ProgressJournal = None,
+) -> Any:
+	'''Passes artifact of API Level as file-like object to consume, and returns its result. If artifact is not cached, HTTP response is passed directly, while being copied to cache. If journal is passed, download progress is checkpointed to it, so interrupted downloads are continued with HTTP Range requests, and artifacts consumed already are skipped'''
+	urls = artifact_urls(api_level=api_level, artifact=artifact)
+	entry = journal.artifact(artifact) if journal else {}
+
+	if entry.get('consumed'):
+		logger.info(f'\'{artifact}\' artifact was consumed earlier. Skipping.')
+		return None
+
+	if use_cache and (
+		object_path := cache_get(
+			api_level=api_level,
+			artifact=artifact,
+			expected_hash=artifact_hash(api_level=api_level, artifact=artifact),
+		)
+	):
+		logger.info(f'Found \'{artifact}\' artifact for API Level {api_level} in cache.')
+		with span(f'cache {artifact}', category='cache') as cache_span:
+			cache_span.bytes = os.path.getsize(object_path)
+			with open(object_path, 'rb') as f:
+				result = consume(f)
+		if journal:
+			# [DOC] Cached objects are named by their hash
+			journal.update_artifact(artifact, consumed=True, hash=os.path.basename(object_path))
+		return result
+
+	os.makedirs(os.path.join(cache_dir(), 'tmp'), exist_ok=True)
+	offset = 0
+	if (
+		entry.get('partial')
+		and entry.get('url') in urls
+		and os.path.exists(entry['partial'])
+	):
+		spool_path = entry['partial']
+		offset = entry.get('bytes', 0)
+	else:
+		spool_path = tempfile.NamedTemporaryFile(
+			dir=os.path.join(cache_dir(), 'tmp'), delete=False
+		).name
+
+	try:
+		if offset and entry.get('complete'):
+			logger.info(f'\'{artifact}\' artifact was downloaded earlier. Attempting to consume it.')
+			url, object_hash = entry['url'], entry['hash']
+			with open(spool_path, 'rb') as f:
+				result = consume(f)
+		else:
+			# [DOC] Fresh downloads are consumed while downloaded, so span includes consuming them
+			with span(f'download {artifact}', category='download') as download_span:
+				# [DOC] Downloads are only continued from same source they were started from
+				result, object_hash, url = _stream_spool(
+					urls=[entry['url']] if offset else urls,
+					artifact=artifact,
+					spool_path=spool_path,
+					offset=offset,
+					etag=entry.get('etag'),
+					consume=consume,
+					manager=manager,
+					journal=journal,
+				)
+				download_span.args['url'] = url
+				download_span.bytes = os.path.getsize(spool_path) - offset
+	except:
+		# [DOC] Journaled partial downloads are kept to be continued
+		if not journal and os.path.exists(spool_path):
+			os.remove(spool_path)
+		raise
+	logger.info(f'\'{artifact}\' artifact streamed successfully!')
+
+	if journal:
+		journal.update_artifact(artifact, consumed=True, partial=None)
+	if use_cache:
+		cache_put(
+			api_level=api_level,
+			artifact=artifact,
+			path=spool_path,
+			url=url,
+			object_hash=object_hash,
+		)
+	else:
+		os.remove(spool_path)
+	return result
+
+
+def _stream_spool(
+	*,
+	urls: List[str],
+	artifact: ARTIFACT,
+	spool_path: str,
+	offset: int,
+	etag: Optional[str],
+	consume: Callable[[IO[bytes]], Any],
+	manager: DownloadManager,
+	journal: Optional[ProgressJournal],
+) -> Tuple[Any, str, str]:
+	'''Downloads fastest of urls to spool_path, continuing from offset, and returns consume result, hash of download, and url downloaded from. Fresh downloads are passed to consume while being downloaded, continued ones once completed'''
+	headers = {}
+	if offset:
+		headers['Range'] = f'bytes={offset}-'
+		# [DOC] Only continue if remote file did not change since download started
+		if etag:
+			headers['If-Range'] = etag
+	try:
+		url, response = manager.open_fastest(urls, headers=headers)
+	except DownloadError as e:
+		if e.status != 416:
+			raise
+		offset = 0
+		url, response = manager.open_fastest(urls)
+
+	with response:
+		if offset and response.status != 206:
+			logger.info(
+				f'Remote \'{artifact}\' artifact changed, or can\'t be continued. Attempting to download it again.'
+			)
+			offset = 0
+		if offset:
+			logger.info(
+				f'Attempting to continue \'{artifact}\' artifact download from byte {offset}: {url}'
+			)
+		else:
+			logger.info(f'Attempting to stream \'{artifact}\' artifact from: {url}')
+		if journal:
+			journal.update_artifact(
+				artifact,
+				url=url,
+				partial=spool_path,
+				etag=etag if offset else response.headers.get('ETag'),
+				bytes=offset,
+				complete=False,
+			)
+
+		with open(spool_path, 'r+b' if offset else 'wb') as spool_file:
+			spool_file.truncate(offset)
+			spool_file.seek(offset)
+			spool = JournaledFile(
+				fileobj=spool_file, journal=journal, artifact=artifact, offset=offset
+			)
+			reader = TeeReader(response, sink=spool)
+			result = consume(reader) if not offset else None
+			reader.drain()
+			spool.flush()
+
+	object_hash = reader.hexdigest() if not offset else hash_file(spool_path)
+	if journal:
+		journal.update_artifact(artifact, hash=object_hash, complete=True)
+	if offset:
+		with open(spool_path, 'rb') as f:
+			result = consume(f)
+	return result, object_hash, url
+
+
+def fetch_artifacts(
+	*,
+	api_level: str,
+	artifacts: List[ARTIFACT],
+	use_cache: bool = True,
+	max_concurrency: int = None,
+) -> Dict[ARTIFACT, str]:
+	'''Returns local paths of artifacts of API Level, downloading those not cached concurrently'''
+	with download_manager(max_concurrency=max_concurrency) as manager:
+		return manager.run(
+			{
+				artifact: (
+					lambda artifact=artifact: fetch_artifact(
+						api_level=api_level,
+						artifact=artifact,
+						use_cache=use_cache,
+						manager=manager,
+					)
+				)
+				for artifact in artifacts
+			}
+		)
+
+
+def stream_artifacts(
+	*,
+	api_level: str,
+	consumers: Dict[ARTIFACT, Callable[[IO[bytes]], Any]],
+	use_cache: bool = True,
+	max_concurrency: int = None,
+	journal: ProgressJournal = None,
+) -> Dict[ARTIFACT, Any]:
+	'''Streams artifacts of API Level to their consumers concurrently, returning consumers results'''
+	with download_manager(max_concurrency=max_concurrency) as manager:
+		return manager.run(
+			{
+				artifact: (
+					lambda artifact=artifact, consume=consume: stream_artifact(
+						api_level=api_level,
+						artifact=artifact,
+						consume=consume,
+						use_cache=use_cache,
+						manager=manager,
+						journal=journal,
+					)
+				)
+				for artifact, consume in consumers.items()
+			}
+		)
+
+
+def cache_command(args: argparse.Namespace):
+	if args.cache_command == 'ls':
+		entries = cache_entries()
+		if not entries:
+			logger.info(f'Cache at \'{cache_dir()}\' is empty.')
+			return
+		logger.info(f'Cache at \'{cache_dir()}\' has the following entries:')
+		for entry in entries:
+			logger.info(
+				f'- {entry["api_level"]}:{entry["artifact"]}  {entry["hash"][:12]}  {format_size(entry["size"])}  last used {time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["accessed"]))}'
+			)
+		logger.info(
+			f'Total: {format_size(sum({entry["hash"]: entry["size"] for entry in entries}.values()))}, of max {format_size(cache_max_size())}.'
+		)
+
+	elif args.cache_command == 'prune':
+		max_size = 0 if args.all else (args.max_size if args.max_size is not None else cache_max_size())
+		removed_entries = cache_prune(max_size=max_size)
+		logger.info(f'Pruned {len(removed_entries)} entries from cache.')
+
+		from nawah_cli.store import prune_store
+
+		removed_entries = prune_store()
+		logger.info(f'Pruned {len(removed_entries)} entries no app links to from framework store.')
+		if args.all:
+			from nawah_cli.wheelhouse import clear_wheelhouse
+
+			clear_wheelhouse()
+			logger.info('Cleared requirements wheelhouse.')
+
+			from nawah_cli.framework import clear_framework_cache
+
+			clear_framework_cache()
+			logger.info('Cleared unpacked frameworks.')
+
+			from nawah_cli.venvs import clear_venvs
+
+			clear_venvs()
+			logger.info('Cleared golden virtualenvs.')
+
+			if os.path.exists(os.path.join(cache_dir(), 'manifests')):
+				shutil.rmtree(os.path.join(cache_dir(), 'manifests'))
+			logger.info('Cleared artifacts manifests.')
+
+			if os.path.exists(os.path.join(cache_dir(), 'watch')):
+				shutil.rmtree(os.path.join(cache_dir(), 'watch'))
+			logger.info('Cleared config of apps created with \'watch\' CLI Arg.')
+
+			from nawah_cli.pool import clear_pool
+
+			clear_pool()
+			logger.info('Cleared warm pool of app skeletons.')
+
+			if os.path.exists(os.path.join(cache_dir(), 'gitpacks')):
+				shutil.rmtree(os.path.join(cache_dir(), 'gitpacks'))
+			logger.info('Cleared Git packfiles of frameworks.')
+
+	elif args.cache_command == 'warm':
+		for api_level in args.api_level:
+			try:
+				api_level = resolve_api_level(api_level)
+				fetch_artifacts(
+					api_level=api_level,
+					artifacts=list(ARTIFACTS_PATHS.keys()),
+					max_concurrency=args.max_concurrency,
+				)
+			except Exception as e:
+				logger.error(
+					f'An exception occurred while attempting to warm cache with artifacts for API Level {api_level}.'
+				)
+				logger.error(f'Exception details: {e}')
+				logger.error('Exiting.')
+				exit(1)
+		logger.info('Cache warmed successfully!')
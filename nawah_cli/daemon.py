@@ -0,0 +1,409 @@
+'''Pre-warmed Framework CLI daemon of app, that has framework imported, and runs every command in process forked from it, as zygote. Only supported on POSIX, as it passes stdin, stdout, and stderr of commands over Unix socket'''
+
+from nawah_cli.artifacts import cache_dir
+
+from typing import Dict, List, Any, Optional
+
+import os, sys, json, time, stat, struct, socket, hashlib
+
+# [DOC] Daemon exits once it served no command for this long, unless 'NAWAH_DAEMON_IDLE' Env Variable is set
+DEFAULT_DAEMON_IDLE = 30 * 60
+# [DOC] Max time to wait for new daemon to listen, before running command without it
+DAEMON_START_TIMEOUT = 30
+# [DOC] Sources of app are files of its root dir, such as 'nawah_app.py', and framework wheel, and files of
+# [DOC] its packages. Other dirs, such as 'nawah' framework stubs, are not checked for changes
+STAMP_APP_DIRS = ['packages']
+STAMP_SKIP_DIRS = ['.git', '.venv', '__pycache__', 'node_modules']
+STAMP_SUFFIXES = ('.py', '.whl', '.pth')
+
+
+def daemon_key(*, app_path: str, nawah_path: Optional[str]) -> str:
+	return hashlib.sha256(
+		f'{os.path.realpath(app_path)}|{nawah_path or ""}|{sys.executable}'.encode('utf-8')
+	).hexdigest()[:16]
+
+
+def daemon_paths(*, app_path: str, nawah_path: Optional[str]) -> Dict[str, str]:
+	'''Returns paths of socket, lock, and log of daemon of app'''
+	key = daemon_key(app_path=app_path, nawah_path=nawah_path)
+	daemons_dir = os.path.join(cache_dir(), 'daemons')
+	# [DOC] Unix sockets paths are limited to about 100 bytes, so use temp dir if cache path is long
+	if len(os.path.join(daemons_dir, f'{key}.sock')) > 100:
+		import tempfile
+
+		daemons_dir = os.path.join(tempfile.gettempdir(), f'nawah-daemons-{os.getuid()}')
+	return {
+		'dir': daemons_dir,
+		'socket': os.path.join(daemons_dir, f'{key}.sock'),
+		'lock': os.path.join(daemons_dir, f'{key}.lock'),
+		'log': os.path.join(daemons_dir, f'{key}.log'),
+	}
+
+
+def _stamp_files(stamp, *, root: str, files: List[str]):
+	for root_file in sorted(files):
+		if not root_file.endswith(STAMP_SUFFIXES):
+			continue
+		try:
+			file_stat = os.stat(os.path.join(root, root_file))
+		except FileNotFoundError:
+			continue
+		stamp.update(
+			f'{os.path.join(root, root_file)}|{file_stat.st_size}|{file_stat.st_mtime_ns}\n'.encode('utf-8')
+		)
+
+
+def sources_stamp(*, app_path: str, nawah_path: Optional[str]) -> str:
+	'''Returns hash of paths, sizes, and mtimes of framework wheel, and Python files, of root dir of app, of files of its packages, and of nawah_path, if passed, and of packages of app virtualenv. It is checked on every command, so it stats files of packages of app, and of nawah_path, on every command, but no other dirs of app'''
+	stamp = hashlib.sha256()
+	_stamp_files(
+		stamp,
+		root=app_path,
+		files=[
+			entry.name for entry in os.scandir(app_path) if entry.is_file(follow_symlinks=True)
+		],
+	)
+	for root_path in [os.path.join(app_path, app_dir) for app_dir in STAMP_APP_DIRS] + (
+		[nawah_path] if nawah_path else []
+	):
+		for root, dirs, files in os.walk(root_path):
+			dirs[:] = sorted(root_dir for root_dir in dirs if root_dir not in STAMP_SKIP_DIRS)
+			_stamp_files(stamp, root=root, files=files)
+	# [DOC] Installing, or removing, packages changes mtime of site-packages dir of app virtualenv
+	for venv_lib in ['lib', 'Lib']:
+		venv_lib_path = os.path.join(app_path, '.venv', venv_lib)
+		if os.path.isdir(venv_lib_path):
+			for site_path in sorted(os.listdir(venv_lib_path)):
+				stamp.update(
+					f'{site_path}|{os.stat(os.path.join(venv_lib_path, site_path)).st_mtime_ns}\n'.encode(
+						'utf-8'
+					)
+				)
+	return stamp.hexdigest()
+
+
+def _secure_dir(path: str) -> bool:
+	'''Creates dir of daemons, if it does not exist, only accessible by user. Returns whether it is owned by user, and not writable by others, as sockets in it are trusted with commands, Env Variables, and streams'''
+	try:
+		os.makedirs(path, mode=0o700, exist_ok=True)
+		dir_stat = os.lstat(path)
+	except OSError:
+		return False
+	return (
+		stat.S_ISDIR(dir_stat.st_mode)
+		and dir_stat.st_uid == os.getuid()
+		and not dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+	)
+
+
+def _send_message(conn: socket.socket, message: Dict[str, Any], fds: List[int] = None):
+	'''Sends length-prefixed JSON message, with file descriptors, if any, over Unix socket'''
+	payload = json.dumps(message).encode('utf-8')
+	header = struct.pack('!I', len(payload))
+	if fds:
+		import array
+
+		conn.sendmsg(
+			[header], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))]
+		)
+	else:
+		conn.sendall(header)
+	conn.sendall(payload)
+
+
+def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+	data = b''
+	while len(data) < size:
+		chunk = conn.recv(size - len(data))
+		if not chunk:
+			raise ConnectionError('Connection closed before message was received')
+		data += chunk
+	return data
+
+
+def _recv_message(conn: socket.socket, max_fds: int = 0) -> Any:
+	'''Receives length-prefixed JSON message, returning it, and file descriptors sent with it'''
+	import array
+
+	fds = array.array('i')
+	header, ancdata, _, _ = conn.recvmsg(4, socket.CMSG_LEN(max_fds * fds.itemsize) if max_fds else 0)
+	for level, kind, data in ancdata:
+		if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+			fds.frombytes(data[: len(data) - (len(data) % fds.itemsize)])
+	if len(header) < 4:
+		header += _recv_exactly(conn, 4 - len(header))
+	(size,) = struct.unpack('!I', header)
+	return json.loads(_recv_exactly(conn, size)), list(fds)
+
+
+def _redirect_streams(fds: List[int]):
+	'''Makes fds of command stdin, stdout, and stderr of forked process, including for loggers that write to them'''
+	import io, logging
+
+	old_streams = [sys.stdin, sys.stdout, sys.stderr]
+	for target_fd, fd in enumerate(fds):
+		os.dup2(fd, target_fd)
+		os.close(fd)
+	sys.stdin = io.TextIOWrapper(io.FileIO(0, 'r', closefd=False))
+	sys.stdout = io.TextIOWrapper(
+		io.FileIO(1, 'w', closefd=False), line_buffering=os.isatty(1), write_through=not os.isatty(1)
+	)
+	sys.stderr = io.TextIOWrapper(
+		io.FileIO(2, 'w', closefd=False), line_buffering=True, write_through=True
+	)
+	new_streams = [sys.stdin, sys.stdout, sys.stderr]
+	# [DOC] Stream handlers created while framework was imported keep streams of daemon
+	for logger in [logging.getLogger()] + [
+		logger
+		for logger in logging.Logger.manager.loggerDict.values()
+		if isinstance(logger, logging.Logger)
+	]:
+		for handler in logger.handlers:
+			if isinstance(handler, logging.StreamHandler) and handler.stream in old_streams:
+				handler.stream = new_streams[old_streams.index(handler.stream)]
+
+
+def _run_command(
+	*, conn: socket.socket, listener: socket.socket, request: Dict[str, Any], fds: List[int], nawah_cli
+):
+	'''Runs command of request in forked process, with its stdin, stdout, stderr, working directory, and env, then exits with its exit code'''
+	listener.close()
+	exit_code = 1
+	try:
+		_redirect_streams(fds)
+		os.chdir(request['cwd'])
+		os.environ.clear()
+		os.environ.update(request['env'])
+		sys.argv = request['argv']
+		_send_message(conn, {'pid': os.getpid()})
+		try:
+			nawah_cli()
+			exit_code = 0
+		except SystemExit as e:
+			if e.code is None or isinstance(e.code, int):
+				exit_code = e.code or 0
+			else:
+				print(e.code, file=sys.stderr)
+				exit_code = 1
+		except KeyboardInterrupt:
+			exit_code = 130
+		except BaseException:
+			import traceback
+
+			traceback.print_exc()
+	finally:
+		try:
+			sys.stdout.flush()
+			sys.stderr.flush()
+			_send_message(conn, {'exit': exit_code})
+		finally:
+			os._exit(exit_code)
+
+
+def serve(*, app_path: str, nawah_path: Optional[str]):
+	'''Loads Framework CLI of app, then serves commands, until idle, or until app sources change'''
+	import fcntl, signal
+
+	from nawah_cli.__main__ import load_framework_cli
+
+	paths = daemon_paths(app_path=app_path, nawah_path=nawah_path)
+	if not _secure_dir(paths['dir']):
+		print(f'Dir of daemons \'{paths["dir"]}\' is not owned by user, or is writable by others. Exiting.')
+		return
+	lock_file = open(paths['lock'], 'a')
+	try:
+		fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+	except BlockingIOError:
+		print('Framework CLI daemon of app is running already. Exiting.')
+		return
+
+	os.chdir(app_path)
+	stamp = sources_stamp(app_path=app_path, nawah_path=nawah_path)
+	nawah_cli = load_framework_cli(nawah_path=nawah_path)
+
+	if os.path.exists(paths['socket']):
+		os.remove(paths['socket'])
+	listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	listener.bind(paths['socket'])
+	os.chmod(paths['socket'], 0o600)
+	listener.listen(64)
+	listener.settimeout(1)
+	# [DOC] Forked commands are reaped as they exit
+	signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+	print(f'Framework CLI daemon of app at \'{app_path}\' is listening on: {paths["socket"]}')
+
+	idle = int(os.environ.get('NAWAH_DAEMON_IDLE') or DEFAULT_DAEMON_IDLE)
+	last_active = time.time()
+	children = set()
+	try:
+		while True:
+			while children:
+				pid, _ = os.waitpid(-1, os.WNOHANG)
+				if not pid:
+					break
+				children.discard(pid)
+			if children:
+				last_active = time.time()
+			elif time.time() - last_active > idle:
+				print('Framework CLI daemon is idle. Exiting.')
+				return
+			try:
+				conn, _ = listener.accept()
+			except socket.timeout:
+				continue
+			last_active = time.time()
+			with conn:
+				conn.settimeout(10)
+				try:
+					request, fds = _recv_message(conn, max_fds=3)
+				except Exception as e:
+					print(f'Failed to receive command: {e}')
+					continue
+				if request.get('command') == 'stop':
+					_send_message(conn, {'stopped': True})
+					print('Framework CLI daemon was stopped.')
+					return
+				if sources_stamp(app_path=app_path, nawah_path=nawah_path) != stamp:
+					for fd in fds:
+						os.close(fd)
+					_send_message(conn, {'stale': True})
+					print('App sources, or framework changed. Exiting.')
+					return
+				# [DOC] Streams of daemon are flushed, so forked command does not write them again
+				sys.stdout.flush()
+				sys.stderr.flush()
+				pid = os.fork()
+				if not pid:
+					conn.settimeout(None)
+					_run_command(
+						conn=conn, listener=listener, request=request, fds=fds, nawah_cli=nawah_cli
+					)
+				children.add(pid)
+				for fd in fds:
+					os.close(fd)
+	finally:
+		listener.close()
+		try:
+			os.remove(paths['socket'])
+		except FileNotFoundError:
+			pass
+		lock_file.close()
+
+
+def start_daemon(*, app_path: str, nawah_path: Optional[str]):
+	'''Starts daemon of app in new session, detached from terminal, logging to its log file'''
+	import subprocess
+
+	paths = daemon_paths(app_path=app_path, nawah_path=nawah_path)
+	with open(paths['log'], 'a') as log_file:
+		return subprocess.Popen(
+			[sys.executable, '-m', 'nawah_cli.daemon', app_path]
+			+ (['--nawah-path', nawah_path] if nawah_path else []),
+			cwd=app_path,
+			stdin=subprocess.DEVNULL,
+			stdout=log_file,
+			stderr=subprocess.STDOUT,
+			start_new_session=True,
+		)
+
+
+def _connect(socket_path: str) -> Optional[socket.socket]:
+	conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		conn.connect(socket_path)
+		return conn
+	except OSError:
+		conn.close()
+		return None
+
+
+def _request(*, conn: socket.socket) -> Optional[int]:
+	'''Sends command of this process to daemon, forwarding interrupts to it, and returns its exit code, or None if daemon is stale'''
+	import signal
+
+	_send_message(
+		conn,
+		{'argv': sys.argv, 'cwd': os.getcwd(), 'env': dict(os.environ)},
+		fds=[sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()],
+	)
+	response, _ = _recv_message(conn)
+	if response.get('stale'):
+		return None
+	pid = response['pid']
+
+	# [DOC] Forked command is not in process group of terminal, so interrupts are forwarded to it
+	def forward(signum, _):
+		try:
+			os.kill(pid, signum)
+		except ProcessLookupError:
+			pass
+
+	for signum in [signal.SIGINT, signal.SIGTERM, signal.SIGHUP]:
+		signal.signal(signum, forward)
+	while True:
+		try:
+			response, _ = _recv_message(conn)
+			return response['exit']
+		except InterruptedError:
+			continue
+		except ConnectionError:
+			# [DOC] Command was killed before it could send its exit code
+			return 1
+
+
+def run_in_daemon(*, app_path: str, nawah_path: Optional[str]) -> Optional[int]:
+	'''Runs command of this process in daemon of app, starting it, or a new one if it is stale, if needed. Returns exit code of command, or None if it can't be run in daemon, for it to be run in this process'''
+	if os.name != 'posix':
+		return None
+	paths = daemon_paths(app_path=app_path, nawah_path=nawah_path)
+	if not _secure_dir(paths['dir']):
+		print(
+			f'Dir of daemons \'{paths["dir"]}\' is not owned by user, or is writable by others. Running command without daemon.'
+		)
+		return None
+	socket_path = paths['socket']
+	for _ in range(2):
+		if not (conn := _connect(socket_path)):
+			print('Attempting to start Framework CLI daemon of app.')
+			process = start_daemon(app_path=app_path, nawah_path=nawah_path)
+			start = time.time()
+			while not (conn := _connect(socket_path)):
+				if process.poll() is not None or time.time() - start > DAEMON_START_TIMEOUT:
+					print('Failed to start Framework CLI daemon of app. Running command without it.')
+					return None
+				time.sleep(0.01)
+		with conn:
+			try:
+				exit_code = _request(conn=conn)
+			except (OSError, ValueError, KeyError) as e:
+				print(f'Failed to run command in Framework CLI daemon: {e}. Running command without it.')
+				return None
+		if exit_code is not None:
+			return exit_code
+		print('App sources, or framework changed since Framework CLI daemon started. Attempting to restart it.')
+		# [DOC] Wait for stale daemon to release its socket
+		start = time.time()
+		while os.path.exists(socket_path) and time.time() - start < DAEMON_START_TIMEOUT:
+			time.sleep(0.01)
+	return None
+
+
+def stop_daemon(*, app_path: str, nawah_path: Optional[str]):
+	paths = daemon_paths(app_path=app_path, nawah_path=nawah_path)
+	if not _secure_dir(paths['dir']) or not (conn := _connect(paths['socket'])):
+		print('No Framework CLI daemon of app is running.')
+		return
+	with conn:
+		_send_message(conn, {'command': 'stop'})
+		_recv_message(conn)
+	print('Framework CLI daemon of app stopped successfully!')
+
+
+if __name__ == '__main__':
+	import argparse
+
+	parser = argparse.ArgumentParser(description='Pre-warmed Framework CLI daemon of Nawah app')
+	parser.add_argument('app_path', type=str)
+	parser.add_argument('--nawah-path', type=str)
+	daemon_args = parser.parse_args()
+	serve(app_path=os.path.realpath(daemon_args.app_path), nawah_path=daemon_args.nawah_path)
@@ -0,0 +1,366 @@
+from typing import IO, Dict, List, Tuple, Callable, Any, Optional
+
+import os, json, time, http.client, logging, threading, hashlib, urllib.parse, urllib.request, concurrent.futures
+
+logger = logging.getLogger('nawah')
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_CONCURRENCY = 4
+MAX_REDIRECTS = 5
+# [DOC] Max number of sources of one artifact requested at once, fastest first
+RACE_SOURCES = 2
+# [DOC] Weight of latest latency of source in its moving average
+LATENCY_WEIGHT = 0.3
+# [DOC] Latency recorded for source that failed to respond
+FAILURE_LATENCY = 30.0
+
+
+class DownloadError(Exception):
+	def __init__(self, *, url: str, status: int, reason: str):
+		super().__init__(f'Request to \'{url}\' failed with status {status}: {reason}')
+		self.url = url
+		self.status = status
+
+
+class TeeReader:
+	'''File-like wrapper that hashes, and optionally copies to sink, everything read from fileobj'''
+
+	def __init__(self, fileobj: IO[bytes], *, sink: IO[bytes] = None):
+		self._fileobj = fileobj
+		self._sink = sink
+		self._hash = hashlib.sha256()
+		self.size = 0
+
+	def read(self, size: int = -1) -> bytes:
+		chunk = self._fileobj.read(size)
+		self._hash.update(chunk)
+		self.size += len(chunk)
+		if self._sink:
+			self._sink.write(chunk)
+		return chunk
+
+	def drain(self):
+		'''Reads rest of fileobj, for consumers that stop reading before its end'''
+		while self.read(CHUNK_SIZE):
+			pass
+
+	def hexdigest(self) -> str:
+		return self._hash.hexdigest()
+
+
+class PooledResponse:
+	'''File-like wrapper of HTTP response that returns its connection to pool once closed'''
+
+	def __init__(
+		self,
+		*,
+		pool: 'ConnectionPool',
+		host_key: Tuple[str, str, int],
+		connection: http.client.HTTPConnection,
+		response: http.client.HTTPResponse,
+		url: str,
+	):
+		self._pool = pool
+		self._host_key = host_key
+		self._connection = connection
+		self._response = response
+		self.url = url
+		self.status = response.status
+		self.headers = response.headers
+
+	def read(self, size: Optional[int] = None) -> bytes:
+		# [DOC] Size of -1 reads until connection is closed, which keep-alive connections are not, so None is used to read whole body
+		return self._response.read(None if size is not None and size < 0 else size)
+
+	def readinto(self, buffer) -> int:
+		return self._response.readinto(buffer)
+
+	def close(self):
+		if self._connection is None:
+			return
+		# [DOC] Connection can only be reused if response body was consumed completely
+		if self._response.isclosed() and not self._response.will_close:
+			self._pool._release(self._host_key, self._connection)
+		else:
+			self._response.close()
+			self._connection.close()
+		self._connection = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *_):
+		self.close()
+
+
+class ConnectionPool:
+	'''Pool of keep-alive HTTP(S) connections, per host'''
+
+	def __init__(self, *, max_per_host: int = DEFAULT_MAX_CONCURRENCY, timeout: float = 60):
+		self.max_per_host = max_per_host
+		self.timeout = timeout
+		self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+		self._lock = threading.Lock()
+
+	def _acquire(self, host_key: Tuple[str, str, int]) -> http.client.HTTPConnection:
+		with self._lock:
+			if self._idle.get(host_key):
+				return self._idle[host_key].pop()
+		scheme, host, port = host_key
+		if scheme == 'https':
+			return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+		return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+	def _release(self, host_key: Tuple[str, str, int], connection: http.client.HTTPConnection):
+		with self._lock:
+			idle = self._idle.setdefault(host_key, [])
+			if len(idle) < self.max_per_host:
+				idle.append(connection)
+				return
+		connection.close()
+
+	def request(self, url: str, *, headers: Dict[str, str] = None) -> PooledResponse:
+		'''Sends GET request to url, following redirects, and returns the open response'''
+		for _ in range(MAX_REDIRECTS + 1):
+			url_parts = urllib.parse.urlsplit(url)
+			host_key = (
+				url_parts.scheme,
+				url_parts.hostname,
+				url_parts.port or (443 if url_parts.scheme == 'https' else 80),
+			)
+			path = url_parts.path or '/'
+			if url_parts.query:
+				path += f'?{url_parts.query}'
+
+			# [DOC] Idle connection could have been dropped by server, so retry once on fresh one
+			for attempt in range(2):
+				connection = self._acquire(host_key)
+				try:
+					connection.request(
+						'GET',
+						path,
+						headers={
+							'Connection': 'keep-alive',
+							'User-Agent': 'nawah_cli',
+							**(headers or {}),
+						},
+					)
+					response = connection.getresponse()
+					break
+				except (http.client.HTTPException, ConnectionError):
+					connection.close()
+					if attempt:
+						raise
+
+			pooled_response = PooledResponse(
+				pool=self, host_key=host_key, connection=connection, response=response, url=url
+			)
+			if response.status in (301, 302, 303, 307, 308):
+				pooled_response.read()
+				pooled_response.close()
+				url = urllib.parse.urljoin(url, response.headers['Location'])
+				continue
+			if response.status >= 400:
+				pooled_response.close()
+				raise DownloadError(url=url, status=response.status, reason=response.reason)
+			return pooled_response
+
+		raise DownloadError(url=url, status=0, reason='Too many redirects')
+
+	def close(self):
+		with self._lock:
+			for connections in self._idle.values():
+				for connection in connections:
+					connection.close()
+			self._idle = {}
+
+
+class SourceStats:
+	'''Moving average of latency of every source, by origin, until it responds, kept in JSON file at path across runs'''
+
+	def __init__(self, *, path: str):
+		self.path = path
+		self._latencies: Optional[Dict[str, float]] = None
+		self._changed = False
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _origin(url: str) -> str:
+		url_parts = urllib.parse.urlsplit(url)
+		return f'{url_parts.scheme}://{url_parts.netloc}'
+
+	def _load(self) -> Dict[str, float]:
+		if self._latencies is None:
+			try:
+				with open(self.path, 'r') as stats_file:
+					self._latencies = json.loads(stats_file.read())
+			except (FileNotFoundError, json.JSONDecodeError):
+				self._latencies = {}
+		return self._latencies
+
+	def rank(self, urls: List[str]) -> List[str]:
+		'''Returns urls sorted by latency of their sources, with sources with no record first, so they get measured'''
+		with self._lock:
+			latencies = self._load()
+			return sorted(urls, key=lambda url: latencies.get(self._origin(url), 0))
+
+	def record(self, url: str, latency: Optional[float]):
+		'''Records latency of source of url, or failure of it if latency is None'''
+		latency = FAILURE_LATENCY if latency is None else latency
+		with self._lock:
+			latencies = self._load()
+			origin = self._origin(url)
+			latencies[origin] = (
+				latency
+				if origin not in latencies
+				else latencies[origin] * (1 - LATENCY_WEIGHT) + latency * LATENCY_WEIGHT
+			)
+			self._changed = True
+
+	def save(self):
+		with self._lock:
+			if not self._changed:
+				return
+			os.makedirs(os.path.dirname(self.path), exist_ok=True)
+			with open(f'{self.path}.{os.getpid()}.{threading.get_ident()}', 'w') as stats_file:
+				stats_file.write(json.dumps(self._latencies))
+			os.replace(f'{self.path}.{os.getpid()}.{threading.get_ident()}', self.path)
+			self._changed = False
+
+
+class DownloadManager:
+	'''Runs downloads concurrently on thread pool, sharing keep-alive connections per host. With sources stats, artifacts with many sources are requested from fastest sources at once'''
+
+	def __init__(
+		self,
+		*,
+		max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+		sources: SourceStats = None,
+		timeout: float = 60,
+	):
+		self.max_concurrency = max(1, max_concurrency)
+		self.pool = ConnectionPool(max_per_host=self.max_concurrency, timeout=timeout)
+		self.sources = sources
+
+	def open(self, url: str, *, headers: Dict[str, str] = None):
+		# [DOC] Proxies are only supported by urllib, so defer to it if one is configured for url
+		url_parts = urllib.parse.urlsplit(url)
+		if url_parts.scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(
+			url_parts.hostname
+		):
+			return urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}))
+		return self.pool.request(url, headers=headers)
+
+	def _open_timed(self, url: str, *, headers: Dict[str, str] = None):
+		start = time.perf_counter()
+		try:
+			response = self.open(url, headers=headers)
+		except:
+			if self.sources:
+				self.sources.record(url, None)
+			raise
+		if self.sources:
+			self.sources.record(url, time.perf_counter() - start)
+		return response
+
+	def _race(
+		self, urls: List[str], *, headers: Dict[str, str], errors: List[Exception]
+	) -> Optional[Tuple[str, Any]]:
+		'''Requests urls at once, returning url, and response, of first to respond successfully, or None if all fail. Responses of rest are closed as they arrive, without waiting for them'''
+		winner: List[Tuple[str, Any]] = []
+		pending = set(urls)
+		lock = threading.Lock()
+		done = threading.Event()
+		start = time.perf_counter()
+
+		def attempt(url: str):
+			try:
+				response = self.open(url, headers=headers)
+			except Exception as e:
+				with lock:
+					errors.append(e)
+					pending.discard(url)
+					if not pending and not winner:
+						done.set()
+				if self.sources:
+					self.sources.record(url, None)
+				return
+			latency = time.perf_counter() - start
+			with lock:
+				# [DOC] Sources that had not responded once winner did had their latency recorded already
+				record = url in pending
+				pending.discard(url)
+				if not winner:
+					winner.append((url, response))
+					if self.sources:
+						# [DOC] Sources still pending are slower than winner, by margin not known yet
+						for pending_url in pending:
+							self.sources.record(pending_url, latency * 2)
+					pending.clear()
+					done.set()
+			if record and self.sources:
+				self.sources.record(url, latency)
+			if winner[0][1] is not response:
+				# [DOC] Closing response of slower source before reading it drops its connection
+				response.close()
+
+		for url in urls:
+			threading.Thread(target=attempt, args=(url,), daemon=True).start()
+		done.wait()
+		return winner[0] if winner else None
+
+	def open_fastest(
+		self, urls: List[str], *, headers: Dict[str, str] = None
+	) -> Tuple[str, Any]:
+		'''Requests urls, RACE_SOURCES of them at once, fastest first, returning url, and response, of first to respond successfully. Following urls are only requested if all raced ones fail'''
+		if len(urls) == 1:
+			return urls[0], self._open_timed(urls[0], headers=headers)
+
+		urls = self.sources.rank(urls) if self.sources else urls
+		errors: List[Exception] = []
+		for i in range(0, len(urls), RACE_SOURCES):
+			if winner := self._race(urls[i : i + RACE_SOURCES], headers=headers, errors=errors):
+				logger.debug(f'Fastest source of {urls[i : i + RACE_SOURCES]} is: {winner[0]}')
+				return winner
+			if i + RACE_SOURCES < len(urls):
+				logger.warning(
+					f'Failed to request any of {urls[i : i + RACE_SOURCES]}. Attempting next sources.'
+				)
+		raise errors[-1]
+
+	def download(
+		self, *, urls: List[str], path: str, on_chunk: Callable[[bytes], None] = None
+	) -> str:
+		'''Downloads from fastest of urls to path, returning url downloaded from'''
+		url, response = self.open_fastest(urls)
+		with response, open(path, 'wb') as f:
+			while chunk := response.read(CHUNK_SIZE):
+				f.write(chunk)
+				if on_chunk:
+					on_chunk(chunk)
+		return url
+
+	def run(self, jobs: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+		'''Runs jobs concurrently, returning their results by key. Raises first job exception, if any, after all jobs finish'''
+		if not jobs:
+			return {}
+		with concurrent.futures.ThreadPoolExecutor(
+			max_workers=min(self.max_concurrency, len(jobs))
+		) as executor:
+			futures = {key: executor.submit(job) for key, job in jobs.items()}
+			concurrent.futures.wait(futures.values())
+		for future in futures.values():
+			if future.exception():
+				raise future.exception()
+		return {key: future.result() for key, future in futures.items()}
+
+	def close(self):
+		self.pool.close()
+		if self.sources:
+			self.sources.save()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *_):
+		self.close()
@@ -0,0 +1,174 @@
+from nawah_cli.artifacts import cache_dir
+
+from typing import Dict, Any, Optional
+
+import os, sys, json, time, hashlib, shutil, threading
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+# [DOC] Unpacked frameworks not used for this long are removed once another is unpacked
+FRAMEWORK_MAX_AGE = 30 * 24 * 60 * 60
+# [DOC] Written in framework unpacked into app, with hash of wheel it was unpacked from
+APP_FRAMEWORK_STAMP = '.wheel'
+
+
+def framework_cache_dir() -> str:
+	return os.path.join(cache_dir(), 'framework')
+
+
+def _wheel_stamp(whl_path: str) -> Dict[str, Any]:
+	whl_stat = os.stat(whl_path)
+	return {'size': whl_stat.st_size, 'mtime': whl_stat.st_mtime_ns, 'inode': whl_stat.st_ino}
+
+
+def _read_wheels() -> Dict[str, Any]:
+	try:
+		with open(os.path.join(framework_cache_dir(), 'wheels.json'), 'r') as wheels_file:
+			return json.loads(wheels_file.read())
+	except (FileNotFoundError, json.JSONDecodeError):
+		return {}
+
+
+def _write_wheels(wheels: Dict[str, Any]):
+	wheels_path = os.path.join(framework_cache_dir(), 'wheels.json')
+	# [DOC] Temp name is unique per thread, as apps are created on threads of one process by library API
+	tmp_path = f'{wheels_path}.{os.getpid()}.{threading.get_ident()}'
+	with open(tmp_path, 'w') as wheels_file:
+		wheels_file.write(json.dumps(wheels))
+	os.replace(tmp_path, wheels_path)
+
+
+def wheel_hash(*, whl_path: str) -> str:
+	'''Returns hash of framework wheel, re-hashing it only if it changed since last hashed'''
+	whl_path = os.path.realpath(whl_path)
+	whl_stamp = _wheel_stamp(whl_path)
+	wheels = _read_wheels()
+	if wheels.get(whl_path, {}).get('stamp') == whl_stamp:
+		return wheels[whl_path]['hash']
+
+	whl_hash = hashlib.sha256()
+	with open(whl_path, 'rb') as whl_file:
+		while chunk := whl_file.read(1024 * 1024):
+			whl_hash.update(chunk)
+	wheels[whl_path] = {'stamp': whl_stamp, 'hash': whl_hash.hexdigest()}
+	os.makedirs(framework_cache_dir(), exist_ok=True)
+	_write_wheels(wheels)
+	return wheels[whl_path]['hash']
+
+
+def _compiled_marker(*, framework_path: str) -> str:
+	# [DOC] Bytecode is specific to interpreter, so it is compiled once per interpreter cache tag
+	return os.path.join(framework_path, f'.compiled.{sys.implementation.cache_tag}')
+
+
+def unpack_framework(*, whl_path: str, framework_path: str):
+	'''Unpacks framework wheel into framework_path, by unpacking it to temp dir that replaces framework_path, so it is never left partial'''
+	# [DOC] Only needed when framework is not cached, so not to slow down loading cached framework
+	import zipfile
+
+	tmp_path = f'{framework_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+	if os.path.exists(tmp_path):
+		shutil.rmtree(tmp_path)
+	try:
+		with zipfile.ZipFile(whl_path) as whl_file:
+			whl_file.extractall(tmp_path)
+		try:
+			os.replace(tmp_path, framework_path)
+		except OSError:
+			# [DOC] Another process, or thread unpacked same framework first
+			pass
+	finally:
+		# [DOC] Temp dir is only left if wheel failed to unpack, or was unpacked by another first
+		shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def compile_framework(*, framework_path: str):
+	'''Compiles unpacked framework to unchecked hash-based bytecode, as unpacked framework is never modified'''
+	import compileall, py_compile
+
+	if not compileall.compile_dir(
+		framework_path,
+		quiet=2,
+		workers=0,
+		invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+	):
+		raise Exception(f'Failed to compile framework at: {framework_path}')
+	open(_compiled_marker(framework_path=framework_path), 'w').close()
+
+
+def _app_framework_path(whl_path: str) -> str:
+	return os.path.splitext(os.path.realpath(whl_path))[0]
+
+
+def unpack_app_framework(*, whl_path: str) -> str:
+	'''Unpacks framework wheel of app next to it, for it to be compiled with app, and shipped with it, such as into container images. Returns path of unpacked framework'''
+	framework_path = _app_framework_path(whl_path)
+	whl_hash = wheel_hash(whl_path=whl_path)
+	if app_framework_path(whl_path=whl_path):
+		return framework_path
+	if os.path.exists(framework_path):
+		shutil.rmtree(framework_path)
+	unpack_framework(whl_path=whl_path, framework_path=framework_path)
+	# [DOC] Unpacked framework ignores itself, as it is built from wheel of app
+	with open(os.path.join(framework_path, '.gitignore'), 'w') as gitignore_file:
+		gitignore_file.write('*\n')
+	# [DOC] Hash of wheel is written last, so framework unpacked partially is never loaded
+	with open(os.path.join(framework_path, APP_FRAMEWORK_STAMP), 'w') as stamp_file:
+		stamp_file.write(whl_hash)
+	return framework_path
+
+
+def app_framework_path(*, whl_path: str) -> Optional[str]:
+	'''Returns path of framework unpacked into app by 'compile', if it was unpacked from wheel of app as it is now'''
+	framework_path = _app_framework_path(whl_path)
+	try:
+		with open(os.path.join(framework_path, APP_FRAMEWORK_STAMP), 'r') as stamp_file:
+			if stamp_file.read() == wheel_hash(whl_path=whl_path):
+				return framework_path
+	except FileNotFoundError:
+		pass
+	return None
+
+
+def prune_frameworks(*, keep: str):
+	now = time.time()
+	for framework_name in os.listdir(framework_cache_dir()):
+		framework_path = os.path.join(framework_cache_dir(), framework_name)
+		if framework_name == keep or not os.path.isdir(framework_path):
+			continue
+		try:
+			if now - os.stat(framework_path).st_mtime > FRAMEWORK_MAX_AGE:
+				shutil.rmtree(framework_path)
+		except FileNotFoundError:
+			pass
+
+
+def cached_framework_path(*, whl_path: str) -> str:
+	'''Returns path of framework wheel unpacked, and compiled, in cache, keyed by wheel hash, unpacking it if not cached yet'''
+	whl_hash = wheel_hash(whl_path=whl_path)
+	framework_path = os.path.join(framework_cache_dir(), whl_hash)
+
+	if not os.path.exists(framework_path):
+		print(f'Attempting to unpack Nawah framework wheel to: {framework_path}')
+		unpack_framework(whl_path=whl_path, framework_path=framework_path)
+		prune_frameworks(keep=whl_hash)
+	if not os.path.exists(_compiled_marker(framework_path=framework_path)):
+		# [DOC] Framework is compiled by one process, or thread at a time, as they write same bytecode files
+		with open(f'{framework_path}.lock', 'a') as lock_file:
+			if fcntl:
+				fcntl.flock(lock_file, fcntl.LOCK_EX)
+			if not os.path.exists(_compiled_marker(framework_path=framework_path)):
+				print('Attempting to compile Nawah framework.')
+				compile_framework(framework_path=framework_path)
+
+	# [DOC] Mark framework as used, for it not to be pruned
+	os.utime(framework_path)
+	return framework_path
+
+
+def clear_framework_cache():
+	if os.path.exists(framework_cache_dir()):
+		shutil.rmtree(framework_cache_dir())
@@ -0,0 +1,156 @@
+from nawah_cli.artifacts import cache_dir
+from nawah_cli.trace import span
+
+from typing import IO, Dict, List, Optional
+
+import os, json, glob, shutil, hashlib, logging, threading, subprocess
+
+logger = logging.getLogger('nawah')
+
+
+def _git(*args: str, cwd: str) -> bytes:
+	'''Returns stdout of Git call, raising its stderr if it failed'''
+	git_call = subprocess.run(['git', *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	if git_call.returncode != 0:
+		raise Exception(
+			f'\'git {args[0]}\' exited with code {git_call.returncode}: {git_call.stderr.decode("utf-8", "replace").strip()}'
+		)
+	return git_call.stdout
+
+
+def _quote_path(path: bytes) -> bytes:
+	# [REF] https://git-scm.com/docs/git-fast-import#_filemodify
+	if b'\n' not in path and not path.startswith(b'"'):
+		return path
+	return b'"' + path.replace(b'\\', b'\\\\').replace(b'"', b'\\"').replace(b'\n', b'\\n') + b'"'
+
+
+def _write_data(stream: IO[bytes], path: str):
+	stream.write(f'data {os.path.getsize(path)}\n'.encode('utf-8'))
+	with open(path, 'rb') as f:
+		shutil.copyfileobj(f, stream)
+	stream.write(b'\n')
+
+
+def pack_key(*, api_level: str, hashes: Dict[str, str]) -> str:
+	'''Returns key of cached packfile of files written from artifacts of API Level, with hashes'''
+	return hashlib.sha256(
+		json.dumps({'api_level': api_level, 'hashes': hashes}, sort_keys=True).encode('utf-8')
+	).hexdigest()
+
+
+def cached_pack(*, key: str, app_path: str, rel_paths: List[str]) -> Dict[str, str]:
+	'''Returns SHA-1 of Git blob of every file at rel_paths of app, from packfile of them cached by key. Packfile is built on first call, from files of app, with one 'git fast-import' call, in temp repo, that is renamed once it is built'''
+	pack_path = os.path.join(cache_dir(), 'gitpacks', key)
+	if not os.path.exists(os.path.join(pack_path, 'blobs.json')):
+		tmp_path = os.path.join(
+			cache_dir(), 'gitpacks', f'.{key}.{os.getpid()}.{threading.get_ident()}.tmp'
+		)
+		shutil.rmtree(tmp_path, ignore_errors=True)
+		_git('init', '--quiet', '--bare', tmp_path, cwd=app_path)
+		try:
+			with span('build git pack', category='subprocess') as pack_span:
+				import_call = subprocess.Popen(
+					[
+						'git',
+						'-c',
+						# [DOC] Objects are always written to pack, rather than loose objects, to be cached
+						'fastimport.unpackLimit=0',
+						'fast-import',
+						'--quiet',
+						f'--export-marks={os.path.join(tmp_path, "marks")}',
+					],
+					cwd=tmp_path,
+					stdin=subprocess.PIPE,
+				)
+				for mark, rel_path in enumerate(rel_paths, 1):
+					import_call.stdin.write(f'blob\nmark :{mark}\n'.encode('utf-8'))
+					_write_data(import_call.stdin, os.path.join(app_path, rel_path))
+				import_call.stdin.close()
+				if import_call.wait() != 0:
+					raise Exception(f'\'git fast-import\' exited with code {import_call.returncode}')
+				pack_span.files = len(rel_paths)
+
+			with open(os.path.join(tmp_path, 'marks'), 'r') as marks_file:
+				marks = dict(line.strip()[1:].split(' ') for line in marks_file if line.strip())
+			with open(os.path.join(tmp_path, 'objects', 'pack', 'blobs.json'), 'w') as blobs_file:
+				blobs_file.write(
+					json.dumps(
+						{rel_path: marks[str(mark)] for mark, rel_path in enumerate(rel_paths, 1)}
+					)
+				)
+			try:
+				os.rename(os.path.join(tmp_path, 'objects', 'pack'), pack_path)
+			except OSError:
+				# [DOC] Packfile was cached by another app first
+				pass
+		finally:
+			shutil.rmtree(tmp_path, ignore_errors=True)
+
+	for pack_file in glob.glob(os.path.join(pack_path, 'pack-*')):
+		target_path = os.path.join(app_path, '.git', 'objects', 'pack', os.path.basename(pack_file))
+		if os.path.exists(target_path):
+			continue
+		# [DOC] Packfiles are never written once created, so they are hardlinked, where possible
+		try:
+			os.link(pack_file, target_path)
+		except OSError:
+			shutil.copyfile(pack_file, target_path)
+	with open(os.path.join(pack_path, 'blobs.json'), 'r') as blobs_file:
+		return json.loads(blobs_file.read())
+
+
+def import_commit(
+	*,
+	app_path: str,
+	message: str,
+	pack: Optional[Dict[str, str]] = None,
+	exclude: List[str] = None,
+) -> Dict[str, int]:
+	'''Commits all files of app not ignored by Git, or in exclude, as 'git add .', and 'git commit' do, but with one 'git fast-import' stream, rather than building index, and writing one object per file. Files in pack are referred to by SHA-1 of their blobs, and not read. Returns number of files committed, and bytes streamed'''
+	stats = {'files': 0, 'bytes': 0}
+	ref = _git('symbolic-ref', 'HEAD', cwd=app_path).strip()
+	author = _git('var', 'GIT_AUTHOR_IDENT', cwd=app_path).strip()
+	committer = _git('var', 'GIT_COMMITTER_IDENT', cwd=app_path).strip()
+	rel_paths = sorted(
+		rel_path
+		for rel_path in _git('ls-files', '-z', '--others', '--exclude-standard', cwd=app_path).split(b'\0')
+		if rel_path and os.fsdecode(rel_path) not in (exclude or [])
+	)
+	message_bytes = message.encode('utf-8')
+
+	with span('git fast-import', category='subprocess') as import_span:
+		import_call = subprocess.Popen(
+			['git', 'fast-import', '--quiet'], cwd=app_path, stdin=subprocess.PIPE
+		)
+		stream = import_call.stdin
+		stream.write(b'commit ' + ref + b'\n')
+		stream.write(b'author ' + author + b'\n')
+		stream.write(b'committer ' + committer + b'\n')
+		stream.write(f'data {len(message_bytes)}\n'.encode('utf-8') + message_bytes + b'\n')
+		for rel_path in rel_paths:
+			file_path = os.path.join(app_path.encode('utf-8'), rel_path)
+			if os.path.islink(file_path):
+				target = os.readlink(file_path)
+				stream.write(b'M 120000 inline ' + _quote_path(rel_path) + b'\n')
+				stream.write(f'data {len(target)}\n'.encode('utf-8') + target + b'\n')
+			else:
+				mode = b'100755' if os.stat(file_path).st_mode & 0o111 else b'100644'
+				if pack and (blob := pack.get(os.fsdecode(rel_path))):
+					stream.write(b'M ' + mode + b' ' + blob.encode('utf-8') + b' ' + _quote_path(rel_path) + b'\n')
+				else:
+					stream.write(b'M ' + mode + b' inline ' + _quote_path(rel_path) + b'\n')
+					_write_data(stream, os.fsdecode(file_path))
+					stats['bytes'] += os.path.getsize(file_path)
+			stats['files'] += 1
+		stream.write(b'\n')
+		stream.close()
+		if import_call.wait() != 0:
+			raise Exception(f'\'git fast-import\' exited with code {import_call.returncode}')
+		import_span.files, import_span.bytes = stats['files'], stats['bytes']
+
+	# [DOC] Index is built from commit, for app to show no changes
+	with span('git read-tree', category='subprocess'):
+		_git('read-tree', 'HEAD', cwd=app_path)
+		_git('update-index', '-q', '--refresh', cwd=app_path)
+	return stats
@@ -0,0 +1,180 @@
+from nawah_cli.artifacts import ARTIFACT, index_urls, cache_dir
+from nawah_cli.download import DownloadError, DownloadManager, SourceStats
+
+from typing import Dict, List, Any, Optional
+
+import argparse, os, json, time, logging, threading
+
+logger = logging.getLogger('nawah')
+
+# [DOC] Seconds index cached locally is used for, before it is revalidated
+DEFAULT_INDEX_TTL = 10 * 60
+# [DOC] Index is optional, so it is never waited for as long as artifacts are
+INDEX_TIMEOUT = 5
+
+_index: Optional[Dict[str, Any]] = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def index_ttl() -> int:
+	'''Returns TTL of index cached locally, honouring 'NAWAH_INDEX_TTL' Env Variable'''
+	return int(os.environ.get('NAWAH_INDEX_TTL') or DEFAULT_INDEX_TTL)
+
+
+def _cached_index_path() -> str:
+	return os.path.join(cache_dir(), 'remote_index.json')
+
+
+def _read_cached_index() -> Dict[str, Any]:
+	try:
+		with open(_cached_index_path(), 'r') as index_file:
+			return json.loads(index_file.read())
+	except (FileNotFoundError, json.JSONDecodeError):
+		return {}
+
+
+def _write_cached_index(cached: Dict[str, Any]):
+	os.makedirs(cache_dir(), exist_ok=True)
+	tmp_path = f'{_cached_index_path()}.{os.getpid()}.{threading.get_ident()}'
+	with open(tmp_path, 'w') as index_file:
+		index_file.write(json.dumps(cached))
+	os.replace(tmp_path, _cached_index_path())
+
+
+def _revalidate_index(cached: Dict[str, Any]) -> Dict[str, Any]:
+	'''Requests index with validators of cached one, returning cached one if not modified, new one if modified, or cached one, stale, if request fails. Sources with no index are cached as having none, not to request them again before TTL'''
+	headers = {}
+	if cached.get('etag'):
+		headers['If-None-Match'] = cached['etag']
+	if cached.get('last_modified'):
+		headers['If-Modified-Since'] = cached['last_modified']
+
+	with DownloadManager(
+		sources=SourceStats(path=os.path.join(cache_dir(), 'sources.json')),
+		timeout=INDEX_TIMEOUT,
+	) as manager:
+		try:
+			url, response = manager.open_fastest(index_urls(), headers=headers)
+			with response:
+				content = response.read()
+		except DownloadError as e:
+			if e.status != 404:
+				logger.warning(f'Failed to request index of API Levels: {e}')
+				return cached
+			logger.debug(f'No index of API Levels was found: {e}')
+			return {'fetched': time.time(), 'index': None}
+		except Exception as e:
+			# [DOC] Not modified responses raise exception if requested through proxy
+			if getattr(e, 'code', None) != 304:
+				logger.warning(f'Failed to request index of API Levels: {e}')
+				return cached
+			return {**cached, 'fetched': time.time()}
+
+	if response.status == 304:
+		logger.debug('Index of API Levels was not modified.')
+		return {**cached, 'fetched': time.time()}
+	return {
+		'url': url,
+		'etag': response.headers.get('ETag'),
+		'last_modified': response.headers.get('Last-Modified'),
+		'fetched': time.time(),
+		'index': json.loads(content),
+	}
+
+
+def remote_index(*, refresh: bool = False, revalidate: bool = True) -> Optional[Dict[str, Any]]:
+	'''Returns index of API Levels, and hashes of their artifacts, of artifacts sources, or None if they have none. Index is cached locally, and only revalidated, with conditional request, once older than TTL, or if refresh. If not revalidate, index cached locally is used at any age, with no request. It is loaded once per process'''
+	global _index, _index_loaded
+
+	with _index_lock:
+		if _index_loaded and not refresh:
+			return _index
+		cached = _read_cached_index()
+		if refresh or (
+			revalidate and (not cached or time.time() - cached.get('fetched', 0) > index_ttl())
+		):
+			revalidated = _revalidate_index(cached)
+			if revalidated is not cached:
+				_write_cached_index(revalidated)
+			cached = revalidated
+		_index, _index_loaded = cached.get('index'), True
+		return _index
+
+
+def _api_level_key(api_level: str):
+	return tuple(int(part) for part in api_level.split('.'))
+
+
+def index_api_levels(index: Dict[str, Any]) -> List[str]:
+	return sorted(index.get('api_levels', {}).keys(), key=_api_level_key)
+
+
+def latest_api_level(index: Dict[str, Any]) -> str:
+	return index.get('latest') or index_api_levels(index)[-1]
+
+
+def resolve_api_level(api_level: str) -> str:
+	'''Returns API Level, resolving 'latest' to latest API Level of index. Raises ValueError if API Level is not in index, or if 'latest' can't be resolved, as there is no index'''
+	from nawah_cli.cache import api_level_cached
+
+	# [DOC] API Levels with all artifacts cached are created with index cached locally, at any age, or
+	# [DOC] with none, so apps are created offline, with no request waiting for timeout
+	index = remote_index(revalidate=api_level == 'latest' or not api_level_cached(api_level=api_level))
+	if api_level == 'latest':
+		if not index or not index_api_levels(index):
+			raise ValueError('API Level \'latest\' can\'t be resolved, as no index of API Levels was found')
+		return latest_api_level(index)
+	if index and api_level not in index.get('api_levels', {}):
+		# [DOC] Index loaded with no request could be stale, missing API Levels released since
+		index = remote_index(refresh=True)
+	if index and api_level not in index.get('api_levels', {}):
+		raise ValueError(
+			f'API Level {api_level} is not available. Available API Levels are: {", ".join(index_api_levels(index))}'
+		)
+	return api_level
+
+
+def artifact_hash(*, api_level: str, artifact: ARTIFACT) -> Optional[str]:
+	'''Returns hash of artifact of API Level in index, if any'''
+	index = remote_index()
+	if not index:
+		return None
+	return (
+		index.get('api_levels', {})
+		.get(api_level, {})
+		.get('artifacts', {})
+		.get(artifact, {})
+		.get('hash')
+	)
+
+
+def api_levels_command(args: argparse.Namespace):
+	from nawah_cli.cache import cache_entries
+
+	index = remote_index(refresh=args.refresh)
+	if not index:
+		logger.error('No index of API Levels was found at artifacts sources. Exiting.')
+		exit(1)
+
+	cached = {(entry['api_level'], entry['artifact']): entry['hash'] for entry in cache_entries()}
+	latest = latest_api_level(index)
+	logger.info('Available API Levels are:')
+	for api_level in index_api_levels(index):
+		artifacts = index['api_levels'][api_level].get('artifacts', {})
+		states = [
+			'stale'
+			if cached.get((api_level, artifact)) != entry.get('hash')
+			else 'cached'
+			for artifact, entry in artifacts.items()
+			if (api_level, artifact) in cached
+		]
+		if not states:
+			state = 'not cached'
+		elif 'stale' in states:
+			state = 'stale in cache'
+		elif len(states) < len(artifacts):
+			state = 'partly cached'
+		else:
+			state = 'cached'
+		logger.info(f'- {api_level}{" (latest)" if api_level == latest else ""}: {state}')
@@ -0,0 +1,129 @@
+from typing import IO, Dict, List, Any, Optional
+
+import argparse, os, json, threading
+
+# [DOC] Min number of bytes downloaded between two checkpoints of an artifact
+CHECKPOINT_SIZE = 1024 * 1024
+
+
+class ProgressJournal:
+	'''Durable record of progress of creating app, kept in 'progress.json' of app. Besides steps completed, it records every artifact download completed bytes, hash, and whether it was consumed already. Progress of earlier versions has number of step to continue from, instead of steps, as step'''
+
+	def __init__(
+		self,
+		*,
+		path: str,
+		args: Dict[str, Any],
+		app_config: Dict[str, Any],
+		steps: Optional[List[str]] = None,
+		step: Optional[int] = None,
+		artifacts: Dict[str, Dict[str, Any]] = None,
+	):
+		self.path = path
+		self.args = args
+		self.config = app_config
+		self.steps = steps
+		self.step = step
+		self.artifacts = artifacts or {}
+		self._lock = threading.Lock()
+
+	@classmethod
+	def create(
+		cls, *, path: str, args: argparse.Namespace, app_config: Dict[str, Any]
+	) -> 'ProgressJournal':
+		return cls(
+			path=path,
+			args={
+				'app_path': args.app_path,
+				'app_name': args.app_name,
+				'api_level': args.api_level,
+			},
+			app_config=app_config,
+			steps=[],
+		)
+
+	@classmethod
+	def load(cls, *, path: str) -> 'ProgressJournal':
+		with open(path, 'r') as progress_file:
+			progress_config = json.loads(progress_file.read())
+		return cls(
+			path=path,
+			args=progress_config['args'],
+			app_config=progress_config['config'],
+			steps=progress_config.get('steps'),
+			step=progress_config.get('step'),
+			artifacts=progress_config.get('artifacts'),
+		)
+
+	def save(self):
+		'''Writes journal to new file that replaces 'progress.json', so it is never left partial'''
+		with self._lock:
+			with open(f'{self.path}.tmp', 'w') as progress_file:
+				progress_file.write(
+					json.dumps(
+						{
+							'steps': self.steps,
+							**({'step': self.step} if self.step is not None else {}),
+							'args': self.args,
+							'config': self.config,
+							'artifacts': self.artifacts,
+						}
+					)
+				)
+				progress_file.flush()
+				os.fsync(progress_file.fileno())
+			os.replace(f'{self.path}.tmp', self.path)
+
+	def complete_step(self, step: str):
+		with self._lock:
+			self.steps.append(step)
+		self.save()
+
+	def artifact(self, artifact: str) -> Dict[str, Any]:
+		with self._lock:
+			return dict(self.artifacts.get(artifact, {}))
+
+	def update_artifact(self, artifact: str, **attrs: Any):
+		with self._lock:
+			self.artifacts.setdefault(artifact, {}).update(attrs)
+		self.save()
+
+	def remove(self):
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+
+class JournaledFile:
+	'''File-like sink that checkpoints number of bytes durably written to it to journal'''
+
+	def __init__(
+		self,
+		*,
+		fileobj: IO[bytes],
+		journal: Optional[ProgressJournal],
+		artifact: str,
+		offset: int = 0,
+	):
+		self._fileobj = fileobj
+		self._journal = journal
+		self._artifact = artifact
+		self.size = offset
+		self._checkpoint_size = offset
+
+	def write(self, chunk: bytes):
+		self._fileobj.write(chunk)
+		self.size += len(chunk)
+		if self._journal and self.size - self._checkpoint_size >= CHECKPOINT_SIZE:
+			self.flush()
+
+	def flush(self):
+		# [DOC] Bytes are recorded only after being synced, so journal never exceeds file
+		self._fileobj.flush()
+		os.fsync(self._fileobj.fileno())
+		self._checkpoint_size = self.size
+		if self._journal:
+			self._journal.update_artifact(self._artifact, bytes=self.size)
+
+	def close(self):
+		self.flush()
+		self._fileobj.close()
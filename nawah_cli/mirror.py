@@ -0,0 +1,200 @@
+from nawah_cli.artifacts import ARTIFACTS_PATHS, INDEX_PATH
+from nawah_cli.cache import fetch_artifacts, format_size
+from nawah_cli.index import latest_api_level, resolve_api_level
+
+from typing import Dict, List, Any, Optional, Tuple
+
+import argparse, os, json, time, shutil, logging, email.utils, http.server
+
+logger = logging.getLogger('nawah')
+
+# [DOC] Mirror index is served as index of API Levels. Mirrors synced by earlier versions have it as LEGACY_MIRROR_INDEX
+MIRROR_INDEX = INDEX_PATH
+LEGACY_MIRROR_INDEX = 'mirror.json'
+
+
+def _read_mirror_index(*, path: str) -> Dict[str, Any]:
+	for index_name in [MIRROR_INDEX, LEGACY_MIRROR_INDEX]:
+		try:
+			with open(os.path.join(path, index_name), 'r') as index_file:
+				return json.loads(index_file.read())
+		except (FileNotFoundError, json.JSONDecodeError):
+			pass
+	return {'api_levels': {}}
+
+
+def _link_file(*, src: str, dst: str):
+	'''Links src to dst, falling back to copying, through temp file that replaces dst, so mirror never serves partial file'''
+	os.makedirs(os.path.dirname(dst), exist_ok=True)
+	temp_path = os.path.join(os.path.dirname(dst), f'.{os.path.basename(dst)}.{os.getpid()}')
+	try:
+		os.link(src, temp_path)
+	except OSError:
+		shutil.copyfile(src, temp_path)
+	os.replace(temp_path, dst)
+
+
+def mirror_sync(
+	*, path: str, api_levels: List[str], max_concurrency: int = None
+) -> Dict[str, Any]:
+	'''Fetches artifacts of API Levels, through cache, into mirror at path, laid out as ARTIFACTS_PATHS, and records them, and latest API Level, in mirror index'''
+	index = _read_mirror_index(path=path)
+	for api_level in api_levels:
+		logger.info(f'Attempting to sync artifacts of API Level {api_level} to mirror.')
+		artifacts_paths = fetch_artifacts(
+			api_level=api_level,
+			artifacts=list(ARTIFACTS_PATHS.keys()),
+			max_concurrency=max_concurrency,
+		)
+		index['api_levels'][api_level] = {'synced': time.time(), 'artifacts': {}}
+		for artifact, artifact_path in artifacts_paths.items():
+			mirror_path = ARTIFACTS_PATHS[artifact].format(api_level=api_level)
+			_link_file(src=artifact_path, dst=os.path.join(path, mirror_path))
+			index['api_levels'][api_level]['artifacts'][artifact] = {
+				'path': mirror_path,
+				# [DOC] Cached artifacts are named by their hash
+				'hash': os.path.basename(artifact_path),
+				'size': os.path.getsize(artifact_path),
+			}
+
+	index['latest'] = latest_api_level({'api_levels': index['api_levels']})
+	with open(os.path.join(path, f'{MIRROR_INDEX}.{os.getpid()}'), 'w') as index_file:
+		index_file.write(json.dumps(index))
+	os.replace(os.path.join(path, f'{MIRROR_INDEX}.{os.getpid()}'), os.path.join(path, MIRROR_INDEX))
+	return index
+
+
+class MirrorRequestHandler(http.server.SimpleHTTPRequestHandler):
+	'''Serves mirror files over persistent HTTP/1.1 connections, with single byte range requests, for downloads to be continued, and zero-copy sendfile where supported'''
+
+	protocol_version = 'HTTP/1.1'
+
+	def log_message(self, format: str, *args: Any):
+		logger.debug(f'{self.address_string()} - {format % args}')
+
+	def _byte_range(self, size: int, etag: str) -> Optional[Tuple[int, int]]:
+		'''Returns first, and last byte of requested range, None if whole file is to be served, or raises ValueError if range can't be satisfied'''
+		byte_range = self.headers.get('Range')
+		if not byte_range or not byte_range.startswith('bytes=') or ',' in byte_range:
+			return None
+		# [DOC] Range only applies if file did not change since If-Range ETag
+		if self.headers.get('If-Range') and self.headers['If-Range'] != etag:
+			return None
+		first, _, last = byte_range[len('bytes=') :].strip().partition('-')
+		if not first:
+			first, last = max(0, size - int(last)), size - 1
+		else:
+			first, last = int(first), min(int(last), size - 1) if last else size - 1
+		if first >= size or first > last:
+			raise ValueError()
+		return first, last
+
+	def _not_modified(self, file_stat: os.stat_result, etag: str) -> bool:
+		if self.headers.get('If-None-Match'):
+			return etag in [tag.strip() for tag in self.headers['If-None-Match'].split(',')]
+		if self.headers.get('If-Modified-Since'):
+			try:
+				return int(file_stat.st_mtime) <= email.utils.parsedate_to_datetime(
+					self.headers['If-Modified-Since']
+				).timestamp()
+			except (TypeError, ValueError):
+				return False
+		return False
+
+	def send_head(self):
+		file_path = self.translate_path(self.path)
+		if not os.path.isfile(file_path):
+			self.send_error(404, 'File not found')
+			return None
+		file = open(file_path, 'rb')
+		file_stat = os.fstat(file.fileno())
+		etag = f'"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"'
+		# [DOC] Conditional requests, such as of index, are answered with no body if file did not change
+		if self._not_modified(file_stat, etag):
+			file.close()
+			self.send_response(304)
+			self.send_header('ETag', etag)
+			self.end_headers()
+			return None
+		try:
+			byte_range = self._byte_range(file_stat.st_size, etag)
+		except ValueError:
+			file.close()
+			self.send_response(416)
+			self.send_header('Content-Range', f'bytes */{file_stat.st_size}')
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+			return None
+		first, last = byte_range or (0, file_stat.st_size - 1)
+
+		self.send_response(206 if byte_range else 200)
+		self.send_header('Content-Type', self.guess_type(file_path))
+		self.send_header('Content-Length', str(last - first + 1))
+		self.send_header('Accept-Ranges', 'bytes')
+		self.send_header('ETag', etag)
+		self.send_header('Last-Modified', email.utils.formatdate(file_stat.st_mtime, usegmt=True))
+		if byte_range:
+			self.send_header('Content-Range', f'bytes {first}-{last}/{file_stat.st_size}')
+		self.end_headers()
+		self._range = (first, last - first + 1)
+		return file
+
+	def copyfile(self, source, outputfile):
+		offset, count = self._range
+		self.wfile.flush()
+		# [DOC] socket.sendfile falls back to copying where os.sendfile is not available
+		self.connection.sendfile(source, offset=offset, count=count)
+
+
+def mirror_serve(*, path: str, host: str, port: int):
+	'''Serves mirror at path, until interrupted'''
+	server = http.server.ThreadingHTTPServer(
+		(host, port),
+		lambda *args: MirrorRequestHandler(*args, directory=path),
+	)
+	# [DOC] Accept bursts of connections of many workers creating apps at once
+	server.request_queue_size = 1024
+	server.daemon_threads = True
+	logger.info(
+		f'Serving mirror at \'{path}\' on http://{host}:{server.server_address[1]}. Set \'NAWAH_MIRROR_URL\' Env Variable of workers to it.'
+	)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+
+def mirror_command(args: argparse.Namespace):
+	mirror_path = os.path.realpath(args.path)
+
+	if args.mirror_command == 'sync':
+		try:
+			args.api_level = [resolve_api_level(api_level) for api_level in args.api_level]
+			index = mirror_sync(
+				path=mirror_path,
+				api_levels=args.api_level,
+				max_concurrency=args.max_concurrency,
+			)
+		except Exception as e:
+			logger.error('An exception occurred while attempting to sync mirror.')
+			logger.error(f'Exception details: {e}')
+			logger.error('Exiting.')
+			exit(1)
+		for api_level in args.api_level:
+			logger.info(
+				f'- API Level {api_level}: {format_size(sum(artifact["size"] for artifact in index["api_levels"][api_level]["artifacts"].values()))}'
+			)
+		logger.info(f'Mirror at \'{mirror_path}\' synced successfully!')
+
+	elif args.mirror_command == 'serve':
+		if not any(
+			os.path.exists(os.path.join(mirror_path, index_name))
+			for index_name in [MIRROR_INDEX, LEGACY_MIRROR_INDEX]
+		):
+			logger.error(
+				f'No mirror was found at \'{mirror_path}\'. Run \'nawah mirror sync\' first. Exiting.'
+			)
+			exit(1)
+		mirror_serve(path=mirror_path, host=args.host, port=args.port)
@@ -0,0 +1,249 @@
+from nawah_cli.artifacts import cache_dir
+from nawah_cli.archive import extract_archive
+from nawah_cli.journal import ProgressJournal
+from nawah_cli.template import MANIFEST_NAME, TemplateRenderer
+from nawah_cli.trace import span
+
+from typing import Dict, List, Any, Optional
+
+import argparse, os, sys, json, time, uuid, shutil, logging, subprocess
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+logger = logging.getLogger('nawah')
+
+# [DOC] Written in skeleton once it is built completely, with files of template, and hashes of artifacts it was built from
+SKELETON_NAME = '.nawah_skeleton.json'
+# [DOC] Steps of 'create' skeletons are built with, so they are completed once one is claimed
+SKELETON_STEPS = ['workspace', 'template', 'framework', 'stubs', 'requirements', 'git init']
+
+
+def pool_dir(api_level: str = None) -> str:
+	'''Returns path of warm pool, honouring 'NAWAH_POOL_DIR' Env Variable. Skeletons are claimed by renaming them, so pool should be on same file system as apps'''
+	path = os.path.realpath(os.environ.get('NAWAH_POOL_DIR') or os.path.join(cache_dir(), 'pool'))
+	return os.path.join(path, api_level) if api_level else path
+
+
+def _read_target(api_level: str) -> Optional[int]:
+	try:
+		with open(os.path.join(pool_dir(api_level), 'target.json'), 'r') as target_file:
+			return json.loads(target_file.read())['size']
+	except (FileNotFoundError, json.JSONDecodeError, KeyError):
+		return None
+
+
+def _write_target(api_level: str, size: int):
+	target_path = os.path.join(pool_dir(api_level), 'target.json')
+	with open(f'{target_path}.{os.getpid()}', 'w') as target_file:
+		target_file.write(json.dumps({'size': size}))
+	os.replace(f'{target_path}.{os.getpid()}', target_path)
+
+
+def pool_skeletons(api_level: str) -> List[str]:
+	'''Returns paths of skeletons of API Level ready to be claimed'''
+	if not os.path.exists(pool_dir(api_level)):
+		return []
+	return sorted(
+		os.path.join(pool_dir(api_level), skeleton_name)
+		for skeleton_name in os.listdir(pool_dir(api_level))
+		if os.path.exists(os.path.join(pool_dir(api_level), skeleton_name, SKELETON_NAME))
+	)
+
+
+def build_skeleton(*, api_level: str, artifacts_paths: Dict[str, str]) -> str:
+	'''Builds skeleton of app of API Level from cached artifacts, with template extracted, but not rendered, framework, stubs, and requirements written, and Git repo initialised. Skeleton is built in temp dir, that is renamed once it is built, so it is never claimed partial'''
+	skeleton_id = uuid.uuid4().hex
+	tmp_path = os.path.join(pool_dir(api_level), f'.{skeleton_id}.tmp')
+	try:
+		with open(artifacts_paths['template'], 'rb') as template_file:
+			extract_archive(
+				fileobj=template_file,
+				path=tmp_path,
+				root_path=f'nawah_app_template-APIv{api_level}',
+			)
+		files = [
+			os.path.relpath(os.path.join(root, root_file), tmp_path).replace(os.sep, '/')
+			for root, _, root_files in os.walk(tmp_path)
+			for root_file in root_files
+		]
+		shutil.copyfile(
+			artifacts_paths['framework'], os.path.join(tmp_path, f'framework-{api_level}.whl')
+		)
+		with open(artifacts_paths['stubs'], 'rb') as stubs_file:
+			extract_archive(fileobj=stubs_file, path=os.path.join(tmp_path, 'nawah'), root_path='.')
+		shutil.copyfile(artifacts_paths['requirements'], os.path.join(tmp_path, 'requirements.txt'))
+		if subprocess.call(
+			['git', 'init', '--quiet'],
+			cwd=tmp_path,
+			stdout=subprocess.DEVNULL,
+			stderr=subprocess.DEVNULL,
+		):
+			raise Exception('\'git init\' call failed')
+		with open(os.path.join(tmp_path, SKELETON_NAME), 'w') as skeleton_file:
+			skeleton_file.write(
+				json.dumps(
+					{
+						'api_level': api_level,
+						'files': files,
+						# [DOC] Cached objects are named by their hash
+						'hashes': {
+							artifact: os.path.basename(artifact_path)
+							for artifact, artifact_path in artifacts_paths.items()
+						},
+						'built': time.time(),
+					}
+				)
+			)
+		os.replace(tmp_path, os.path.join(pool_dir(api_level), skeleton_id))
+	except:
+		shutil.rmtree(tmp_path, ignore_errors=True)
+		raise
+	return os.path.join(pool_dir(api_level), skeleton_id)
+
+
+def fill_pool(*, api_level: str, size: int, max_concurrency: int = None) -> Optional[int]:
+	'''Builds skeletons of API Level until pool has size of them, dropping these built from artifacts that changed since. Returns number of skeletons built, or None if pool is being filled already by another process'''
+	from nawah_cli.cache import fetch_artifacts
+
+	os.makedirs(pool_dir(api_level), exist_ok=True)
+	with open(os.path.join(pool_dir(api_level), '.lock'), 'a') as lock_file:
+		if fcntl:
+			try:
+				fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except BlockingIOError:
+				return None
+		_write_target(api_level, size)
+
+		artifacts_paths = fetch_artifacts(
+			api_level=api_level,
+			artifacts=['template', 'framework', 'stubs', 'requirements'],
+			max_concurrency=max_concurrency,
+		)
+		hashes = {
+			artifact: os.path.basename(artifact_path)
+			for artifact, artifact_path in artifacts_paths.items()
+		}
+		for skeleton_name in os.listdir(pool_dir(api_level)):
+			# [DOC] Skeletons left partial by interrupted fills are removed
+			if skeleton_name.endswith('.tmp'):
+				shutil.rmtree(os.path.join(pool_dir(api_level), skeleton_name), ignore_errors=True)
+		for skeleton_path in pool_skeletons(api_level):
+			if _read_skeleton(skeleton_path).get('hashes') != hashes:
+				logger.info(f'Skeleton \'{skeleton_path}\' is stale, as artifacts changed. Removing it.')
+				shutil.rmtree(skeleton_path, ignore_errors=True)
+
+		built = 0
+		while len(pool_skeletons(api_level)) < size:
+			with span('build skeleton', category='pool'):
+				build_skeleton(api_level=api_level, artifacts_paths=artifacts_paths)
+			built += 1
+		return built
+
+
+def _read_skeleton(skeleton_path: str) -> Dict[str, Any]:
+	try:
+		with open(os.path.join(skeleton_path, SKELETON_NAME), 'r') as skeleton_file:
+			return json.loads(skeleton_file.read())
+	except (FileNotFoundError, json.JSONDecodeError):
+		return {}
+
+
+def claim_skeleton(
+	*, api_level: str, app_path: str, journal: ProgressJournal
+) -> Optional[Dict[str, Any]]:
+	'''Claims skeleton of API Level as app at app_path, by renaming it, which is atomic, so every skeleton is claimed by one app only, and saves journal with steps skeleton completed. Skeleton file is kept in app until it is rendered. Returns skeleton attrs, or None if pool has no skeleton that can be claimed'''
+	from nawah_cli.index import artifact_hash
+
+	for skeleton_path in pool_skeletons(api_level):
+		skeleton = _read_skeleton(skeleton_path)
+		# [DOC] Skeletons of artifacts that changed at their sources are left for fill to remove
+		if any(
+			(expected_hash := artifact_hash(api_level=api_level, artifact=artifact))
+			and expected_hash != object_hash
+			for artifact, object_hash in skeleton.get('hashes', {}).items()
+		):
+			continue
+		try:
+			os.rename(skeleton_path, app_path)
+		except FileNotFoundError:
+			# [DOC] Skeleton was claimed by another app first
+			continue
+		except OSError as e:
+			logger.debug(f'Failed to claim skeleton \'{skeleton_path}\': {e}')
+			return None
+		# [DOC] Journal is saved right after claiming skeleton, as app with no progress can't be created again
+		journal.steps.extend(SKELETON_STEPS)
+		for artifact, object_hash in skeleton['hashes'].items():
+			journal.artifacts.setdefault(artifact, {})['hash'] = object_hash
+		journal.save()
+		return skeleton
+	return None
+
+
+def render_skeleton(*, app_path: str, skeleton: Dict[str, Any], renderer: TemplateRenderer):
+	'''Renders files, and renames paths of template of claimed skeleton for app, as extracting template does'''
+	if os.path.exists(os.path.join(app_path, MANIFEST_NAME)):
+		with open(os.path.join(app_path, MANIFEST_NAME), 'r') as manifest_file:
+			renderer.load_manifest(json.loads(manifest_file.read()))
+		os.remove(os.path.join(app_path, MANIFEST_NAME))
+	renderer.render_tree(
+		path=app_path,
+		files=[(rel_path, rel_path) for rel_path in skeleton['files'] if rel_path != MANIFEST_NAME],
+	)
+
+
+def refill_pool(*, api_level: str):
+	'''Fills pool of API Level back to its size in background process, if it was filled before'''
+	if not (size := _read_target(api_level)):
+		return
+	with open(os.path.join(pool_dir(api_level), 'fill.log'), 'a') as log_file:
+		# [DOC] Run from pool dir, as Nawah CLI runs framework CLI if run from app dir
+		subprocess.Popen(
+			[sys.executable, '-m', 'nawah_cli', 'pool', 'fill', '--api-level', api_level, '--size', str(size)],
+			cwd=pool_dir(api_level),
+			stdin=subprocess.DEVNULL,
+			stdout=log_file,
+			stderr=subprocess.STDOUT,
+			start_new_session=True,
+		)
+
+
+def clear_pool():
+	if os.path.exists(pool_dir()):
+		shutil.rmtree(pool_dir())
+
+
+def pool_command(args: argparse.Namespace):
+	from nawah_cli.index import resolve_api_level
+
+	if args.pool_command == 'fill':
+		try:
+			api_level = resolve_api_level(args.api_level)
+			logger.info(f'Attempting to fill pool of API Level {api_level} with {args.size} skeletons.')
+			built = fill_pool(api_level=api_level, size=args.size, max_concurrency=args.max_concurrency)
+		except Exception as e:
+			logger.error(f'An exception occurred while attempting to fill pool of API Level {args.api_level}.')
+			logger.error(f'Exception details: {e}')
+			logger.error('Exiting.')
+			exit(1)
+		if built is None:
+			logger.info(f'Pool of API Level {api_level} is being filled already by another process.')
+			return
+		logger.info(f'Pool filled successfully, with {built} skeletons built!')
+
+	elif args.pool_command == 'ls':
+		if not os.path.exists(pool_dir()):
+			logger.info(f'Pool at \'{pool_dir()}\' is empty.')
+			return
+		logger.info(f'Pool at \'{pool_dir()}\' has the following skeletons:')
+		for api_level in sorted(os.listdir(pool_dir())):
+			logger.info(
+				f'- {api_level}: {len(pool_skeletons(api_level))} of {_read_target(api_level) or 0} skeletons'
+			)
+
+	elif args.pool_command == 'clear':
+		clear_pool()
+		logger.info('Pool cleared successfully!')
@@ -0,0 +1,85 @@
+from nawah_cli.trace import span
+
+from typing import Dict, List, Iterable, Callable, Any
+
+import concurrent.futures
+
+
+class StepError(Exception):
+	def __init__(self, *, step: 'Step', error: BaseException):
+		super().__init__(f'Step \'{step.name}\' failed: {error}')
+		self.step = step
+		self.error = error
+
+
+class Step:
+	'''Unit of work that runs once all of its requires are provided by other steps. Step provides its own name, besides provides'''
+
+	def __init__(
+		self,
+		*,
+		name: str,
+		func: Callable[[], Any],
+		requires: List[str] = None,
+		provides: List[str] = None,
+	):
+		self.name = name
+		self.func = func
+		self.requires = requires or []
+		self.provides = [name] + (provides or [])
+
+
+def run_steps(
+	*,
+	steps: List[Step],
+	completed: Iterable[str] = None,
+	on_complete: Callable[[Step], None] = None,
+	max_workers: int = None,
+) -> List[str]:
+	'''Runs steps not completed earlier, each as soon as its requires are provided, running independent steps concurrently. Returns names of steps run, in order of completion. If step fails, no more steps are started, and StepError of it is raised once running steps finish'''
+	completed = set(completed or [])
+	provided = {output for step in steps if step.name in completed for output in step.provides}
+	pending = [step for step in steps if step.name not in completed]
+
+	all_provides = {output for step in steps for output in step.provides}
+	for step in pending:
+		if missing := set(step.requires) - all_provides:
+			raise ValueError(
+				f'Step \'{step.name}\' requires {", ".join(missing)}, which no step provides'
+			)
+
+	def run_step(step: Step):
+		with span(step.name, category='step'):
+			step.func()
+
+	run_order: List[str] = []
+	failure = None
+	with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(pending) or 1) as executor:
+		running: Dict[concurrent.futures.Future, Step] = {}
+		while pending or running:
+			if not failure:
+				for step in [step for step in pending if set(step.requires) <= provided]:
+					pending.remove(step)
+					running[executor.submit(run_step, step)] = step
+			if not running:
+				if failure:
+					break
+				raise ValueError(
+					f'Steps {", ".join(step.name for step in pending)} depend on each other'
+				)
+			done, _ = concurrent.futures.wait(
+				running.keys(), return_when=concurrent.futures.FIRST_COMPLETED
+			)
+			for future in done:
+				step = running.pop(future)
+				if future.exception():
+					failure = failure or StepError(step=step, error=future.exception())
+					continue
+				provided.update(step.provides)
+				run_order.append(step.name)
+				if on_complete:
+					on_complete(step)
+
+	if failure:
+		raise failure
+	return run_order
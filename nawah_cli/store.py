@@ -0,0 +1,207 @@
+from nawah_cli.artifacts import cache_dir
+from nawah_cli.archive import extract_archive
+
+from typing import Dict, List, Literal, Any, Optional
+
+import os, stat, shutil, logging, threading
+
+logger = logging.getLogger('nawah')
+
+LINK_METHOD = Literal['hardlink', 'symlink']
+
+# [DOC] Files in store are shared by all apps linked to them, so they are made read-only, for
+# [DOC] editing them in app to fail, rather than change them for all apps
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def store_dir() -> str:
+	return os.path.join(cache_dir(), 'store')
+
+
+def store_file_path(object_hash: str) -> str:
+	return os.path.join(store_dir(), 'files', object_hash[:2], object_hash)
+
+
+def store_tree_path(object_hash: str) -> str:
+	return os.path.join(store_dir(), 'trees', object_hash[:2], object_hash)
+
+
+def store_file(*, path: str, object_hash: str) -> str:
+	'''Adds copy of file at path to store, under object_hash, if not in it already, and returns its path in store'''
+	file_path = store_file_path(object_hash)
+	if os.path.exists(file_path):
+		return file_path
+	os.makedirs(os.path.dirname(file_path), exist_ok=True)
+	tmp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+	try:
+		shutil.copy2(path, tmp_path)
+		os.chmod(tmp_path, READ_ONLY)
+		# [DOC] File stored first by another process is kept, as apps could be linked to it already
+		os.link(tmp_path, file_path)
+	except FileExistsError:
+		pass
+	finally:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+	return file_path
+
+
+def store_tree(*, archive_path: str, object_hash: str, root_path: str) -> str:
+	'''Extracts gzipped tar archive at archive_path to store, under object_hash, if not extracted already, and returns path of extracted tree in store'''
+	tree_path = store_tree_path(object_hash)
+	if os.path.exists(tree_path):
+		return tree_path
+	os.makedirs(os.path.dirname(tree_path), exist_ok=True)
+	tmp_path = f'{tree_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+	if os.path.exists(tmp_path):
+		shutil.rmtree(tmp_path)
+	try:
+		with open(archive_path, 'rb') as archive_file:
+			extract_archive(fileobj=archive_file, path=tmp_path, root_path=root_path)
+		for root, _, root_files in os.walk(tmp_path):
+			for root_file in root_files:
+				if not os.path.islink(os.path.join(root, root_file)):
+					os.chmod(os.path.join(root, root_file), READ_ONLY)
+		os.replace(tmp_path, tree_path)
+	except OSError:
+		shutil.rmtree(tmp_path, ignore_errors=True)
+		# [DOC] Another process extracted same tree first
+		if not os.path.exists(tree_path):
+			raise
+	except:
+		shutil.rmtree(tmp_path, ignore_errors=True)
+		raise
+	return tree_path
+
+
+def _record_symlink(*, store_path: str, link_path: str):
+	'''Records link_path as symlink to store_path, for store_path not to be pruned while link is there. Records are single appended lines, so concurrent creates never overwrite each other'''
+	with open(f'{store_path}.links', 'a') as links_file:
+		links_file.write(f'{os.path.realpath(os.path.dirname(link_path))}/{os.path.basename(link_path)}\n')
+
+
+def link_file(*, store_path: str, path: str, method: LINK_METHOD) -> bool:
+	'''Links file in store to path, with method. Returns whether file was linked, as hardlinks fall back to copying across file systems'''
+	if os.path.lexists(path):
+		os.remove(path)
+	if method == 'symlink':
+		os.symlink(store_path, path)
+		_record_symlink(store_path=store_path, link_path=path)
+		return True
+	try:
+		os.link(store_path, path)
+		return True
+	except OSError:
+		shutil.copyfile(store_path, path)
+		return False
+
+
+def link_tree(*, store_path: str, path: str, method: LINK_METHOD) -> Dict[str, int]:
+	'''Links tree in store to path, with method. Symlinks link tree as a whole, while hardlinks link every file in new dirs. Returns number of files, files linked, and bytes'''
+	if os.path.islink(path):
+		os.remove(path)
+	elif os.path.exists(path):
+		shutil.rmtree(path)
+	stats = {'files': 0, 'linked': 0, 'bytes': 0}
+	for root, _, root_files in os.walk(store_path):
+		for root_file in root_files:
+			stats['files'] += 1
+			stats['bytes'] += os.lstat(os.path.join(root, root_file)).st_size
+
+	if method == 'symlink':
+		os.symlink(store_path, path)
+		_record_symlink(store_path=store_path, link_path=path)
+		stats['linked'] = stats['files']
+		return stats
+
+	for root, _, root_files in os.walk(store_path):
+		app_root = os.path.join(path, os.path.relpath(root, store_path))
+		os.makedirs(app_root, exist_ok=True)
+		for root_file in root_files:
+			src = os.path.join(root, root_file)
+			if os.path.islink(src):
+				os.symlink(os.readlink(src), os.path.join(app_root, root_file))
+				continue
+			try:
+				os.link(src, os.path.join(app_root, root_file))
+				stats['linked'] += 1
+			except OSError:
+				shutil.copyfile(src, os.path.join(app_root, root_file))
+	return stats
+
+
+def linked_store_path(path: str) -> Optional[str]:
+	'''Returns path in store path is symlinked to, if any'''
+	if os.path.islink(path) and os.path.realpath(path).startswith(
+		os.path.realpath(store_dir()) + os.sep
+	):
+		return os.path.realpath(path)
+	return None
+
+
+def linked_method(*, path: str, object_hash: str = None) -> Optional[LINK_METHOD]:
+	'''Returns method path is linked from store with, if any. Hardlinks are only detected for files, with object_hash of their content'''
+	if linked_store_path(path):
+		return 'symlink'
+	if (
+		object_hash
+		and os.path.isfile(path)
+		and os.stat(path).st_nlink > 1
+		and os.path.exists(store_file_path(object_hash))
+		and os.path.samefile(path, store_file_path(object_hash))
+	):
+		return 'hardlink'
+	return None
+
+
+def _in_use(store_path: str) -> bool:
+	'''Checks whether any app still links to entry of store, either by hardlinks to its files, or by recorded symlinks to it'''
+	try:
+		with open(f'{store_path}.links', 'r') as links_file:
+			links = [link.strip() for link in links_file.readlines() if link.strip()]
+	except FileNotFoundError:
+		links = []
+	if any(
+		os.path.islink(link) and os.path.realpath(link) == os.path.realpath(store_path)
+		for link in links
+	):
+		return True
+	if os.path.isdir(store_path):
+		return any(
+			os.lstat(os.path.join(root, root_file)).st_nlink > 1
+			for root, _, root_files in os.walk(store_path)
+			for root_file in root_files
+		)
+	return os.stat(store_path).st_nlink > 1
+
+
+def _remove_entry(store_path: str):
+	if os.path.isdir(store_path):
+		# [DOC] Dirs of tree are writable, so its read-only files can be removed
+		shutil.rmtree(store_path)
+	else:
+		os.remove(store_path)
+	if os.path.exists(f'{store_path}.links'):
+		os.remove(f'{store_path}.links')
+
+
+def prune_store() -> List[Dict[str, Any]]:
+	'''Removes entries of store no app links to anymore, and returns them'''
+	removed_entries = []
+	for kind in ['files', 'trees']:
+		kind_path = os.path.join(store_dir(), kind)
+		if not os.path.exists(kind_path):
+			continue
+		for prefix in os.listdir(kind_path):
+			for entry_name in os.listdir(os.path.join(kind_path, prefix)):
+				store_path = os.path.join(kind_path, prefix, entry_name)
+				if entry_name.endswith(('.links', '.tmp')):
+					continue
+				try:
+					if _in_use(store_path):
+						continue
+					_remove_entry(store_path)
+				except FileNotFoundError:
+					continue
+				removed_entries.append({'kind': kind, 'hash': entry_name})
+	return removed_entries
@@ -0,0 +1,390 @@
+from nawah_cli.archive import archive_members
+from nawah_cli.trace import span
+
+from typing import IO, Dict, List, Tuple, Literal, Any, Optional, Union
+
+import os, shutil, logging, time, json, re, fnmatch, tarfile, concurrent.futures
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+logger = logging.getLogger('nawah')
+
+MATERIALISE_METHOD = Literal['auto', 'reflink', 'hardlink', 'copy']
+
+# [REF] https://man7.org/linux/man-pages/man2/ioctl_ficlone.2.html
+FICLONE = 0x40049409
+
+MANIFEST_NAME = 'nawah_template.json'
+# [DOC] Written in apps materialised from specified 'template', with path of it, as their template files are not of API Level
+TEMPLATE_SOURCE_NAME = '.nawah_template_source'
+
+# [DOC] Rendering rules of templates with no manifest. Keys of 'render' are globs of template
+# [DOC] files, and values are placeholders to substitute in them, mapped to max number of
+# [DOC] substitutions, or None for no limit. '*' stands for all other placeholders of app config
+DEFAULT_MANIFEST: Dict[str, Any] = {
+	'render': {
+		'nawah_app.py': {'__PROJECT_NAME__': 2, '*': 1},
+		'.gitignore': {'PROJECT_NAME': 1},
+	},
+	'rename': ['packages/PROJECT_NAME'],
+}
+
+
+# [DOC] Placeholders of app name, that '*' doesn't stand for, as they are substituted only where listed
+PROJECT_NAME_PLACEHOLDERS = ['__PROJECT_NAME__', 'PROJECT_NAME']
+
+
+def template_variables(*, app_name: str, app_config: Dict[str, List[str]]) -> Dict[str, str]:
+	'''Returns placeholders of template mapped to their values for app'''
+	return {
+		'__PROJECT_NAME__': app_name,
+		'PROJECT_NAME': app_name,
+		**{config_set[0]: config_set[1] for config_set in app_config.values()},
+	}
+
+
+class TemplateRenderer:
+	'''Substitutes placeholders in template files, and paths, per manifest of template, matching all placeholders of file with one compiled pattern'''
+
+	def __init__(self, *, variables: Dict[str, str]):
+		self.variables = variables
+		self.render_rules: Dict[str, Dict[str, Optional[int]]] = {}
+		self.rename_paths: List[str] = []
+		self._patterns: Dict[Tuple[str, ...], re.Pattern] = {}
+		self.load_manifest(DEFAULT_MANIFEST)
+
+	def load_manifest(self, manifest: Dict[str, Any]):
+		'''Merges rules of manifest on top of already loaded ones'''
+		for glob, placeholders in manifest.get('render', {}).items():
+			if isinstance(placeholders, list):
+				placeholders = {placeholder: None for placeholder in placeholders}
+			self.render_rules.setdefault(glob, {}).update(placeholders)
+		for rename_path in manifest.get('rename', []):
+			if rename_path not in self.rename_paths:
+				self.rename_paths.append(rename_path)
+
+	def file_rules(self, rel_path: str) -> Optional[Dict[str, Optional[int]]]:
+		'''Returns placeholders to substitute in template file at rel_path, if any'''
+		rules: Dict[str, Optional[int]] = {}
+		for glob, placeholders in self.render_rules.items():
+			if fnmatch.fnmatchcase(rel_path, glob):
+				rules.update(placeholders)
+		if not rules:
+			return None
+		if '*' in rules:
+			count = rules.pop('*')
+			for placeholder in self.variables.keys():
+				if placeholder not in PROJECT_NAME_PLACEHOLDERS:
+					rules.setdefault(placeholder, count)
+		return {
+			placeholder: count
+			for placeholder, count in rules.items()
+			if placeholder in self.variables
+		}
+
+	def render_path(self, rel_path: str) -> str:
+		for rename_path in self.rename_paths:
+			if rel_path == rename_path or rel_path.startswith(f'{rename_path}/'):
+				return self.render(content=rename_path, rules=None) + rel_path[len(rename_path) :]
+		return rel_path
+
+	def render(self, *, content: str, rules: Optional[Dict[str, Optional[int]]]) -> str:
+		'''Substitutes placeholders of rules in content, in one pass. If rules is None, all placeholders are substituted'''
+		if rules is None:
+			rules = {placeholder: None for placeholder in self.variables.keys()}
+		if not rules:
+			return content
+		placeholders = tuple(sorted(rules.keys()))
+		if placeholders not in self._patterns:
+			# [DOC] Longest placeholders first, so '__PROJECT_NAME__' wins over 'PROJECT_NAME'
+			self._patterns[placeholders] = re.compile(
+				'|'.join(
+					re.escape(placeholder)
+					for placeholder in sorted(placeholders, key=len, reverse=True)
+				)
+			)
+		remaining = dict(rules)
+
+		def substitute(match: re.Match) -> str:
+			placeholder = match.group(0)
+			if remaining[placeholder] is not None:
+				if remaining[placeholder] <= 0:
+					return placeholder
+				remaining[placeholder] -= 1
+			return self.variables[placeholder]
+
+		return self._patterns[placeholders].sub(substitute, content)
+
+	def render_bytes(self, *, content: bytes, rules: Dict[str, Optional[int]]) -> bytes:
+		try:
+			return self.render(content=content.decode('utf-8'), rules=rules).encode('utf-8')
+		except UnicodeDecodeError:
+			return content
+
+	def render_tree(self, *, path: str, files: List[Tuple[str, str]] = None):
+		'''Renders files, and renames paths, of already extracted template at path in place. files are pairs of template path of file, and its path in app, and are all files in path if not passed'''
+		if files is None:
+			files = [
+				(rel_path, rel_path)
+				for rel_path in (
+					os.path.relpath(os.path.join(root, root_file), path).replace(os.sep, '/')
+					for root, _, root_files in os.walk(path)
+					for root_file in root_files
+				)
+			]
+		for rel_path, app_rel_path in files:
+			file_path = os.path.join(path, app_rel_path)
+			if not os.path.isfile(file_path) or (rules := self.file_rules(rel_path)) is None:
+				continue
+			with span(f'render {app_rel_path}', category='template') as render_span:
+				with open(file_path, 'rb') as f:
+					content = f.read()
+				render_span.bytes, render_span.files = len(content), 1
+				if (rendered_content := self.render_bytes(content=content, rules=rules)) != content:
+					replace_file(path=file_path, content=rendered_content)
+		for rename_path in self.rename_paths:
+			if os.path.lexists(os.path.join(path, rename_path)) and not os.path.lexists(
+				os.path.join(path, self.render_path(rename_path))
+			):
+				with span(f'rename {rename_path}', category='template'):
+					os.rename(
+						os.path.join(path, rename_path),
+						os.path.join(path, self.render_path(rename_path)),
+					)
+
+
+def extract_template(
+	*, fileobj: IO[bytes], path: str, root_path: str, renderer: TemplateRenderer
+) -> Dict[str, int]:
+	'''Extracts gzipped tar archive of template from fileobj to path in a single forward pass, rendering files, and paths, while being extracted. Returns number of files, and bytes extracted'''
+	# [DOC] Files extracted before manifest is reached in archive are rendered once it is loaded,
+	# [DOC] if manifest changes their rules
+	pending_files: List[Tuple[str, str, Optional[Dict[str, Optional[int]]]]] = []
+	manifest_loaded = False
+	stats = {'files': 0, 'bytes': 0}
+
+	def render_members(archive: tarfile.TarFile):
+		nonlocal manifest_loaded
+		for member in archive_members(archive=archive, root_path=root_path):
+			if member.path == MANIFEST_NAME:
+				renderer.load_manifest(json.loads(archive.extractfile(member).read()))
+				manifest_loaded = True
+				continue
+			rel_path = member.path
+			member.path = renderer.render_path(rel_path)
+			rules = renderer.file_rules(rel_path) if member.isfile() else None
+			if member.isfile():
+				stats['files'] += 1
+				stats['bytes'] += member.size
+			if not manifest_loaded and member.isfile():
+				pending_files.append((rel_path, member.path, rules))
+			if rules is not None:
+				file_path = os.path.join(path, member.path)
+				os.makedirs(os.path.dirname(file_path), exist_ok=True)
+				with span(f'render {member.path}', category='template') as render_span:
+					render_span.bytes, render_span.files = member.size, 1
+					with open(file_path, 'wb') as f:
+						f.write(
+							renderer.render_bytes(
+								content=archive.extractfile(member).read(), rules=rules
+							)
+						)
+				os.chmod(file_path, member.mode)
+				continue
+			yield member
+
+	with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+		archive.extractall(path=path, members=render_members(archive))
+
+	if manifest_loaded:
+		renderer.render_tree(
+			path=path,
+			files=[
+				(rel_path, app_rel_path)
+				for rel_path, app_rel_path, rules in pending_files
+				if renderer.file_rules(rel_path) != rules
+			],
+		)
+	return stats
+
+
+def template_files(*, template_path: str) -> Tuple[List[str], List[str]]:
+	'''Returns relative paths of dirs, and of files and symlinks, of template, excluding Git repo'''
+	dirs, files = [], []
+	for root, root_dirs, root_files in os.walk(template_path):
+		root_dirs[:] = [root_dir for root_dir in root_dirs if root_dir != '.git']
+		rel_root = os.path.relpath(root, template_path)
+		for root_dir in root_dirs:
+			rel_path = os.path.normpath(os.path.join(rel_root, root_dir))
+			if os.path.islink(os.path.join(root, root_dir)):
+				files.append(rel_path)
+			else:
+				dirs.append(rel_path)
+		for root_file in root_files:
+			files.append(os.path.normpath(os.path.join(rel_root, root_file)))
+	return dirs, files
+
+
+def _reflink(src: str, dst: str):
+	with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+		fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+	shutil.copystat(src, dst)
+
+
+def _materialise_file(*, src: str, dst: str, method: str) -> str:
+	# [DOC] Files of app materialised before create was interrupted are replaced, rather than written through, as they
+	# [DOC] could be hardlinked to template
+	if os.path.lexists(dst):
+		os.remove(dst)
+	if os.path.islink(src):
+		os.symlink(os.readlink(src), dst)
+		return 'symlink'
+	if method == 'reflink':
+		_reflink(src, dst)
+	elif method == 'hardlink':
+		os.link(src, dst)
+	else:
+		shutil.copy2(src, dst)
+	return method
+
+
+def _detect_method(*, src: str, dst: str, method: MATERIALISE_METHOD) -> str:
+	'''Returns method to materialise template with, by attempting it with first file'''
+	candidates = ['reflink', 'copy'] if method == 'auto' else [method]
+	for candidate in candidates:
+		try:
+			_materialise_file(src=src, dst=dst, method=candidate)
+			return candidate
+		except (OSError, AttributeError) as e:
+			if os.path.lexists(dst):
+				os.remove(dst)
+			if candidate == candidates[-1]:
+				raise
+			logger.debug(f'Materialising with \'{candidate}\' is not supported: {e}')
+
+
+def replace_file(*, path: str, content: Union[str, bytes]):
+	'''Writes content to new file that replaces path, rather than truncating it, so files hardlinked from template are never modified'''
+	temp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.{os.getpid()}')
+	with open(temp_path, 'wb' if isinstance(content, bytes) else 'w') as f:
+		f.write(content)
+	if os.path.exists(path):
+		shutil.copymode(path, temp_path)
+	os.replace(temp_path, path)
+
+
+def save_template_source(*, app_path: str, template_path: str):
+	replace_file(path=os.path.join(app_path, TEMPLATE_SOURCE_NAME), content=os.path.realpath(template_path))
+
+
+def template_source(*, app_path: str) -> Optional[str]:
+	'''Returns path of specified 'template' app was materialised from, if any'''
+	try:
+		with open(os.path.join(app_path, TEMPLATE_SOURCE_NAME), 'r') as source_file:
+			return source_file.read()
+	except FileNotFoundError:
+		return None
+
+
+def materialise_template(
+	*,
+	template_path: str,
+	app_path: str,
+	renderer: TemplateRenderer,
+	method: MATERIALISE_METHOD = 'auto',
+	max_workers: int = None,
+) -> Dict[str, Any]:
+	'''Clones template_path into app_path, without Git repo, rendering files, and paths, per manifest of template. Method 'auto' uses reflinks, where filesystem supports them, falling back to parallel copy. Method 'hardlink' shares files inodes with template, so files should only be modified in app by replacing them. Returns method used, and per top-level path timings'''
+	if os.path.exists(os.path.join(template_path, MANIFEST_NAME)):
+		with open(os.path.join(template_path, MANIFEST_NAME), 'r') as f:
+			renderer.load_manifest(json.loads(f.read()))
+
+	dirs, files = template_files(template_path=template_path)
+	if MANIFEST_NAME in files:
+		files.remove(MANIFEST_NAME)
+	for rel_path in dirs:
+		os.makedirs(
+			os.path.join(app_path, renderer.render_path(rel_path.replace(os.sep, '/'))),
+			exist_ok=True,
+		)
+
+	# [DOC] Files with placeholders are written rendered, rather than cloned
+	rendered_files = []
+	for rel_path in files:
+		if (rules := renderer.file_rules(rel_path.replace(os.sep, '/'))) is not None and not (
+			os.path.islink(os.path.join(template_path, rel_path))
+		):
+			rendered_files.append((rel_path, rules))
+	for rel_path, _ in rendered_files:
+		files.remove(rel_path)
+
+	timings: Dict[str, Dict[str, Any]] = {}
+
+	def app_file_path(rel_path: str) -> str:
+		return os.path.join(app_path, renderer.render_path(rel_path.replace(os.sep, '/')))
+
+	def materialise(rel_path: str, method: str):
+		start = time.perf_counter()
+		_materialise_file(
+			src=os.path.join(template_path, rel_path), dst=app_file_path(rel_path), method=method
+		)
+		return rel_path, start, time.perf_counter()
+
+	def render(rel_path: str, rules: Dict[str, Optional[int]]):
+		start = time.perf_counter()
+		with span(f'render {rel_path}', category='template') as render_span:
+			with open(os.path.join(template_path, rel_path), 'rb') as f:
+				content = renderer.render_bytes(content=f.read(), rules=rules)
+			replace_file(path=app_file_path(rel_path), content=content)
+			render_span.bytes, render_span.files = len(content), 1
+		shutil.copymode(os.path.join(template_path, rel_path), app_file_path(rel_path))
+		return rel_path, start, time.perf_counter()
+
+	def record(rel_path: str, start: float, end: float):
+		top_path = rel_path.split(os.sep)[0]
+		timing = timings.setdefault(
+			top_path, {'files': 0, 'bytes': 0, 'start': start, 'end': end}
+		)
+		timing['files'] += 1
+		timing['bytes'] += os.lstat(os.path.join(template_path, rel_path)).st_size
+		timing['start'] = min(timing['start'], start)
+		timing['end'] = max(timing['end'], end)
+
+	regular_files = [
+		rel_path for rel_path in files if not os.path.islink(os.path.join(template_path, rel_path))
+	]
+	used_method = 'copy'
+	if regular_files:
+		start = time.perf_counter()
+		used_method = _detect_method(
+			src=os.path.join(template_path, regular_files[0]),
+			dst=app_file_path(regular_files[0]),
+			method=method,
+		)
+		record(regular_files[0], start, time.perf_counter())
+		files.remove(regular_files[0])
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+		for rel_path, start, end in executor.map(
+			lambda rel_path: materialise(rel_path, used_method), files
+		):
+			record(rel_path, start, end)
+		for rel_path, start, end in executor.map(
+			lambda rendered_file: render(*rendered_file), rendered_files
+		):
+			record(rel_path, start, end)
+
+	return {
+		'method': used_method,
+		'timings': {
+			top_path: {
+				'files': timing['files'],
+				'bytes': timing['bytes'],
+				'duration': timing['end'] - timing['start'],
+			}
+			for top_path, timing in sorted(timings.items())
+		},
+	}
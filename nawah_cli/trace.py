@@ -0,0 +1,140 @@
+from typing import Dict, List, Iterator, Any, Optional
+
+import os, json, time, logging, threading, contextlib
+
+logger = logging.getLogger('nawah')
+
+
+class Span:
+	'''Timing of one operation, with number of bytes, and files it processed, if any'''
+
+	def __init__(self, *, name: str, category: str, args: Dict[str, Any]):
+		self.name = name
+		self.category = category
+		self.args = args
+		self.thread = threading.get_ident()
+		self.start = 0.0
+		self.end = 0.0
+		self.bytes = 0
+		self.files = 0
+
+	@property
+	def duration(self) -> float:
+		return self.end - self.start
+
+	def stats(self) -> Dict[str, Any]:
+		stats: Dict[str, Any] = {}
+		if self.bytes:
+			stats['bytes'] = self.bytes
+			stats['bytes_per_sec'] = round(self.bytes / self.duration) if self.duration else None
+		if self.files:
+			stats['files'] = self.files
+			stats['files_per_sec'] = round(self.files / self.duration) if self.duration else None
+		return stats
+
+
+class Tracer:
+	'''Collects spans of operations of all threads, to export them as JSON profile, or Chrome trace events'''
+
+	def __init__(self):
+		self.spans: List[Span] = []
+		self.start = time.perf_counter()
+		self._lock = threading.Lock()
+
+	@contextlib.contextmanager
+	def span(self, name: str, *, category: str, **args: Any) -> Iterator[Span]:
+		span = Span(name=name, category=category, args=args)
+		span.start = time.perf_counter()
+		try:
+			yield span
+		finally:
+			span.end = time.perf_counter()
+			with self._lock:
+				self.spans.append(span)
+
+	def profile(self) -> Dict[str, Any]:
+		'''Returns spans, and totals of every category of them'''
+		categories: Dict[str, Dict[str, Any]] = {}
+		for span in self.spans:
+			category = categories.setdefault(
+				span.category, {'count': 0, 'duration': 0.0, 'bytes': 0, 'files': 0}
+			)
+			category['count'] += 1
+			category['duration'] += span.duration
+			category['bytes'] += span.bytes
+			category['files'] += span.files
+		return {
+			'duration': time.perf_counter() - self.start,
+			'categories': categories,
+			'spans': [
+				{
+					'name': span.name,
+					'category': span.category,
+					'start': span.start - self.start,
+					'duration': span.duration,
+					**span.stats(),
+					**span.args,
+				}
+				for span in sorted(self.spans, key=lambda span: span.start)
+			],
+		}
+
+	def chrome_trace(self) -> Dict[str, Any]:
+		'''Returns spans as Chrome trace events, that can be loaded in chrome://tracing, or Perfetto'''
+		# [REF] https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+		threads = {}
+		return {
+			'displayTimeUnit': 'ms',
+			'traceEvents': [
+				{
+					'name': span.name,
+					'cat': span.category,
+					'ph': 'X',
+					'ts': round((span.start - self.start) * 1e6, 3),
+					'dur': round(span.duration * 1e6, 3),
+					'pid': os.getpid(),
+					'tid': threads.setdefault(span.thread, len(threads)),
+					'args': {**span.stats(), **span.args},
+				}
+				for span in sorted(self.spans, key=lambda span: span.start)
+			],
+		}
+
+
+_tracer: Optional[Tracer] = None
+
+
+def span(name: str, *, category: str, **args: Any):
+	'''Returns context manager timing operation as span of active tracer. If tracing is not active, span is not recorded'''
+	if not _tracer:
+		return contextlib.nullcontext(Span(name=name, category=category, args=args))
+	return _tracer.span(name, category=category, **args)
+
+
+@contextlib.contextmanager
+def tracing(*, trace_path: str = None, profile_path: str = None):
+	'''Records spans of operations run in context, writing them as Chrome trace events to trace_path, and as JSON profile to profile_path, once context exits, even if by exception'''
+	global _tracer
+
+	if not trace_path and not profile_path:
+		yield
+		return
+
+	_tracer = tracer = Tracer()
+	try:
+		yield
+	finally:
+		_tracer = None
+		for path, export, export_name in [
+			(trace_path, tracer.chrome_trace, 'Trace'),
+			(profile_path, tracer.profile, 'Profile'),
+		]:
+			if not path:
+				continue
+			with open(path, 'w') as trace_file:
+				trace_file.write(json.dumps(export()))
+			logger.info(f'{export_name} written to: {os.path.realpath(path)}')
+		for category_name, category in tracer.profile()['categories'].items():
+			logger.info(
+				f'- {category_name}: {category["count"]} spans in {category["duration"]:.3f}s'
+			)
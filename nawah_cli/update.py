@@ -0,0 +1,394 @@
+from nawah_cli.artifacts import ARTIFACT
+from nawah_cli.cache import fetch_artifacts, hash_file, cache_dir, format_size
+from nawah_cli.archive import archive_members
+from nawah_cli.index import resolve_api_level
+from nawah_cli.template import MANIFEST_NAME, TemplateRenderer, replace_file, template_source
+from nawah_cli.store import store_file, store_tree, link_file, link_tree, linked_method, linked_store_path
+from nawah_cli.framework import APP_FRAMEWORK_STAMP
+from nawah_cli.bytecode import app_invalidation_mode, compile_app
+from nawah_cli.trace import span
+
+from typing import Dict, List, Any, Optional
+
+import argparse, os, re, json, glob, shutil, hashlib, logging, tarfile
+
+logger = logging.getLogger('nawah')
+
+# [DOC] Root path of files in archive of every archive artifact
+ARCHIVES_ROOT_PATHS: Dict[ARTIFACT, str] = {
+	'template': 'nawah_app_template-APIv{api_level}',
+	'stubs': '.',
+}
+
+
+def manifests_dir() -> str:
+	return os.path.join(cache_dir(), 'manifests')
+
+
+def archive_manifest(*, archive_path: str, root_path: str) -> Dict[str, Any]:
+	'''Returns hash, size, and mode of every file of gzipped tar archive under root_path, and template manifest in it, if any. Manifest is cached by archive hash, as cached artifacts are named by it'''
+	manifest_path = os.path.join(manifests_dir(), f'{os.path.basename(archive_path)}.json')
+	try:
+		with open(manifest_path, 'r') as manifest_file:
+			return json.loads(manifest_file.read())
+	except (FileNotFoundError, json.JSONDecodeError):
+		pass
+
+	manifest: Dict[str, Any] = {'files': {}, 'template_manifest': None}
+	with tarfile.open(archive_path, mode='r|gz') as archive:
+		for member in archive_members(archive=archive, root_path=root_path):
+			if not member.isfile():
+				continue
+			content = archive.extractfile(member).read()
+			if member.path == MANIFEST_NAME:
+				manifest['template_manifest'] = json.loads(content)
+				continue
+			manifest['files'][os.path.normpath(member.path)] = {
+				'hash': hashlib.sha256(content).hexdigest(),
+				'size': member.size,
+				'mode': member.mode,
+			}
+
+	os.makedirs(manifests_dir(), exist_ok=True)
+	with open(f'{manifest_path}.{os.getpid()}', 'w') as manifest_file:
+		manifest_file.write(json.dumps(manifest))
+	os.replace(f'{manifest_path}.{os.getpid()}', manifest_path)
+	return manifest
+
+
+def _file_matches(*, path: str, entry: Dict[str, Any]) -> bool:
+	'''Checks whether file at path has hash of manifest entry, only hashing it if sizes match'''
+	try:
+		if os.path.getsize(path) != entry['size']:
+			return False
+	except FileNotFoundError:
+		return False
+	return hash_file(path) == entry['hash']
+
+
+def app_api_level(*, app_path: str) -> Optional[str]:
+	'''Returns API Level of framework wheel of app, if any'''
+	for whl_path in sorted(glob.glob(os.path.join(app_path, 'framework-*.whl'))):
+		if match := re.match(r'^framework-([0-9]\.[0-9]{1,2})\.whl$', os.path.basename(whl_path)):
+			return match.group(1)
+	return None
+
+
+def stubs_delta(
+	*, app_path: str, manifest: Dict[str, Any], base_manifest: Dict[str, Any]
+) -> Dict[str, Any]:
+	'''Returns stubs files of app to write, as they changed, or are new, and to remove, as they are in stubs of API Level app was created with, as base, but no longer in stubs. Other files, such as bytecode, are never removed'''
+	stubs_path = os.path.join(app_path, 'nawah')
+	write = [
+		rel_path
+		for rel_path, entry in manifest['files'].items()
+		if not _file_matches(path=os.path.join(stubs_path, rel_path), entry=entry)
+	]
+	return {
+		'write': {rel_path: rel_path for rel_path in write},
+		'remove': sorted(
+			rel_path
+			for rel_path in set(base_manifest['files'].keys()) - set(manifest['files'].keys())
+			if os.path.lexists(os.path.join(stubs_path, rel_path))
+		),
+		'conflicts': [],
+	}
+
+
+def template_delta(
+	*, app_path: str, app_name: str, manifest: Dict[str, Any], base_manifest: Dict[str, Any]
+) -> Dict[str, Any]:
+	'''Returns template-owned files of app to write, comparing them with template of API Level app was created with, as base, so files changed in app are never overwritten, but reported as conflicts. Files rendered with app config are left as they are'''
+	# [DOC] Only app name is known after app is created, which is all that paths are renamed with
+	renderer = TemplateRenderer(variables={'__PROJECT_NAME__': app_name, 'PROJECT_NAME': app_name})
+	if manifest['template_manifest']:
+		renderer.load_manifest(manifest['template_manifest'])
+	write: Dict[str, str] = {}
+	conflicts: List[str] = []
+	for rel_path, entry in manifest['files'].items():
+		if renderer.file_rules(rel_path) is not None:
+			continue
+		app_rel_path = os.path.normpath(renderer.render_path(rel_path))
+		file_path = os.path.join(app_path, app_rel_path)
+		base_entry = base_manifest['files'].get(rel_path)
+		if _file_matches(path=file_path, entry=entry):
+			continue
+		if not os.path.exists(file_path):
+			# [DOC] Files of base template missing from app were removed by app, so are left so
+			if not base_entry:
+				write[rel_path] = app_rel_path
+		elif base_entry and _file_matches(path=file_path, entry=base_entry):
+			write[rel_path] = app_rel_path
+		else:
+			conflicts.append(app_rel_path)
+	return {'write': write, 'remove': [], 'conflicts': conflicts}
+
+
+def apply_delta(
+	*, archive_path: str, root_path: str, path: str, delta: Dict[str, Any]
+) -> Dict[str, int]:
+	'''Writes files of delta from archive to path, by replacing them, and removes files of delta. Returns number of files, and bytes written'''
+	stats = {'files': 0, 'bytes': 0}
+	if delta['write']:
+		with tarfile.open(archive_path, mode='r|gz') as archive:
+			for member in archive_members(archive=archive, root_path=root_path):
+				rel_path = os.path.normpath(member.path)
+				if not member.isfile() or rel_path not in delta['write']:
+					continue
+				file_path = os.path.join(path, delta['write'][rel_path])
+				os.makedirs(os.path.dirname(file_path), exist_ok=True)
+				replace_file(path=file_path, content=archive.extractfile(member).read())
+				os.chmod(file_path, member.mode)
+				stats['files'] += 1
+				stats['bytes'] += member.size
+	for rel_path in delta['remove']:
+		os.remove(os.path.join(path, rel_path))
+	return stats
+
+
+def update_app(
+	*,
+	app_path: str,
+	api_level: str,
+	artifacts_paths: Dict[str, Dict[ARTIFACT, str]],
+	dry_run: bool = False,
+) -> Dict[str, Any]:
+	'''Updates framework wheel, stubs, requirements, and template-owned files of app to those of API Level, writing only files that changed, and compiles app again, if it was compiled. Template-owned files of apps of specified 'template' are left as they are. artifacts_paths are paths of cached artifacts by API Level, including one app was created with. Returns report of files written, removed, and left with conflicts, and bytes written of total bytes'''
+	app_name = os.path.basename(app_path)
+	base_api_level = app_api_level(app_path=app_path)
+	artifacts = artifacts_paths[api_level]
+	report: Dict[str, Any] = {
+		'api_level': base_api_level,
+		'artifacts': {},
+		'template': template_source(app_path=app_path),
+		'compile': None,
+	}
+
+	# [DOC] Framework wheel, and requirements are single files, so are either kept, or replaced
+	for artifact, file_path in [
+		('framework', os.path.join(app_path, f'framework-{base_api_level}.whl')),
+		('requirements', os.path.join(app_path, 'requirements.txt')),
+	]:
+		size = os.path.getsize(artifacts[artifact])
+		changed = (
+			not os.path.exists(file_path)
+			or os.path.getsize(file_path) != size
+			or hash_file(file_path) != os.path.basename(artifacts[artifact])
+		)
+		report['artifacts'][artifact] = {
+			'write': [os.path.basename(file_path)] if changed else [],
+			'remove': [],
+			'conflicts': [],
+			'bytes': size if changed else 0,
+			'total': size,
+		}
+
+	deltas = {}
+	for artifact in ['stubs', 'template']:
+		# [DOC] Base of template-owned files of apps of specified 'template' is not known, so they are not updated
+		if artifact == 'template' and report['template']:
+			deltas[artifact] = {'write': {}, 'remove': [], 'conflicts': []}
+			report['artifacts'][artifact] = {**deltas[artifact], 'write': [], 'bytes': 0, 'total': 0}
+			continue
+		with span(f'manifest {artifact}', category='update'):
+			manifest = archive_manifest(
+				archive_path=artifacts[artifact],
+				root_path=ARCHIVES_ROOT_PATHS[artifact].format(api_level=api_level),
+			)
+			base_manifest = archive_manifest(
+				archive_path=artifacts_paths[base_api_level][artifact],
+				root_path=ARCHIVES_ROOT_PATHS[artifact].format(api_level=base_api_level),
+			)
+			if artifact == 'stubs':
+				deltas[artifact] = stubs_delta(
+					app_path=app_path, manifest=manifest, base_manifest=base_manifest
+				)
+			else:
+				deltas[artifact] = template_delta(
+					app_path=app_path,
+					app_name=app_name,
+					manifest=manifest,
+					base_manifest=base_manifest,
+				)
+		report['artifacts'][artifact] = {
+			'write': sorted(deltas[artifact]['write'].values()),
+			'remove': deltas[artifact]['remove'],
+			'conflicts': deltas[artifact]['conflicts'],
+			'bytes': sum(manifest['files'][rel_path]['size'] for rel_path in deltas[artifact]['write']),
+			'total': sum(entry['size'] for entry in manifest['files'].values()),
+		}
+
+	if dry_run:
+		return report
+
+	base_framework_path = os.path.join(app_path, f'framework-{base_api_level}.whl')
+	framework_path = os.path.join(app_path, f'framework-{api_level}.whl')
+	# [DOC] Framework is unpacked next to its wheel by 'compile', so apps with it unpacked were compiled
+	base_unpacked_path = os.path.splitext(base_framework_path)[0]
+	compiled = os.path.exists(os.path.join(base_unpacked_path, APP_FRAMEWORK_STAMP))
+	if compiled:
+		invalidation_mode = app_invalidation_mode(app_path=app_path)
+	if report['artifacts']['framework']['write'] or framework_path != base_framework_path:
+		# [DOC] Framework unpacked from wheel replaced is removed, so it is never loaded, or compiled again
+		shutil.rmtree(base_unpacked_path, ignore_errors=True)
+	if report['artifacts']['framework']['write']:
+		# [DOC] Apps created with 'link_framework' CLI Arg are linked to new framework in store
+		if link_method := linked_method(
+			path=base_framework_path, object_hash=hash_file(base_framework_path)
+		):
+			link_file(
+				store_path=store_file(
+					path=artifacts['framework'],
+					object_hash=os.path.basename(artifacts['framework']),
+				),
+				path=framework_path,
+				method=link_method,
+			)
+		else:
+			shutil.copyfile(artifacts['framework'], f'{framework_path}.{os.getpid()}')
+			os.replace(f'{framework_path}.{os.getpid()}', framework_path)
+		if framework_path != base_framework_path:
+			os.remove(base_framework_path)
+	elif framework_path != base_framework_path:
+		if store_path := linked_store_path(base_framework_path):
+			# [DOC] Symlinks to store are recorded by path, so renamed ones are linked again
+			link_file(store_path=store_path, path=framework_path, method='symlink')
+			os.remove(base_framework_path)
+		else:
+			os.replace(base_framework_path, framework_path)
+	if report['artifacts']['requirements']['write']:
+		with open(artifacts['requirements'], 'rb') as req_file:
+			replace_file(path=os.path.join(app_path, 'requirements.txt'), content=req_file.read())
+	for artifact, path in [('stubs', os.path.join(app_path, 'nawah')), ('template', app_path)]:
+		# [DOC] Stubs symlinked from store are never written through, but linked to new stubs in store
+		if (
+			artifact == 'stubs'
+			and linked_method(path=path) == 'symlink'
+			and (deltas[artifact]['write'] or deltas[artifact]['remove'])
+		):
+			with span(f'link {artifact}', category='update'):
+				link_tree(
+					store_path=store_tree(
+						archive_path=artifacts[artifact],
+						object_hash=os.path.basename(artifacts[artifact]),
+						root_path=ARCHIVES_ROOT_PATHS[artifact],
+					),
+					path=path,
+					method='symlink',
+				)
+			continue
+		with span(f'update {artifact}', category='update') as update_span:
+			stats = apply_delta(
+				archive_path=artifacts[artifact],
+				root_path=ARCHIVES_ROOT_PATHS[artifact].format(api_level=api_level),
+				path=path,
+				delta=deltas[artifact],
+			)
+			update_span.files, update_span.bytes = stats['files'], stats['bytes']
+	if compiled and any(
+		report['artifacts'][artifact]['write'] or report['artifacts'][artifact]['remove']
+		for artifact in ['framework', 'stubs', 'template']
+	):
+		report['compile'] = compile_app(app_path=app_path, invalidation_mode=invalidation_mode)
+	return report
+
+
+def update_command(args: argparse.Namespace):
+	try:
+		args.api_level = resolve_api_level(args.api_level)
+	except ValueError as e:
+		logger.error(f'{e}. Exiting.')
+		exit(1)
+
+	apps_paths = [os.path.realpath(app_path) for app_path in args.app_paths]
+	apps_api_levels = {}
+	for app_path in apps_paths:
+		if not os.path.exists(os.path.join(app_path, 'nawah_app.py')):
+			logger.error(f'\'{app_path}\' is not a Nawah app. Exiting.')
+			exit(1)
+		if os.path.exists(os.path.join(app_path, 'progress.json')):
+			logger.error(
+				f'App at \'{app_path}\' was not created completely. Run \'nawah create\' to continue creating it first. Exiting.'
+			)
+			exit(1)
+		apps_api_levels[app_path] = app_api_level(app_path=app_path)
+		if not apps_api_levels[app_path]:
+			logger.error(f'No Nawah framework wheel file was found for app at \'{app_path}\'. Exiting.')
+			exit(1)
+
+	# [DOC] Artifacts are fetched once per API Level through cache, for all apps to share
+	artifacts_paths = {}
+	for api_level in sorted({args.api_level, *apps_api_levels.values()}):
+		logger.info(f'Attempting to fetch artifacts for API Level {api_level}.')
+		try:
+			artifacts_paths[api_level] = fetch_artifacts(
+				api_level=api_level,
+				artifacts=(
+					['template', 'framework', 'stubs', 'requirements']
+					if api_level == args.api_level
+					else ['template', 'stubs']
+				),
+				max_concurrency=args.max_concurrency,
+			)
+		except Exception as e:
+			logger.error(
+				f'An exception occurred while attempting to fetch artifacts for API Level {api_level}.'
+			)
+			logger.error(f'Exception details: {e}')
+			logger.error('Exiting.')
+			exit(1)
+
+	failed = False
+	for app_path in apps_paths:
+		logger.info(
+			f'Attempting to update app at \'{app_path}\' from API Level {apps_api_levels[app_path]} to {args.api_level}.'
+		)
+		try:
+			report = update_app(
+				app_path=app_path,
+				api_level=args.api_level,
+				artifacts_paths=artifacts_paths,
+				dry_run=args.dry_run,
+			)
+		except Exception as e:
+			logger.error(f'An exception occurred while attempting to update app at \'{app_path}\'.')
+			logger.error(f'Exception details: {e}')
+			failed = True
+			continue
+
+		if report['template']:
+			logger.info(
+				f'App was created with specified \'template\' \'{report["template"]}\', so its template files are not updated. Skipping.'
+			)
+		for artifact, artifact_report in report['artifacts'].items():
+			if artifact == 'template' and report['template']:
+				continue
+			logger.info(
+				f'- {artifact}: {len(artifact_report["write"])} files to write, {len(artifact_report["remove"])} to remove, {format_size(artifact_report["bytes"])} of {format_size(artifact_report["total"])} ({format_size(artifact_report["total"] - artifact_report["bytes"])} saved)'
+			)
+			if args.dry_run:
+				for rel_path in artifact_report['write']:
+					logger.info(f'  - write: {rel_path}')
+				for rel_path in artifact_report['remove']:
+					logger.info(f'  - remove: {rel_path}')
+			for rel_path in artifact_report['conflicts']:
+				logger.warning(
+					f'  - \'{rel_path}\' was changed in app, and in template. Update it yourself.'
+				)
+		if args.dry_run:
+			continue
+		if report['compile']:
+			for failed_path in report['compile']['failed']:
+				logger.warning(f'Failed to compile: {failed_path}')
+			logger.info(
+				f'App compiled again, with {report["compile"]["files"] - len(report["compile"]["failed"])} of {report["compile"]["files"]} files!'
+			)
+		if report['artifacts']['requirements']['write']:
+			logger.warning(
+				'Nawah framework requirements changed. Install them again with \'pip install -r requirements.txt\', in app virtualenv if any.'
+			)
+		logger.info(f'App at \'{app_path}\' updated successfully!')
+
+	if failed:
+		logger.error('Exiting.')
+		exit(1)
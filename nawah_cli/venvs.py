@@ -0,0 +1,215 @@
+from nawah_cli.artifacts import cache_dir
+from nawah_cli.trace import span
+from nawah_cli.wheelhouse import (
+	PipError,
+	read_requirements,
+	requirements_fingerprint,
+	install_from_wheelhouse,
+)
+
+from typing import Dict, List
+
+import os, sys, time, hashlib, logging, subprocess, shutil, contextlib
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+logger = logging.getLogger('nawah')
+
+# [DOC] Golden venvs not used for this long are removed once another is used
+VENV_MAX_AGE = 30 * 24 * 60 * 60
+# [DOC] Written once golden venv is built completely, so partial ones are never cloned
+GOLDEN_MARKER = '.golden'
+
+
+def venvs_dir() -> str:
+	return os.path.join(cache_dir(), 'venvs')
+
+
+def venv_bin_dir(venv_path: str) -> str:
+	return os.path.join(venv_path, 'Scripts' if os.name == 'nt' else 'bin')
+
+
+def venv_python(venv_path: str) -> str:
+	return os.path.join(venv_bin_dir(venv_path), 'python.exe' if os.name == 'nt' else 'python')
+
+
+def venv_key(*, requirements: List[str]) -> str:
+	'''Returns hash of requirements, and of interpreter venv is created with'''
+	key = hashlib.sha256()
+	for requirement in sorted(requirements):
+		key.update(f'{requirement}\n'.encode('utf-8'))
+	key.update(f'{os.path.realpath(sys.executable)}|{sys.version}'.encode('utf-8'))
+	return key.hexdigest()
+
+
+@contextlib.contextmanager
+def _venv_lock(key: str, *, shared: bool = False, blocking: bool = True):
+	'''Locks golden venv of key, exclusively to build, or prune it, or shared to clone it. Yields whether lock was acquired, which is always, if blocking'''
+	os.makedirs(venvs_dir(), exist_ok=True)
+	with open(os.path.join(venvs_dir(), f'{key}.lock'), 'a') as lock_file:
+		if fcntl:
+			try:
+				fcntl.flock(
+					lock_file,
+					(fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB),
+				)
+			except BlockingIOError:
+				yield False
+				return
+		try:
+			yield True
+		finally:
+			if fcntl:
+				fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def build_venv(
+	*, venv_path: str, req_path: str, use_cache: bool = True, max_workers: int = None
+):
+	'''Creates venv at venv_path, and installs requirements in it, from local wheelhouse with use_cache, falling back to index'''
+	import venv
+
+	logger.info(f'Attempting to create virtualenv at: {venv_path}')
+	with span('venv create', category='subprocess'):
+		# [DOC] Prompt is set, as it would otherwise be name of golden venv, which is its hash
+		venv.EnvBuilder(
+			with_pip=True, symlinks=os.name != 'nt', clear=True, prompt='nawah'
+		).create(venv_path)
+
+	pip_command = [venv_python(venv_path), '-m', 'pip', 'install', '--disable-pip-version-check']
+	if not use_cache:
+		with span('pip install', category='subprocess'):
+			if subprocess.call(pip_command + ['-r', req_path]) != 0:
+				raise PipError('\'pip install\' call failed')
+		return
+
+	requirements = read_requirements(req_path=req_path)
+	install_from_wheelhouse(
+		pip_command=pip_command,
+		req_path=req_path,
+		requirements=requirements,
+		fingerprint=requirements_fingerprint(requirements=requirements),
+		max_workers=max_workers,
+	)
+
+
+def prune_venvs(*, keep: str):
+	now = time.time()
+	for venv_name in os.listdir(venvs_dir()):
+		venv_path = os.path.join(venvs_dir(), venv_name)
+		if venv_name == keep or not os.path.isdir(venv_path):
+			continue
+		# [DOC] Golden venvs being built, or cloned, are skipped. Lock files are kept, as others could be waiting on them
+		with _venv_lock(venv_name, blocking=False) as locked:
+			if not locked:
+				continue
+			try:
+				if now - os.stat(venv_path).st_mtime > VENV_MAX_AGE:
+					shutil.rmtree(venv_path)
+			except FileNotFoundError:
+				pass
+
+
+def golden_venv(*, req_path: str, max_workers: int = None) -> str:
+	'''Returns path of golden venv of requirements in cache, building it if not built yet. Golden venv is built once per requirements, and interpreter, and only cloned after'''
+	key = venv_key(requirements=read_requirements(req_path=req_path))
+	golden_path = os.path.realpath(os.path.join(venvs_dir(), key))
+
+	# [DOC] Apps created at once wait for one of them to build golden venv, then all clone it
+	with _venv_lock(key):
+		if not os.path.exists(os.path.join(golden_path, GOLDEN_MARKER)):
+			logger.info('Attempting to build golden virtualenv of Nawah framework requirements.')
+			build_venv(venv_path=golden_path, req_path=req_path, max_workers=max_workers)
+			open(os.path.join(golden_path, GOLDEN_MARKER), 'w').close()
+			logger.info('Golden virtualenv built successfully!')
+
+	# [DOC] Mark golden venv as used, for it not to be pruned
+	os.utime(golden_path)
+	prune_venvs(keep=key)
+	return golden_path
+
+
+def clone_venv(*, golden_path: str, venv_path: str) -> Dict[str, int]:
+	'''Clones golden venv to venv_path, hardlinking its files, falling back to copying them. Files referring to golden venv path, such as scripts, and 'pyvenv.cfg', are written with it replaced by venv_path. As files are shared with golden venv, they should only be modified by replacing them, as pip does. Returns number of files, files linked, and bytes'''
+	golden_path = os.path.realpath(golden_path)
+	venv_path = os.path.realpath(venv_path)
+	# [DOC] Mark golden venv as used on every clone, for it not to be pruned
+	os.utime(golden_path)
+	# [DOC] Clone to temp dir that replaces venv_path, so venv is never left partial
+	tmp_path = f'{venv_path}.{os.getpid()}.tmp'
+	if os.path.exists(tmp_path):
+		shutil.rmtree(tmp_path)
+	# [DOC] Only scripts, and venv config refer to venv path, so only these are checked for it
+	rewrite_dirs = [golden_path, venv_bin_dir(golden_path)]
+	stats = {'files': 0, 'linked': 0, 'bytes': 0}
+
+	def clone_dir(src_dir: str, dst_dir: str):
+		os.makedirs(dst_dir)
+		for entry in os.scandir(src_dir):
+			dst = os.path.join(dst_dir, entry.name)
+			if entry.name == GOLDEN_MARKER and src_dir == golden_path:
+				continue
+			if entry.is_symlink():
+				link = os.readlink(entry.path)
+				if link.startswith(golden_path):
+					link = venv_path + link[len(golden_path) :]
+				os.symlink(link, dst)
+			elif entry.is_dir():
+				clone_dir(entry.path, dst)
+			else:
+				stats['files'] += 1
+				stats['bytes'] += entry.stat().st_size
+				if src_dir in rewrite_dirs:
+					with open(entry.path, 'rb') as src_file:
+						content = src_file.read()
+					if golden_path.encode('utf-8') in content:
+						with open(dst, 'wb') as dst_file:
+							dst_file.write(
+								content.replace(golden_path.encode('utf-8'), venv_path.encode('utf-8'))
+							)
+						shutil.copymode(entry.path, dst)
+						continue
+				try:
+					os.link(entry.path, dst)
+					stats['linked'] += 1
+				except OSError:
+					shutil.copy2(entry.path, dst)
+
+	try:
+		clone_dir(golden_path, tmp_path)
+		if os.path.exists(venv_path):
+			shutil.rmtree(venv_path)
+		os.replace(tmp_path, venv_path)
+	except:
+		shutil.rmtree(tmp_path, ignore_errors=True)
+		raise
+	return stats
+
+
+def create_app_venv(
+	*, venv_path: str, req_path: str, use_cache: bool = True, max_workers: int = None
+):
+	'''Creates isolated venv with requirements for app at venv_path. With use_cache, it is cloned from golden venv of requirements, otherwise built from index'''
+	if not use_cache:
+		build_venv(venv_path=venv_path, req_path=req_path, use_cache=False)
+		return
+
+	golden_path = golden_venv(req_path=req_path, max_workers=max_workers)
+	logger.info(f'Attempting to clone golden virtualenv to: {venv_path}')
+	# [DOC] Golden venv is not pruned while being cloned
+	with _venv_lock(os.path.basename(golden_path), shared=True), span(
+		'clone venv', category='venv'
+	) as clone_span:
+		stats = clone_venv(golden_path=golden_path, venv_path=venv_path)
+		clone_span.files, clone_span.bytes = stats['files'], stats['bytes']
+	logger.info(
+		f'Virtualenv cloned successfully, with {stats["linked"]} of {stats["files"]} files linked!'
+	)
+
+
+def clear_venvs():
+	if os.path.exists(venvs_dir()):
+		shutil.rmtree(venvs_dir())
@@ -0,0 +1,181 @@
+from nawah_cli.artifacts import cache_dir
+from nawah_cli.template import MANIFEST_NAME, TemplateRenderer, template_files, replace_file
+
+from typing import Dict, List, Tuple, Any, Optional
+
+import os, json, time, hashlib, logging
+
+logger = logging.getLogger('nawah')
+
+# [DOC] Seconds between scans of template for changes
+WATCH_INTERVAL = 0.25
+
+# [DOC] Size, mtime, and mode of template file, and target, if it is symlink
+SNAPSHOT = Dict[str, Tuple[int, int, int, Optional[str]]]
+
+
+def _watch_state_path(app_path: str) -> str:
+	return os.path.join(
+		cache_dir(),
+		'watch',
+		f'{hashlib.sha256(os.path.realpath(app_path).encode("utf-8")).hexdigest()}.json',
+	)
+
+
+def save_watch_state(*, app_path: str, variables: Dict[str, str]):
+	'''Saves placeholders values of app, for template to be rendered again with them once app is created. They are saved in cache, rather than app, as they include secrets of app config'''
+	state_path = _watch_state_path(app_path)
+	os.makedirs(os.path.dirname(state_path), exist_ok=True)
+	with open(f'{state_path}.{os.getpid()}', 'w') as state_file:
+		state_file.write(json.dumps({'app_path': os.path.realpath(app_path), 'variables': variables}))
+	os.replace(f'{state_path}.{os.getpid()}', state_path)
+
+
+def load_watch_state(*, app_path: str) -> Optional[Dict[str, Any]]:
+	try:
+		with open(_watch_state_path(app_path), 'r') as state_file:
+			return json.loads(state_file.read())
+	except (FileNotFoundError, json.JSONDecodeError):
+		return None
+
+
+def template_snapshot(*, template_path: str) -> SNAPSHOT:
+	'''Returns size, mtime, and mode of every file of template, to detect changed files without reading them'''
+	snapshot: SNAPSHOT = {}
+	for rel_path in template_files(template_path=template_path)[1]:
+		file_path = os.path.join(template_path, rel_path)
+		try:
+			file_stat = os.lstat(file_path)
+			snapshot[rel_path] = (
+				file_stat.st_size,
+				file_stat.st_mtime_ns,
+				file_stat.st_mode,
+				os.readlink(file_path) if os.path.islink(file_path) else None,
+			)
+		except FileNotFoundError:
+			continue
+	return snapshot
+
+
+def template_renderer(*, template_path: str, variables: Dict[str, str]) -> TemplateRenderer:
+	renderer = TemplateRenderer(variables=variables)
+	if os.path.exists(os.path.join(template_path, MANIFEST_NAME)):
+		with open(os.path.join(template_path, MANIFEST_NAME), 'r') as f:
+			renderer.load_manifest(json.loads(f.read()))
+	return renderer
+
+
+def sync_files(
+	*, template_path: str, app_path: str, renderer: TemplateRenderer, rel_paths: List[str]
+) -> Dict[str, int]:
+	'''Writes template files at rel_paths to app, rendered per manifest, as 'create' does, removing these no longer in template. Files of app with same content are left as they are. Returns number of files written, and removed'''
+	stats = {'written': 0, 'removed': 0}
+	for rel_path in rel_paths:
+		if rel_path == MANIFEST_NAME:
+			continue
+		src = os.path.join(template_path, rel_path)
+		dst = os.path.join(app_path, renderer.render_path(rel_path.replace(os.sep, '/')))
+
+		if not os.path.lexists(src):
+			if os.path.lexists(dst):
+				os.remove(dst)
+				stats['removed'] += 1
+				# [DOC] Dirs emptied by removing files are removed, up to app path
+				dst_dir = os.path.dirname(dst)
+				while dst_dir != app_path and not os.listdir(dst_dir):
+					os.rmdir(dst_dir)
+					dst_dir = os.path.dirname(dst_dir)
+			continue
+
+		os.makedirs(os.path.dirname(dst), exist_ok=True)
+		if os.path.islink(src):
+			if not os.path.islink(dst) or os.readlink(dst) != os.readlink(src):
+				if os.path.lexists(dst):
+					os.remove(dst)
+				os.symlink(os.readlink(src), dst)
+				stats['written'] += 1
+			continue
+
+		with open(src, 'rb') as f:
+			content = f.read()
+		if (rules := renderer.file_rules(rel_path.replace(os.sep, '/'))) is not None:
+			content = renderer.render_bytes(content=content, rules=rules)
+		try:
+			with open(dst, 'rb') as f:
+				if f.read() == content and os.stat(dst).st_mode == os.stat(src).st_mode:
+					continue
+		except (FileNotFoundError, IsADirectoryError):
+			pass
+		# [DOC] Files are replaced, rather than written in place, as app files could be hardlinked to template
+		replace_file(path=dst, content=content)
+		os.chmod(dst, os.stat(src).st_mode)
+		stats['written'] += 1
+	return stats
+
+
+def watch_template(*, template_path: str, app_path: str, variables: Dict[str, str]):
+	'''Keeps app in sync with template, until interrupted, by scanning template for changes, and rendering only files that changed. Other steps of 'create' are never run again'''
+	renderer = template_renderer(template_path=template_path, variables=variables)
+	snapshot = template_snapshot(template_path=template_path)
+	start = time.perf_counter()
+	stats = sync_files(
+		template_path=template_path,
+		app_path=app_path,
+		renderer=renderer,
+		rel_paths=list(snapshot.keys()),
+	)
+	logger.info(
+		f'App synced with template, with {stats["written"]} files written, in {time.perf_counter() - start:.3f}s.'
+	)
+	logger.info(f'Watching \'{template_path}\' for changes. Press Ctrl+C to stop.')
+
+	try:
+		while True:
+			time.sleep(WATCH_INTERVAL)
+			new_snapshot = template_snapshot(template_path=template_path)
+			changed = [
+				rel_path
+				for rel_path in snapshot.keys() | new_snapshot.keys()
+				if snapshot.get(rel_path) != new_snapshot.get(rel_path)
+			]
+			if not changed:
+				continue
+
+			start = time.perf_counter()
+			rel_paths = changed
+			# [DOC] Changed manifest can change rules, and paths of any file, so all files are synced
+			if MANIFEST_NAME in changed:
+				logger.info('Template manifest changed. Attempting to sync all files of template.')
+				old_paths = {
+					rel_path: renderer.render_path(rel_path.replace(os.sep, '/'))
+					for rel_path in snapshot.keys()
+				}
+				renderer = template_renderer(template_path=template_path, variables=variables)
+				rel_paths = list(new_snapshot.keys() | set(changed))
+				# [DOC] Files renamed by new manifest are removed from their old paths
+				for rel_path, old_path in old_paths.items():
+					if (
+						rel_path in new_snapshot
+						and renderer.render_path(rel_path.replace(os.sep, '/')) != old_path
+						and os.path.lexists(os.path.join(app_path, old_path))
+					):
+						os.remove(os.path.join(app_path, old_path))
+
+			try:
+				stats = sync_files(
+					template_path=template_path,
+					app_path=app_path,
+					renderer=renderer,
+					rel_paths=sorted(rel_paths),
+				)
+			except Exception as e:
+				# [DOC] Files can be caught mid-save by editors, so failed syncs are retried on next scan
+				logger.warning(f'Failed to sync app with template: {e}')
+				continue
+			snapshot = new_snapshot
+			if stats['written'] or stats['removed']:
+				logger.info(
+					f'Synced template changes, with {stats["written"]} files written, and {stats["removed"]} removed, in {time.perf_counter() - start:.3f}s: {", ".join(sorted(changed)[:5])}{"..." if len(changed) > 5 else ""}'
+				)
+	except KeyboardInterrupt:
+		logger.info('Stopped watching template.')
@@ -0,0 +1,191 @@
+from nawah_cli.cache import cache_dir
+from nawah_cli.trace import span
+
+from typing import Dict, List, Any
+
+import os, sys, re, json, time, hashlib, logging, site, subprocess, tempfile, shutil, threading, contextlib, importlib.metadata, concurrent.futures
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+logger = logging.getLogger('nawah')
+
+
+class PipError(Exception):
+	pass
+
+
+def wheelhouse_dir() -> str:
+	return os.path.join(cache_dir(), 'wheelhouse')
+
+
+def read_requirements(*, req_path: str) -> List[str]:
+	'''Returns requirements of requirements file, stripped of comments, and blank lines'''
+	with open(req_path, 'r') as req_file:
+		return [
+			line
+			for line in (re.sub(r'(^|\s)#.*$', '', line).strip() for line in req_file)
+			if line
+		]
+
+
+def requirements_fingerprint(*, requirements: List[str]) -> str:
+	'''Returns hash of requirements, and of interpreter, and site they are installed for'''
+	fingerprint = hashlib.sha256()
+	for requirement in sorted(requirements):
+		fingerprint.update(f'{requirement}\n'.encode('utf-8'))
+	fingerprint.update(
+		f'{sys.executable}|{sys.version}|{site.getusersitepackages()}'.encode('utf-8')
+	)
+	return fingerprint.hexdigest()
+
+
+def requirements_satisfied(*, requirements: List[str]) -> bool:
+	'''Checks whether all requirements are installed, with pinned version if any. Requirements that can't be checked are considered not satisfied'''
+	for requirement in requirements:
+		match = re.match(
+			r'^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*(==\s*([^\s;,]+))?\s*$', requirement
+		)
+		if not match:
+			return False
+		# [DOC] User site is searched explicitly, as it is not in sys.path if created after startup
+		distributions = list(
+			importlib.metadata.distributions(
+				name=match.group(1), path=[site.getusersitepackages(), *sys.path]
+			)
+		)
+		if not distributions:
+			return False
+		if match.group(4) and distributions[0].version != match.group(4):
+			return False
+	return True
+
+
+def _read_record(name: str) -> Dict[str, Any]:
+	try:
+		with open(os.path.join(cache_dir(), 'pip', name), 'r') as record_file:
+			return json.loads(record_file.read())
+	except (FileNotFoundError, json.JSONDecodeError):
+		return {}
+
+
+def _write_record(name: str, record: Dict[str, Any]):
+	os.makedirs(os.path.join(cache_dir(), 'pip'), exist_ok=True)
+	record_path = os.path.join(cache_dir(), 'pip', name)
+	with open(f'{record_path}.{os.getpid()}.{threading.get_ident()}', 'w') as record_file:
+		record_file.write(json.dumps(record))
+	os.replace(f'{record_path}.{os.getpid()}.{threading.get_ident()}', record_path)
+
+
+def prefetch_wheelhouse(*, req_path: str, requirements: List[str], max_workers: int = None):
+	'''Downloads requirements, and their dependencies, into wheelhouse, one pip process per requirement in parallel'''
+	os.makedirs(os.path.join(wheelhouse_dir(), '.tmp'), exist_ok=True)
+
+	def download(pip_args: List[str]):
+		# [DOC] Each pip process downloads to its own dir, so no two write the same file at once
+		with tempfile.TemporaryDirectory(dir=os.path.join(wheelhouse_dir(), '.tmp')) as dest:
+			with span(f'pip download {" ".join(pip_args)}', category='subprocess'):
+				pip_call = subprocess.call(
+					[sys.executable, '-m', 'pip', 'download', '--quiet', '--dest', dest] + pip_args
+				)
+			if pip_call != 0:
+				raise PipError(f'\'pip download\' call failed for: {" ".join(pip_args)}')
+			for dist_file in os.listdir(dest):
+				os.replace(
+					os.path.join(dest, dist_file), os.path.join(wheelhouse_dir(), dist_file)
+				)
+
+	# [DOC] Requirements files with options can only be processed as a whole
+	if any(requirement.startswith('-') for requirement in requirements):
+		download(['-r', req_path])
+		return
+	with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+		list(executor.map(lambda requirement: download([requirement]), requirements))
+
+
+def install_from_wheelhouse(
+	*,
+	pip_command: List[str],
+	req_path: str,
+	requirements: List[str],
+	fingerprint: str,
+	max_workers: int = None,
+):
+	'''Runs pip_command for requirements from local wheelhouse, prefetching them first if not prefetched earlier, falling back to index'''
+	prefetched = _read_record('wheelhouse.json')
+	try:
+		if fingerprint not in prefetched:
+			logger.info(
+				f'Attempting to prefetch Nawah framework requirements to wheelhouse: {wheelhouse_dir()}'
+			)
+			prefetch_wheelhouse(
+				req_path=req_path, requirements=requirements, max_workers=max_workers
+			)
+			prefetched[fingerprint] = time.time()
+			_write_record('wheelhouse.json', prefetched)
+		logger.info('Attempting to install Nawah framework requirements from wheelhouse')
+		with span('pip install', category='subprocess', wheelhouse=True):
+			pip_call = subprocess.call(
+				pip_command + ['--no-index', '--find-links', wheelhouse_dir(), '-r', req_path]
+			)
+		if pip_call != 0:
+			raise PipError('\'pip install\' call from wheelhouse failed')
+	except PipError as e:
+		logger.warning(f'{e}. Attempting to install Nawah framework requirements from index.')
+		with span('pip install', category='subprocess'):
+			if subprocess.call(pip_command + ['-r', req_path]) != 0:
+				raise PipError('\'pip install\' call failed')
+
+
+@contextlib.contextmanager
+def _install_lock(fingerprint: str):
+	os.makedirs(os.path.join(cache_dir(), 'pip'), exist_ok=True)
+	with open(os.path.join(cache_dir(), 'pip', f'{fingerprint}.lock'), 'a') as lock_file:
+		if fcntl:
+			fcntl.flock(lock_file, fcntl.LOCK_EX)
+		try:
+			yield
+		finally:
+			if fcntl:
+				fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def install_requirements(*, req_path: str, use_cache: bool = True, max_workers: int = None):
+	'''Installs requirements to user site. With use_cache, installation is skipped if same requirements were installed earlier, and are still satisfied. Otherwise, requirements are installed from local wheelhouse, falling back to index'''
+	pip_command = [sys.executable, '-m', 'pip', 'install', '--user']
+
+	if not use_cache:
+		with span('pip install', category='subprocess'):
+			if subprocess.call(pip_command + ['-r', req_path]) != 0:
+				raise PipError('\'pip install\' call failed')
+		return
+
+	requirements = read_requirements(req_path=req_path)
+	fingerprint = requirements_fingerprint(requirements=requirements)
+	# [DOC] Apps created at once wait for one of them to install requirements, then all skip it
+	with _install_lock(fingerprint):
+		fingerprints = _read_record('fingerprints.json')
+		if fingerprint in fingerprints and requirements_satisfied(requirements=requirements):
+			logger.info(
+				'Nawah framework requirements were installed earlier, and are satisfied. Skipping.'
+			)
+			return
+
+		install_from_wheelhouse(
+			pip_command=pip_command,
+			req_path=req_path,
+			requirements=requirements,
+			fingerprint=fingerprint,
+			max_workers=max_workers,
+		)
+
+		fingerprints[fingerprint] = time.time()
+		_write_record('fingerprints.json', fingerprints)
+
+
+def clear_wheelhouse():
+	for path in [wheelhouse_dir(), os.path.join(cache_dir(), 'pip')]:
+		if os.path.exists(path):
+			shutil.rmtree(path)
@@ -0,0 +1,126 @@
+from typing import Dict, Iterator, List, Type
+
+import os, io, tarfile, zipfile, threading, contextlib, http.server, functools
+
+import pytest
+
+API_LEVEL = '1.0'
+
+
+class ArtifactsHandler(http.server.SimpleHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	def log_message(self, format, *args):
+		pass
+
+
+def recording_handler(
+	handler: Type[http.server.SimpleHTTPRequestHandler] = ArtifactsHandler,
+) -> Type[http.server.SimpleHTTPRequestHandler]:
+	'''Returns subclass of handler that records every request it gets in its requests'''
+
+	class RecordingHandler(handler):
+		requests: List[http.server.BaseHTTPRequestHandler] = []
+
+		def log_message(self, format, *args):
+			pass
+
+		def do_GET(self):
+			self.requests.append(self)
+			super().do_GET()
+
+	return RecordingHandler
+
+
+@contextlib.contextmanager
+def http_server(
+	*, path: str, handler: Type[http.server.BaseHTTPRequestHandler] = ArtifactsHandler
+) -> Iterator[str]:
+	'''Serves path over HTTP on free local port, yielding its base URL'''
+	server = http.server.ThreadingHTTPServer(
+		('127.0.0.1', 0), functools.partial(handler, directory=path)
+	)
+	server.daemon_threads = True
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	try:
+		yield f'http://127.0.0.1:{server.server_address[1]}'
+	finally:
+		server.shutdown()
+		server.server_close()
+
+
+def _add_file(archive: tarfile.TarFile, name: str, content: bytes):
+	file_info = tarfile.TarInfo(name)
+	file_info.size = len(content)
+	archive.addfile(file_info, io.BytesIO(content))
+
+
+def make_artifacts(
+	*,
+	path: str,
+	api_level: str = API_LEVEL,
+	template_files: Dict[str, bytes] = None,
+	stubs_files: Dict[str, bytes] = None,
+):
+	'''Writes synthetic artifacts of API Level to path, laid out as upstream'''
+	os.makedirs(os.path.join(path, api_level), exist_ok=True)
+	root_path = f'nawah_app_template-APIv{api_level}'
+	template_files = template_files or {
+		'nawah_app.py': b'from nawah.classes import APP_CONFIG\nconfig = APP_CONFIG(name=\'__PROJECT_NAME__\', data_name=\'__DATA_NAME__\', admin_doc={\'email\': \'__ADMIN_DOC_EMAIL__\'}, admin_password=\'__ADMIN_PASSWORD__\', packages=\'__PROJECT_NAME__\')\n',
+		'.gitignore': b'__pycache__/\nPROJECT_NAME.log\n',
+		'packages/PROJECT_NAME/__init__.py': b'',
+		**{f'packages/PROJECT_NAME/module_{i}.py': f'x = {i}\n'.encode('utf-8') for i in range(20)},
+	}
+	with tarfile.open(os.path.join(path, f'APIv{api_level}.tar.gz'), 'w:gz') as archive:
+		for name, content in template_files.items():
+			_add_file(archive, f'{root_path}/{name}', content)
+
+	with zipfile.ZipFile(os.path.join(path, api_level, 'nawah.whl'), 'w') as wheel:
+		wheel.writestr('nawah/__init__.py', '')
+		wheel.writestr('nawah/cli.py', 'def nawah_cli():\n\tprint(\'framework cli\')\n')
+		for i in range(40):
+			wheel.writestr(f'nawah/m{i}.py', f'def f():\n\treturn {i}\n' * 20)
+
+	stubs_files = stubs_files or {
+		f's{i}.pyi': f'def f{i}() -> int: ...\n'.encode('utf-8') for i in range(10)
+	}
+	with tarfile.open(os.path.join(path, api_level, 'stubs.tar.gz'), 'w:gz') as archive:
+		for name, content in stubs_files.items():
+			_add_file(archive, f'./{name}', content)
+
+	with open(os.path.join(path, api_level, 'requirements.txt'), 'w') as req_file:
+		req_file.write('# Synthetic requirements, installing nothing\n')
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch) -> str:
+	'''Isolates cache, and index loaded once per process, of every test'''
+	import nawah_cli.index
+
+	path = str(tmp_path / 'cache')
+	monkeypatch.setenv('NAWAH_CACHE_DIR', path)
+	monkeypatch.setenv('NAWAH_INDEX_TTL', '600')
+	monkeypatch.setattr(nawah_cli.index, '_index', None, raising=False)
+	monkeypatch.setattr(nawah_cli.index, '_index_loaded', False)
+	for env_var in [
+		'NAWAH_MIRROR_URL',
+		'NAWAH_TEMPLATE_BASE_URL',
+		'NAWAH_FRAMEWORK_BASE_URL',
+		'NAWAH_STUBS_BASE_URL',
+		'NAWAH_REQUIREMENTS_BASE_URL',
+	]:
+		monkeypatch.delenv(env_var, raising=False)
+	return path
+
+
+@pytest.fixture
+def artifacts_server(tmp_path, monkeypatch) -> Iterator[str]:
+	'''Serves synthetic artifacts as mirror of all artifacts, yielding its base URL'''
+	path = str(tmp_path / 'artifacts')
+	make_artifacts(path=path)
+	with http_server(path=path) as base_url:
+		monkeypatch.setenv('NAWAH_MIRROR_URL', base_url)
+		# [DOC] Keep requirements installation off user site of machine running tests
+		monkeypatch.setenv('PYTHONUSERBASE', str(tmp_path / 'userbase'))
+		yield base_url
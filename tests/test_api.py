@@ -0,0 +1,52 @@
+import os, asyncio
+
+import pytest
+
+from nawah_cli.api import create_app, InvalidArgError, ProgressError
+
+
+def test_create_app(artifacts_server, tmp_path):
+	result = asyncio.run(
+		create_app(app_name='app_one', app_path=str(tmp_path), config={'data_name': 'app_one_data'})
+	)
+	assert result['app_path'] == os.path.join(str(tmp_path), 'app_one')
+	assert result['config']['data_name'] == 'app_one_data'
+	with open(os.path.join(result['app_path'], 'nawah_app.py'), 'r') as f:
+		assert 'data_name=\'app_one_data\'' in f.read()
+	assert os.path.exists(os.path.join(result['app_path'], 'packages', 'app_one', 'module_0.py'))
+	assert not os.path.exists(os.path.join(result['app_path'], 'progress.json'))
+
+
+def test_create_app_existing(artifacts_server, tmp_path):
+	os.makedirs(tmp_path / 'app_one')
+	with pytest.raises(ProgressError):
+		asyncio.run(create_app(app_name='app_one', app_path=str(tmp_path)))
+
+
+def test_create_app_concurrent(artifacts_server, tmp_path):
+	'''Apps are created on threads of one process, sharing cache, and its temp files'''
+
+	async def create_apps():
+		return await asyncio.gather(
+			*(
+				create_app(app_name=f'app_{i}', app_path=str(tmp_path), compile=True)
+				for i in range(6)
+			),
+			return_exceptions=True,
+		)
+
+	results = asyncio.run(create_apps())
+	assert [result for result in results if isinstance(result, BaseException)] == []
+	for i in range(6):
+		assert os.path.exists(os.path.join(str(tmp_path), f'app_{i}', 'framework-1.0.whl'))
+
+
+def test_create_app_git_commit_symlink(tmp_path):
+	'''Symlinks into store of this machine are never committed'''
+	with pytest.raises(InvalidArgError):
+		asyncio.run(
+			create_app(
+				app_name='app_one', app_path=str(tmp_path), git_commit=True, link_framework='symlink'
+			)
+		)
+	assert not os.path.exists(tmp_path / 'app_one')
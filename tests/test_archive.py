@@ -0,0 +1,81 @@
+import os, io, tarfile, tracemalloc
+
+from nawah_cli.archive import extract_archive, write_file
+
+
+class StreamReader:
+	'''File-like object that can only be read forward, as HTTP responses'''
+
+	def __init__(self, fileobj):
+		self._fileobj = fileobj
+
+	def read(self, size: int = -1) -> bytes:
+		return self._fileobj.read(size)
+
+
+def _archive(path: str, files: dict):
+	with tarfile.open(path, 'w:gz') as archive:
+		for name, content in files.items():
+			file_info = tarfile.TarInfo(name)
+			file_info.size = len(content)
+			archive.addfile(file_info, io.BytesIO(content))
+
+
+def test_extract_archive(tmp_path):
+	archive_path = str(tmp_path / 'archive.tar.gz')
+	_archive(
+		archive_path,
+		{
+			'root/a.py': b'a = 1\n',
+			'root/docs/b.md': b'# b\n',
+			'other/c.py': b'c = 1\n',
+		},
+	)
+	with open(archive_path, 'rb') as f:
+		stats = extract_archive(fileobj=StreamReader(f), path=str(tmp_path / 'all'), root_path='root')
+	assert stats == {'files': 2, 'bytes': 10}
+	assert (tmp_path / 'all' / 'a.py').read_bytes() == b'a = 1\n'
+	assert (tmp_path / 'all' / 'docs' / 'b.md').read_bytes() == b'# b\n'
+	assert not (tmp_path / 'all' / 'other').exists()
+
+	with open(archive_path, 'rb') as f:
+		stats = extract_archive(
+			fileobj=StreamReader(f), path=str(tmp_path / 'docs'), root_path='root', search_path='docs'
+		)
+	assert stats == {'files': 1, 'bytes': 4}
+	assert os.listdir(str(tmp_path / 'docs')) == ['docs']
+
+
+def test_extract_archive_bounded_memory(tmp_path):
+	'''Archives are extracted with memory bounded by chunks, not by size of archive, or of its files'''
+	# [DOC] Content is not compressible, as with most archives, so every chunk read inflates to chunk of same order
+	content = os.urandom(1024 * 1024) * 32
+	archive_path = str(tmp_path / 'archive.tar.gz')
+	with tarfile.open(archive_path, 'w:gz', compresslevel=1) as archive:
+		file_info = tarfile.TarInfo('root/big.bin')
+		file_info.size = len(content)
+		archive.addfile(file_info, io.BytesIO(content))
+
+	tracemalloc.start()
+	try:
+		with open(archive_path, 'rb') as f:
+			stats = extract_archive(fileobj=StreamReader(f), path=str(tmp_path / 'app'), root_path='root')
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+	assert stats == {'files': 1, 'bytes': len(content)}
+	assert os.path.getsize(str(tmp_path / 'app' / 'big.bin')) == len(content)
+	assert peak < 4 * 1024 * 1024
+
+
+def test_write_file_bounded_memory(tmp_path):
+	size = 32 * 1024 * 1024
+	fileobj = StreamReader(io.BytesIO(bytes(size)))
+	tracemalloc.start()
+	try:
+		write_file(fileobj=fileobj, path=str(tmp_path / 'file'))
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+	assert os.path.getsize(str(tmp_path / 'file')) == size
+	assert peak < 4 * 1024 * 1024
@@ -0,0 +1,119 @@
+from typing import List
+
+import os, sys, json, logging, subprocess
+
+import pytest
+
+from nawah_cli.batch import _app_logging
+
+from conftest import make_artifacts
+
+
+def test_app_logging(capsys):
+	logger = logging.getLogger('nawah')
+	cli_handler = logging.StreamHandler()
+	cli_formatter = logging.Formatter('%(message)s')
+	cli_handler.setFormatter(cli_formatter)
+	logger.addHandler(cli_handler)
+	handlers = list(logger.handlers)
+	try:
+		with _app_logging('app_one'):
+			logger.info('Attempting to create app.')
+		assert logger.handlers == handlers
+		assert cli_handler.formatter is cli_formatter
+	finally:
+		logger.removeHandler(cli_handler)
+	err = capsys.readouterr().err
+	assert '[app_one]  Attempting to create app.' in err
+	assert err.count('Attempting to create app.') == 1
+
+
+@pytest.fixture
+def pip_log(tmp_path, monkeypatch) -> str:
+	'''Records pip calls of all processes, with args after 'pip', to file, instead of running them'''
+	log_path = str(tmp_path / 'pip.log')
+	subprocess_call = subprocess.call
+
+	def call(command, **kwargs):
+		if command[1:3] != ['-m', 'pip']:
+			return subprocess_call(command, **kwargs)
+		with open(log_path, 'a') as log_file:
+			log_file.write(json.dumps(command[3:]) + '\n')
+		return 0
+
+	monkeypatch.setattr(subprocess, 'call', call)
+	return log_path
+
+
+def _create_batch(monkeypatch, *, batch_path: str, args: List[str] = None) -> int:
+	from nawah_cli.cli import nawah_cli
+
+	monkeypatch.setattr(sys, 'argv', ['nawah', 'create', '--batch', batch_path, '--jobs', '2', *(args or [])])
+	try:
+		nawah_cli()
+	except SystemExit as e:
+		return e.code
+	return 0
+
+
+def test_create_batch(artifacts_server, tmp_path, monkeypatch, capsys, pip_log):
+	'''Apps of manifest are created in parallel, with artifacts, and requirements, of every API Level prepared once'''
+	artifacts_path = str(tmp_path / 'artifacts')
+	make_artifacts(path=artifacts_path, api_level='1.1')
+	for api_level, requirement in [('1.0', 'pytest'), ('1.1', 'pluggy')]:
+		with open(os.path.join(artifacts_path, api_level, 'requirements.txt'), 'w') as req_file:
+			req_file.write(f'{requirement}\n')
+
+	apps_path = str(tmp_path / 'apps')
+	batch_path = str(tmp_path / 'apps.json')
+	with open(batch_path, 'w') as batch_file:
+		batch_file.write(
+			json.dumps(
+				[
+					{'app_name': 'app_one', 'app_path': apps_path, 'config': {'data_name': 'app_one_data'}},
+					{'app_name': 'app_two', 'app_path': apps_path, 'api_level': '1.1'},
+					{'app_name': 'app_three', 'app_path': apps_path},
+					{'app_name': 'app_four', 'app_path': apps_path, 'template': str(tmp_path / 'missing')},
+				]
+			)
+		)
+
+	assert _create_batch(monkeypatch, batch_path=batch_path) == 1
+	results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+	assert [(result['app_name'], result['api_level'], result['status']) for result in results] == [
+		('app_one', '1.0', 'created'),
+		('app_two', '1.1', 'created'),
+		('app_three', '1.0', 'created'),
+		('app_four', '1.0', 'failed'),
+	]
+	assert results[3]['exit_code'] == 1
+	assert results[0]['app_path'] == os.path.join(apps_path, 'app_one')
+
+	with open(os.path.join(apps_path, 'app_one', 'nawah_app.py'), 'r') as f:
+		assert 'data_name=\'app_one_data\'' in f.read()
+	with open(os.path.join(apps_path, 'app_three', 'nawah_app.py'), 'r') as f:
+		assert 'data_name=\'app_one_data\'' not in f.read()
+	with open(os.path.join(apps_path, 'app_two', 'requirements.txt'), 'r') as f:
+		assert f.read() == 'pluggy\n'
+
+	# [DOC] Requirements are installed once per API Level, before apps are created
+	with open(pip_log, 'r') as log_file:
+		pip_installs = [pip_args for pip_args in map(json.loads, log_file) if pip_args[0] == 'install']
+	assert len(pip_installs) == 2
+
+
+def test_create_batch_invalid(tmp_path, monkeypatch):
+	batch_path = str(tmp_path / 'apps.json')
+	for batch in [
+		{'app_name': 'app_one'},
+		[{'app_path': 'apps'}],
+		[{'app_name': 'app_one', 'packages': []}],
+		[{'app_name': 'app_one'}, {'app_name': 'app_one', 'app_path': '.'}],
+	]:
+		with open(batch_path, 'w') as batch_file:
+			batch_file.write(json.dumps(batch))
+		assert _create_batch(monkeypatch, batch_path=batch_path) == 1
+
+	with open(batch_path, 'w') as batch_file:
+		batch_file.write(json.dumps([{'app_name': 'app_one'}]))
+	assert _create_batch(monkeypatch, batch_path=batch_path, args=['app_one']) == 1
@@ -0,0 +1,42 @@
+import os, sys, zipfile, importlib.util
+
+from nawah_cli.bytecode import compile_app
+from nawah_cli.framework import app_framework_path
+
+
+def _make_app(app_path: str):
+	os.makedirs(os.path.join(app_path, 'packages', 'app'))
+	with open(os.path.join(app_path, 'nawah_app.py'), 'w') as f:
+		f.write('config = None\n')
+	with open(os.path.join(app_path, 'packages', 'app', 'invalid.py'), 'w') as f:
+		f.write('def f(:\n')
+	with zipfile.ZipFile(os.path.join(app_path, 'framework-1.0.whl'), 'w') as wheel:
+		wheel.writestr('nawah/__init__.py', '')
+		wheel.writestr('nawah/cli.py', 'def nawah_cli():\n\tpass\n')
+
+
+def _pyc_flags(py_path: str) -> int:
+	with open(importlib.util.cache_from_source(py_path), 'rb') as pyc_file:
+		return int.from_bytes(pyc_file.read(8)[4:8], 'little')
+
+
+def test_compile_app(tmp_path):
+	app_path = str(tmp_path / 'app')
+	_make_app(app_path)
+	stats = compile_app(app_path=app_path, invalidation_mode='checked-hash', workers=1)
+	assert stats['failed'] == [os.path.join('packages', 'app', 'invalid.py')]
+	assert _pyc_flags(os.path.join(app_path, 'nawah_app.py')) == 3
+
+	# [DOC] Framework is unpacked into app, and compiled with invalidation mode of app
+	framework_path = app_framework_path(whl_path=os.path.join(app_path, 'framework-1.0.whl'))
+	assert framework_path == os.path.join(app_path, 'framework-1.0')
+	assert _pyc_flags(os.path.join(framework_path, 'nawah', 'cli.py')) == 3
+
+
+def test_app_framework_stale(tmp_path):
+	app_path = str(tmp_path / 'app')
+	_make_app(app_path)
+	compile_app(app_path=app_path, invalidation_mode='timestamp', workers=1)
+	with zipfile.ZipFile(os.path.join(app_path, 'framework-1.0.whl'), 'a') as wheel:
+		wheel.writestr('nawah/new.py', '')
+	assert app_framework_path(whl_path=os.path.join(app_path, 'framework-1.0.whl')) is None
@@ -0,0 +1,148 @@
+import os, time, hashlib, concurrent.futures
+
+import pytest
+
+from nawah_cli.cache import (
+	cache_entries,
+	cache_get,
+	cache_put,
+	cache_prune,
+	fetch_artifact,
+	hash_file,
+	stream_artifact,
+	download_manager,
+	_object_path,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	'''Advances time by one second on every call, for access order of cache entries to be strict'''
+	now = [time.time()]
+
+	def tick():
+		now[0] += 1
+		return now[0]
+
+	monkeypatch.setattr(time, 'time', tick)
+
+
+def _content(path: str) -> bytes:
+	with open(path, 'rb') as f:
+		return f.read()
+
+
+def _put(tmp_path, *, api_level: str, artifact: str, content: bytes) -> str:
+	path = str(tmp_path / f'{api_level}_{artifact}')
+	with open(path, 'wb') as f:
+		f.write(content)
+	return cache_put(api_level=api_level, artifact=artifact, path=path, url=f'http://source/{artifact}')
+
+
+def test_cache_put_get(tmp_path):
+	object_path = _put(tmp_path, api_level='1.0', artifact='framework', content=b'framework')
+	assert os.path.basename(object_path) == hash_file(object_path)
+	assert not os.path.exists(str(tmp_path / '1.0_framework'))
+	assert cache_get(api_level='1.0', artifact='framework') == object_path
+	assert cache_get(api_level='1.0', artifact='framework', expected_hash='0' * 64) is None
+	assert cache_get(api_level='1.0', artifact='stubs') is None
+
+	# [DOC] Corrupted objects are dropped
+	with open(object_path, 'ab') as f:
+		f.write(b'corrupted')
+	assert cache_get(api_level='1.0', artifact='framework') is None
+	assert cache_entries() == []
+
+
+def test_cache_prune_lru(tmp_path, clock):
+	paths = {
+		api_level: _put(tmp_path, api_level=api_level, artifact='framework', content=api_level.encode('utf-8') * 100)
+		for api_level in ['1.0', '1.1', '1.2']
+	}
+	# [DOC] Use oldest entry, for second oldest to be least recently used
+	assert cache_get(api_level='1.0', artifact='framework')
+
+	removed_entries = cache_prune(max_size=600)
+	assert [entry['api_level'] for entry in removed_entries] == ['1.1']
+	assert not os.path.exists(paths['1.1'])
+	assert [entry['api_level'] for entry in cache_entries()] == ['1.0', '1.2']
+
+	assert cache_prune(max_size=0, keep=['1.2:framework'])
+	assert [entry['api_level'] for entry in cache_entries()] == ['1.2']
+	assert os.path.exists(paths['1.2'])
+
+
+def test_cache_prune_shared_object(tmp_path, clock):
+	'''Objects are only removed once no entry refers to them'''
+	old_path = _put(tmp_path, api_level='1.0', artifact='stubs', content=b'stubs' * 100)
+	new_path = _put(tmp_path, api_level='1.1', artifact='stubs', content=b'stubs' * 100)
+	assert old_path == new_path
+	_put(tmp_path, api_level='1.1', artifact='framework', content=b'framework' * 100)
+	assert cache_get(api_level='1.1', artifact='stubs')
+
+	removed_entries = cache_prune(max_size=600)
+	assert [(entry['api_level'], entry['artifact']) for entry in removed_entries] == [
+		('1.0', 'stubs'),
+		('1.1', 'framework'),
+	]
+	assert os.path.exists(new_path)
+	assert cache_get(api_level='1.1', artifact='stubs') == new_path
+
+
+def test_cache_max_size(tmp_path, clock, monkeypatch):
+	monkeypatch.setenv('NAWAH_CACHE_MAX_SIZE', '1K')
+	for api_level in ['1.0', '1.1', '1.2']:
+		_put(tmp_path, api_level=api_level, artifact='framework', content=os.urandom(400))
+	assert [entry['api_level'] for entry in cache_entries()] == ['1.1', '1.2']
+
+
+def test_fetch_artifact_cached(artifacts_server):
+	object_path = fetch_artifact(api_level='1.0', artifact='framework')
+	assert object_path == _object_path(hash_file(object_path))
+	assert fetch_artifact(api_level='1.0', artifact='framework') == object_path
+
+
+def test_cache_put_concurrent(tmp_path):
+	'''Same object put by many creates at once is moved into cache once, and kept'''
+	content = os.urandom(100 * 1024)
+
+	def put(i: int) -> str:
+		return _put(tmp_path, api_level=f'1.{i}', artifact='framework', content=content)
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+		object_paths = set(executor.map(put, range(16)))
+	assert len(object_paths) == 1
+	assert hash_file(object_paths.pop()) == hashlib.sha256(content).hexdigest()
+	assert len(cache_entries()) == 16
+	assert [path for path in os.listdir(str(tmp_path)) if path.startswith('1.')] == []
+
+
+def _stream_framework(consume) -> bytes:
+	with download_manager() as manager:
+		return stream_artifact(api_level='1.0', artifact='framework', consume=consume, manager=manager)
+
+
+def test_stream_artifact(artifacts_server, tmp_path):
+	'''Artifacts not cached are consumed while downloaded, and copied to cache, even if consume stops reading early'''
+	wheel_path = str(tmp_path / 'artifacts' / '1.0' / 'nawah.whl')
+	assert _stream_framework(lambda f: f.read(100)) == _content(wheel_path)[:100]
+	object_path = cache_get(api_level='1.0', artifact='framework')
+	assert _content(object_path) == _content(wheel_path)
+	assert os.path.basename(object_path) == hash_file(wheel_path)
+	assert os.listdir(os.path.join(os.environ['NAWAH_CACHE_DIR'], 'tmp')) == []
+
+	os.remove(wheel_path)
+	assert _stream_framework(lambda f: f.read()) == _content(object_path)
+
+
+def test_stream_artifact_failed(artifacts_server):
+	'''Downloads that fail to be consumed are dropped, and never cached'''
+
+	def consume(f):
+		f.read(100)
+		raise ValueError('Invalid artifact')
+
+	with pytest.raises(ValueError):
+		_stream_framework(consume)
+	assert cache_get(api_level='1.0', artifact='framework') is None
+	assert os.listdir(os.path.join(os.environ['NAWAH_CACHE_DIR'], 'tmp')) == []
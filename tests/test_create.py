@@ -0,0 +1,72 @@
+import os, json, shutil, asyncio, tarfile, argparse
+
+import pytest
+
+from nawah_cli.api import create_app
+from nawah_cli.create import create_step_config
+
+
+def _legacy_app(*, artifacts_path: str, app_path: str, step: int) -> dict:
+	'''Writes app as earlier versions left it, with progress saved at step, and returns its config'''
+	app_config = create_step_config(args=argparse.Namespace(default_config=True), config={})
+	# [DOC] Earlier versions extracted template as is, then rendered it in later steps
+	root_path = 'nawah_app_template-APIv1.0/'
+	with tarfile.open(os.path.join(artifacts_path, 'APIv1.0.tar.gz'), 'r:gz') as archive:
+		members = [member for member in archive.getmembers() if member.path.startswith(root_path)]
+		for member in members:
+			member.path = member.path[len(root_path) :]
+		archive.extractall(path=app_path, members=members)
+	shutil.copyfile(os.path.join(artifacts_path, '1.0', 'nawah.whl'), os.path.join(app_path, 'framework-1.0.whl'))
+	shutil.copyfile(os.path.join(artifacts_path, '1.0', 'requirements.txt'), os.path.join(app_path, 'requirements.txt'))
+
+	app_name = os.path.basename(app_path)
+	if step > 3:
+		with open(os.path.join(app_path, 'nawah_app.py'), 'r') as f:
+			nawah_app_file = f.read().replace('__PROJECT_NAME__', app_name, 2)
+		for config_set in app_config.values():
+			nawah_app_file = nawah_app_file.replace(config_set[0], config_set[1], 1)
+		with open(os.path.join(app_path, 'nawah_app.py'), 'w') as f:
+			f.write(nawah_app_file)
+	if step > 4:
+		with open(os.path.join(app_path, '.gitignore'), 'r') as f:
+			gitignore_file = f.read().replace('PROJECT_NAME', app_name, 1)
+		with open(os.path.join(app_path, '.gitignore'), 'w') as f:
+			f.write(gitignore_file)
+	if step > 5:
+		with open(os.path.join(app_path, 'LICENSE'), 'w') as f:
+			f.write('')
+	if step > 6:
+		with open(os.path.join(app_path, 'README.md'), 'w') as f:
+			f.write(f'# {app_name}')
+
+	with open(os.path.join(app_path, 'progress.json'), 'w') as progress_file:
+		progress_file.write(
+			json.dumps(
+				{
+					'step': step,
+					'args': {'app_path': os.path.dirname(app_path), 'app_name': app_name},
+					'config': app_config,
+				}
+			)
+		)
+	return app_config
+
+
+@pytest.mark.parametrize('step', range(1, 8))
+def test_create_app_legacy_progress(artifacts_server, tmp_path, step):
+	'''Apps of progress of earlier versions are rendered, and renamed, whichever step they stopped at'''
+	app_path = str(tmp_path / 'apps' / 'app_one')
+	app_config = _legacy_app(artifacts_path=str(tmp_path / 'artifacts'), app_path=app_path, step=step)
+
+	result = asyncio.run(create_app(app_name='app_one', app_path=str(tmp_path / 'apps')))
+	assert result['config']['admin_password'] == app_config['admin_password'][1]
+	assert os.listdir(os.path.join(app_path, 'packages')) == ['app_one']
+	with open(os.path.join(app_path, 'nawah_app.py'), 'r') as f:
+		nawah_app_file = f.read()
+	assert '__PROJECT_NAME__' not in nawah_app_file
+	assert app_config['admin_password'][1] in nawah_app_file
+	with open(os.path.join(app_path, '.gitignore'), 'r') as f:
+		assert 'app_one.log' in f.read()
+	assert os.path.exists(os.path.join(app_path, 'LICENSE'))
+	assert os.path.exists(os.path.join(app_path, 'README.md'))
+	assert not os.path.exists(os.path.join(app_path, 'progress.json'))
@@ -0,0 +1,48 @@
+import os, time
+
+import pytest
+
+from nawah_cli.daemon import _secure_dir, sources_stamp
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='Daemon is only supported on POSIX')
+
+
+def test_secure_dir(tmp_path):
+	daemons_path = str(tmp_path / 'daemons')
+	assert _secure_dir(daemons_path)
+	assert os.stat(daemons_path).st_mode & 0o777 == 0o700
+
+	# [DOC] Dirs writable by others could have sockets planted in them
+	os.chmod(daemons_path, 0o777)
+	assert not _secure_dir(daemons_path)
+
+	os.symlink(str(tmp_path), str(tmp_path / 'daemons_link'))
+	assert not _secure_dir(str(tmp_path / 'daemons_link'))
+
+
+def _touch(path: str, content: str = ''):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, 'w') as f:
+		f.write(content)
+	# [DOC] Make sure mtime changes on file systems with coarse mtimes
+	os.utime(path, ns=(time.time_ns() + 10 ** 9, time.time_ns() + 10 ** 9))
+
+
+def test_sources_stamp(tmp_path):
+	app_path = str(tmp_path / 'app')
+	_touch(os.path.join(app_path, 'nawah_app.py'))
+	_touch(os.path.join(app_path, 'framework-1.0.whl'))
+	_touch(os.path.join(app_path, 'packages', 'app', '__init__.py'))
+	_touch(os.path.join(app_path, 'nawah', 'stub.py'))
+	stamp = sources_stamp(app_path=app_path, nawah_path=None)
+
+	_touch(os.path.join(app_path, 'nawah', 'stub.py'), 'changed')
+	_touch(os.path.join(app_path, 'docs', 'conf.py'), 'changed')
+	assert sources_stamp(app_path=app_path, nawah_path=None) == stamp
+
+	_touch(os.path.join(app_path, 'packages', 'app', '__init__.py'), 'changed')
+	assert sources_stamp(app_path=app_path, nawah_path=None) != stamp
+	stamp = sources_stamp(app_path=app_path, nawah_path=None)
+
+	_touch(os.path.join(app_path, 'framework-1.0.whl'), 'changed')
+	assert sources_stamp(app_path=app_path, nawah_path=None) != stamp
@@ -0,0 +1,107 @@
+import os, socket
+
+import pytest
+
+from nawah_cli.download import DownloadError, DownloadManager, SourceStats, MAX_REDIRECTS
+
+from conftest import ArtifactsHandler, http_server, recording_handler
+
+
+class RedirectHandler(ArtifactsHandler):
+	'''Redirects '/moved/{path}' to '/{path}', and '/loop/{n}' to '/loop/{n + 1}' forever'''
+
+	def do_GET(self):
+		if self.path.startswith('/moved/'):
+			location = self.path[len('/moved') :]
+		elif self.path.startswith('/loop/'):
+			location = f'/loop/{int(self.path[len("/loop/") :]) + 1}'
+		else:
+			return super().do_GET()
+		self.send_response(302)
+		self.send_header('Location', location)
+		self.send_header('Content-Length', '0')
+		self.end_headers()
+
+
+class DroppingHandler(ArtifactsHandler):
+	'''Closes every connection once response is sent, without telling client, as servers drop idle connections'''
+
+	def do_GET(self):
+		super().do_GET()
+		self.close_connection = True
+
+
+@pytest.fixture
+def files_path(tmp_path) -> str:
+	path = str(tmp_path / 'files')
+	os.makedirs(path)
+	with open(os.path.join(path, 'file.bin'), 'wb') as f:
+		f.write(os.urandom(200 * 1024))
+	return path
+
+
+def _content(path: str) -> bytes:
+	with open(path, 'rb') as f:
+		return f.read()
+
+
+def test_download(files_path, tmp_path):
+	handler = recording_handler()
+	with http_server(path=files_path, handler=handler) as base_url, DownloadManager() as manager:
+		for i in range(3):
+			url = manager.download(urls=[f'{base_url}/file.bin'], path=str(tmp_path / f'file_{i}'))
+			assert url == f'{base_url}/file.bin'
+			assert _content(str(tmp_path / f'file_{i}')) == _content(
+				os.path.join(files_path, 'file.bin')
+			)
+	# [DOC] Downloads share one keep-alive connection
+	assert len({request.client_address for request in handler.requests}) == 1
+
+
+def test_download_redirect(files_path, tmp_path):
+	with http_server(path=files_path, handler=RedirectHandler) as base_url, DownloadManager() as manager:
+		with manager.open(f'{base_url}/moved/file.bin') as response:
+			assert response.status == 200
+			assert response.url == f'{base_url}/file.bin'
+			assert response.read() == _content(os.path.join(files_path, 'file.bin'))
+
+		with pytest.raises(DownloadError) as e:
+			manager.open(f'{base_url}/loop/0')
+		assert e.value.status == 0
+		assert e.value.url == f'{base_url}/loop/{MAX_REDIRECTS + 1}'
+
+
+def test_download_error(files_path):
+	with http_server(path=files_path) as base_url, DownloadManager() as manager:
+		with pytest.raises(DownloadError) as e:
+			manager.open(f'{base_url}/missing.bin')
+		assert e.value.status == 404
+
+
+def test_download_retry_dropped_connection(files_path, tmp_path):
+	'''Idle connection dropped by server is retried once on fresh one'''
+	handler = recording_handler(DroppingHandler)
+	with http_server(path=files_path, handler=handler) as base_url, DownloadManager() as manager:
+		for i in range(3):
+			manager.download(urls=[f'{base_url}/file.bin'], path=str(tmp_path / f'file_{i}'))
+			assert _content(str(tmp_path / f'file_{i}')) == _content(
+				os.path.join(files_path, 'file.bin')
+			)
+	assert len({request.client_address for request in handler.requests}) == 3
+
+
+def test_download_fastest_source(files_path, tmp_path):
+	'''Sources that fail are recorded, and fallen back from'''
+	with socket.socket() as closed_socket:
+		closed_socket.bind(('127.0.0.1', 0))
+		closed_url = f'http://127.0.0.1:{closed_socket.getsockname()[1]}'
+
+	sources = SourceStats(path=str(tmp_path / 'sources.json'))
+	with http_server(path=files_path) as base_url, DownloadManager(sources=sources) as manager:
+		urls = [f'{closed_url}/file.bin', f'{base_url}/file.bin']
+		assert manager.download(urls=urls, path=str(tmp_path / 'file')) == f'{base_url}/file.bin'
+		assert sources.rank(urls) == [f'{base_url}/file.bin', f'{closed_url}/file.bin']
+
+		with pytest.raises(ConnectionError):
+			manager.download(urls=[f'{closed_url}/file.bin'] * 2, path=str(tmp_path / 'file'))
+	assert os.path.exists(str(tmp_path / 'sources.json'))
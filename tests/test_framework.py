@@ -0,0 +1,100 @@
+import os, time, shutil, hashlib, zipfile, importlib.util
+
+import pytest
+
+from nawah_cli.framework import (
+	FRAMEWORK_MAX_AGE,
+	cached_framework_path,
+	framework_cache_dir,
+	unpack_framework,
+	wheel_hash,
+)
+
+
+def _make_wheel(whl_path: str, *, version: int = 1):
+	os.makedirs(os.path.dirname(whl_path), exist_ok=True)
+	with zipfile.ZipFile(whl_path, 'w') as wheel:
+		wheel.writestr('nawah/__init__.py', f'version = {version}\n')
+		wheel.writestr('nawah/cli.py', 'def nawah_cli():\n\tpass\n')
+	# [DOC] Wheels rewritten at once have same size, so mtime tells them apart, as if built apart
+	os.utime(whl_path, (time.time(), time.time() - 60 + version))
+
+
+def _sha256(path: str) -> str:
+	with open(path, 'rb') as f:
+		return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_cached_framework_path(tmp_path):
+	'''Framework is unpacked, and compiled, once per wheel hash, and shared by apps with same wheel'''
+	whl_path = str(tmp_path / 'app_one' / 'framework-1.0.whl')
+	_make_wheel(whl_path)
+	framework_path = cached_framework_path(whl_path=whl_path)
+	assert framework_path == os.path.join(framework_cache_dir(), _sha256(whl_path))
+	cli_path = os.path.join(framework_path, 'nawah', 'cli.py')
+	with open(importlib.util.cache_from_source(cli_path), 'rb') as pyc_file:
+		# [DOC] Unchecked hash-based bytecode
+		assert int.from_bytes(pyc_file.read(8)[4:8], 'little') == 1
+
+	other_whl_path = str(tmp_path / 'app_two' / 'framework-1.0.whl')
+	os.makedirs(os.path.dirname(other_whl_path))
+	shutil.copyfile(whl_path, other_whl_path)
+	assert cached_framework_path(whl_path=other_whl_path) == framework_path
+	assert [
+		name for name in os.listdir(framework_cache_dir()) if os.path.isdir(os.path.join(framework_cache_dir(), name))
+	] == [os.path.basename(framework_path)]
+
+
+def test_cached_framework_path_changed(tmp_path):
+	'''Changed wheel is unpacked again, and frameworks not used for long are pruned'''
+	whl_path = str(tmp_path / 'app_one' / 'framework-1.0.whl')
+	_make_wheel(whl_path)
+	old_framework_path = cached_framework_path(whl_path=whl_path)
+
+	os.utime(old_framework_path, (0, 0))
+	_make_wheel(whl_path, version=2)
+	framework_path = cached_framework_path(whl_path=whl_path)
+	assert framework_path == os.path.join(framework_cache_dir(), _sha256(whl_path))
+	assert framework_path != old_framework_path
+	with open(os.path.join(framework_path, 'nawah', '__init__.py'), 'r') as f:
+		assert f.read() == 'version = 2\n'
+	assert not os.path.exists(old_framework_path)
+
+	# [DOC] Frameworks used recently are kept
+	_make_wheel(whl_path)
+	assert cached_framework_path(whl_path=whl_path) == old_framework_path
+	assert os.path.exists(framework_path)
+	assert time.time() - os.stat(framework_path).st_mtime < FRAMEWORK_MAX_AGE
+
+
+def test_wheel_hash(tmp_path, monkeypatch):
+	'''Wheels are only hashed again once they change'''
+	whl_path = str(tmp_path / 'framework-1.0.whl')
+	_make_wheel(whl_path)
+	whl_hash = _sha256(whl_path)
+	hashed = []
+	sha256 = hashlib.sha256
+	monkeypatch.setattr(hashlib, 'sha256', lambda *args: hashed.append(True) or sha256(*args))
+
+	assert wheel_hash(whl_path=whl_path) == whl_hash
+	assert wheel_hash(whl_path=whl_path) == whl_hash
+	assert len(hashed) == 1
+
+	_make_wheel(whl_path, version=2)
+	assert wheel_hash(whl_path=whl_path) != whl_hash
+	assert len(hashed) == 2
+
+
+def test_unpack_framework_failed(tmp_path):
+	'''Wheels that fail to unpack leave no temp dir behind'''
+	whl_path = str(tmp_path / 'framework-1.0.whl')
+	_make_wheel(whl_path)
+	# [DOC] Corrupt content of last file, for wheel to fail once unpacking it started
+	with open(whl_path, 'r+b') as whl_file:
+		content = whl_file.read()
+		whl_file.seek(content.index(b'def nawah_cli'))
+		whl_file.write(b'DEF')
+	framework_path = str(tmp_path / 'framework')
+	with pytest.raises(zipfile.BadZipFile):
+		unpack_framework(whl_path=whl_path, framework_path=framework_path)
+	assert os.listdir(str(tmp_path)) == ['framework-1.0.whl']
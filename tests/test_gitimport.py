@@ -0,0 +1,75 @@
+import os, subprocess
+
+import pytest
+
+from nawah_cli.gitimport import cached_pack, import_commit
+
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch):
+	for env_var in ['GIT_AUTHOR_NAME', 'GIT_COMMITTER_NAME']:
+		monkeypatch.setenv(env_var, 'Nawah')
+	for env_var in ['GIT_AUTHOR_EMAIL', 'GIT_COMMITTER_EMAIL']:
+		monkeypatch.setenv(env_var, 'nawah@localhost')
+
+
+def _git(*args: str, cwd: str) -> str:
+	return subprocess.check_output(['git', *args], cwd=cwd).decode('utf-8').strip()
+
+
+def _make_app(app_path: str):
+	for rel_path, content in {
+		'nawah_app.py': 'config = None\n',
+		'.gitignore': '__pycache__/\n',
+		'__pycache__/nawah_app.pyc': 'ignored',
+		'nawah/stub.pyi': 'def f() -> int: ...\n',
+		'progress.json': '{}',
+		'"quoted" name.py': '',
+	}.items():
+		os.makedirs(os.path.dirname(os.path.join(app_path, rel_path)), exist_ok=True)
+		with open(os.path.join(app_path, rel_path), 'w') as f:
+			f.write(content)
+	os.symlink('nawah_app.py', os.path.join(app_path, 'link.py'))
+	_git('init', '--quiet', cwd=app_path)
+
+
+def _add_tree(app_path: str) -> str:
+	'''Returns tree of files of app, as 'git add .' writes it'''
+	_git('add', '.', cwd=app_path)
+	tree = _git('write-tree', cwd=app_path)
+	_git('read-tree', '--empty', cwd=app_path)
+	return tree
+
+
+def test_import_commit(tmp_path):
+	app_path = str(tmp_path / 'app')
+	_make_app(app_path)
+	os.remove(os.path.join(app_path, 'progress.json'))
+	tree = _add_tree(app_path)
+
+	stats = import_commit(app_path=app_path, message='Create app')
+	assert stats['files'] == 5
+	assert _git('rev-parse', 'HEAD^{tree}', cwd=app_path) == tree
+	assert _git('status', '--porcelain', cwd=app_path) == ''
+
+
+def test_import_commit_pack(tmp_path):
+	app_path = str(tmp_path / 'app')
+	_make_app(app_path)
+	pack = cached_pack(key='key', app_path=app_path, rel_paths=['nawah/stub.pyi'])
+	assert list(pack.keys()) == ['nawah/stub.pyi']
+
+	stats = import_commit(app_path=app_path, message='Create app', pack=pack, exclude=['progress.json'])
+	# [DOC] Files in pack are not streamed
+	assert stats['bytes'] == sum(
+		os.path.getsize(os.path.join(app_path, rel_path))
+		for rel_path in ['nawah_app.py', '.gitignore', '"quoted" name.py']
+	)
+	assert _git('rev-parse', 'HEAD:nawah/stub.pyi', cwd=app_path) == pack['nawah/stub.pyi']
+	assert 'progress.json' not in _git('ls-tree', '-r', '--name-only', 'HEAD', cwd=app_path)
+
+	# [DOC] Packfile is linked into later apps, rather than built again
+	other_path = str(tmp_path / 'other')
+	_make_app(other_path)
+	assert cached_pack(key='key', app_path=other_path, rel_paths=[]) == pack
+	assert _git('cat-file', '-t', pack['nawah/stub.pyi'], cwd=other_path) == 'blob'
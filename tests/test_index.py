@@ -0,0 +1,149 @@
+import os, json, asyncio
+
+import pytest
+
+import nawah_cli.index
+from nawah_cli.api import create_app
+from nawah_cli.artifacts import ARTIFACTS_PATHS
+from nawah_cli.cache import fetch_artifacts
+from nawah_cli.index import remote_index, resolve_api_level, artifact_hash
+from nawah_cli.mirror import MirrorRequestHandler
+
+from conftest import http_server, recording_handler
+
+INDEX = {
+	'api_levels': {
+		'1.0': {'artifacts': {'framework': {'path': '1.0/nawah.whl', 'hash': '1' * 64}}},
+		'1.1': {'artifacts': {'framework': {'path': '1.1/nawah.whl', 'hash': '2' * 64}}},
+	},
+	'latest': '1.1',
+}
+
+
+@pytest.fixture
+def index_server(tmp_path, monkeypatch):
+	'''Serves index of API Levels, yielding its path, and handler recording requests'''
+	path = str(tmp_path / 'index')
+	os.makedirs(path)
+	_write_index(path, INDEX)
+	handler = recording_handler(MirrorRequestHandler)
+	with http_server(path=path, handler=handler) as base_url:
+		monkeypatch.setenv('NAWAH_MIRROR_URL', base_url)
+		yield path, handler
+
+
+def _write_index(path: str, index: dict):
+	with open(os.path.join(path, 'index.json'), 'w') as index_file:
+		index_file.write(json.dumps(index))
+
+
+def _new_process(monkeypatch):
+	'''Drops index loaded by process, as new process would have'''
+	monkeypatch.setattr(nawah_cli.index, '_index', None)
+	monkeypatch.setattr(nawah_cli.index, '_index_loaded', False)
+
+
+def test_remote_index(index_server, monkeypatch):
+	_, handler = index_server
+	assert remote_index() == INDEX
+	assert remote_index() == INDEX
+	assert len(handler.requests) == 1
+
+	# [DOC] Index cached locally is used until TTL
+	_new_process(monkeypatch)
+	assert remote_index() == INDEX
+	assert len(handler.requests) == 1
+
+	assert remote_index(refresh=True) == INDEX
+	assert len(handler.requests) == 2
+
+
+def test_remote_index_revalidate(index_server, monkeypatch):
+	path, handler = index_server
+	remote_index()
+	assert 'If-None-Match' not in handler.requests[0].headers
+
+	monkeypatch.setenv('NAWAH_INDEX_TTL', '0')
+	_new_process(monkeypatch)
+	assert remote_index() == INDEX
+	assert handler.requests[1].headers['If-None-Match']
+	assert handler.requests[1].headers['If-Modified-Since']
+
+	new_index = {**INDEX, 'latest': '1.0'}
+	_write_index(path, new_index)
+	os.utime(os.path.join(path, 'index.json'), (0, 0))
+	_new_process(monkeypatch)
+	assert remote_index() == new_index
+	assert len(handler.requests) == 3
+
+
+def test_remote_index_not_modified(index_server, monkeypatch):
+	'''Index not modified is kept, and its TTL is renewed'''
+	_, handler = index_server
+	remote_index()
+	cached_path = os.path.join(os.environ['NAWAH_CACHE_DIR'], 'remote_index.json')
+	with open(cached_path, 'r') as cached_file:
+		cached = json.loads(cached_file.read())
+
+	monkeypatch.setenv('NAWAH_INDEX_TTL', '0')
+	_new_process(monkeypatch)
+	assert remote_index() == INDEX
+	with open(cached_path, 'r') as cached_file:
+		revalidated = json.loads(cached_file.read())
+	assert revalidated['etag'] == cached['etag']
+	assert revalidated['fetched'] > cached['fetched']
+
+
+def test_remote_index_missing(tmp_path, monkeypatch):
+	'''Sources with no index are cached as having none'''
+	path = str(tmp_path / 'index')
+	os.makedirs(path)
+	handler = recording_handler(MirrorRequestHandler)
+	with http_server(path=path, handler=handler) as base_url:
+		monkeypatch.setenv('NAWAH_MIRROR_URL', base_url)
+		assert remote_index() is None
+		_new_process(monkeypatch)
+		assert remote_index() is None
+	assert len(handler.requests) == 1
+	assert resolve_api_level('1.0') == '1.0'
+	with pytest.raises(ValueError):
+		resolve_api_level('latest')
+
+
+def test_remote_index_unreachable(index_server, monkeypatch):
+	'''Index cached locally is used, stale, if sources can't be reached'''
+	remote_index()
+	monkeypatch.setenv('NAWAH_INDEX_TTL', '0')
+	monkeypatch.setenv('NAWAH_MIRROR_URL', 'http://127.0.0.1:1')
+	_new_process(monkeypatch)
+	assert remote_index() == INDEX
+
+
+def test_resolve_api_level(index_server):
+	assert resolve_api_level('latest') == '1.1'
+	assert resolve_api_level('1.0') == '1.0'
+	with pytest.raises(ValueError):
+		resolve_api_level('2.0')
+	assert artifact_hash(api_level='1.0', artifact='framework') == '1' * 64
+	assert artifact_hash(api_level='1.0', artifact='stubs') is None
+
+
+def test_resolve_api_level_cached(artifacts_server, tmp_path, monkeypatch):
+	'''Apps of API Level with all artifacts cached are created with no request, even once index is older than TTL'''
+	path = str(tmp_path / 'artifacts')
+	_write_index(path, {'api_levels': {'1.0': {}, '1.1': {}}})
+	handler = recording_handler(MirrorRequestHandler)
+	with http_server(path=path, handler=handler) as base_url:
+		monkeypatch.setenv('NAWAH_MIRROR_URL', base_url)
+		fetch_artifacts(api_level='1.0', artifacts=list(ARTIFACTS_PATHS.keys()))
+		requests_count = len(handler.requests)
+
+		monkeypatch.setenv('NAWAH_INDEX_TTL', '0')
+		_new_process(monkeypatch)
+		asyncio.run(create_app(app_name='app_one', app_path=str(tmp_path / 'apps')))
+		assert len(handler.requests) == requests_count
+
+		# [DOC] API Levels not cached revalidate index
+		_new_process(monkeypatch)
+		assert resolve_api_level('1.1') == '1.1'
+		assert [request.path for request in handler.requests[requests_count:]] == ['/index.json']
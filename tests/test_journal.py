@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from nawah_cli.cache import cache_get, hash_file, stream_artifact, download_manager
+from nawah_cli.journal import ProgressJournal
+from nawah_cli.mirror import MirrorRequestHandler
+
+from conftest import http_server, make_artifacts, recording_handler
+
+
+def _content(path: str) -> bytes:
+	with open(path, 'rb') as f:
+		return f.read()
+
+
+@pytest.fixture
+def mirror_server(tmp_path, monkeypatch):
+	'''Serves synthetic artifacts with byte ranges, yielding path of them, and handler recording requests'''
+	path = str(tmp_path / 'artifacts')
+	make_artifacts(path=path)
+	handler = recording_handler(MirrorRequestHandler)
+	with http_server(path=path, handler=handler) as base_url:
+		monkeypatch.setenv('NAWAH_MIRROR_URL', base_url)
+		yield path, handler
+
+
+def _journal(tmp_path, *, wheel_path: str, size: int, **attrs) -> ProgressJournal:
+	'''Returns journal of download of framework interrupted after size bytes'''
+	partial_path = str(tmp_path / 'partial')
+	with open(wheel_path, 'rb') as wheel_file, open(partial_path, 'wb') as partial_file:
+		partial_file.write(wheel_file.read(size))
+	journal = ProgressJournal(path=str(tmp_path / 'progress.json'), args={}, app_config={}, steps=[])
+	journal.update_artifact(
+		'framework',
+		url=f'{os.environ["NAWAH_MIRROR_URL"]}/1.0/nawah.whl',
+		partial=partial_path,
+		bytes=size,
+		complete=False,
+		**attrs,
+	)
+	return journal
+
+
+def _wheel_requests(handler) -> list:
+	# [DOC] Index of API Levels is requested first, to check hashes of artifacts
+	return [request for request in handler.requests if request.path == '/1.0/nawah.whl']
+
+
+def _stream(journal: ProgressJournal) -> bytes:
+	with download_manager() as manager:
+		return stream_artifact(
+			api_level='1.0',
+			artifact='framework',
+			consume=lambda f: f.read(),
+			manager=manager,
+			journal=journal,
+		)
+
+
+def test_stream_artifact_resume(tmp_path, mirror_server, caplog):
+	path, handler = mirror_server
+	wheel_path = os.path.join(path, '1.0', 'nawah.whl')
+	with download_manager() as manager, manager.open(
+		f'{os.environ["NAWAH_MIRROR_URL"]}/1.0/nawah.whl'
+	) as response:
+		etag = response.headers['ETag']
+		response.read()
+	handler.requests.clear()
+
+	journal = _journal(tmp_path, wheel_path=wheel_path, size=1000, etag=etag)
+	with caplog.at_level('INFO', logger='nawah'):
+		assert _stream(journal) == _content(wheel_path)
+	assert 'continue \'framework\' artifact download from byte 1000' in caplog.text
+	assert _wheel_requests(handler)[0].headers['Range'] == 'bytes=1000-'
+	assert _wheel_requests(handler)[0].headers['If-Range'] == etag
+	assert journal.artifact('framework')['consumed']
+	assert journal.artifact('framework')['hash'] == hash_file(wheel_path)
+	assert cache_get(api_level='1.0', artifact='framework')
+
+	# [DOC] Consumed artifacts are skipped
+	handler.requests.clear()
+	assert _stream(journal) is None
+	assert _wheel_requests(handler) == []
+
+
+def test_stream_artifact_resume_changed(tmp_path, mirror_server, caplog):
+	'''Downloads of artifacts that changed since they started are started again'''
+	path, handler = mirror_server
+	wheel_path = os.path.join(path, '1.0', 'nawah.whl')
+	journal = _journal(tmp_path, wheel_path=wheel_path, size=1000, etag='"changed"')
+	with open(str(tmp_path / 'partial'), 'r+b') as partial_file:
+		partial_file.write(b'\0' * 1000)
+
+	with caplog.at_level('INFO', logger='nawah'):
+		assert _stream(journal) == _content(wheel_path)
+	assert 'Remote \'framework\' artifact changed' in caplog.text
+	assert _wheel_requests(handler)[0].headers['If-Range'] == '"changed"'
+	assert journal.artifact('framework')['hash'] == hash_file(wheel_path)
+
+
+def test_stream_artifact_resume_unsatisfiable(tmp_path, mirror_server):
+	'''Downloads that can't be continued, as remote artifact is smaller, are started again'''
+	path, handler = mirror_server
+	wheel_path = os.path.join(path, '1.0', 'nawah.whl')
+	journal = _journal(tmp_path, wheel_path=wheel_path, size=os.path.getsize(wheel_path))
+	with open(str(tmp_path / 'partial'), 'ab') as partial_file:
+		partial_file.write(b'\0' * 1000)
+	journal.update_artifact('framework', bytes=os.path.getsize(wheel_path) + 1000)
+
+	assert _stream(journal) == _content(wheel_path)
+	assert [request.headers.get('Range') for request in _wheel_requests(handler)] == [
+		f'bytes={os.path.getsize(wheel_path) + 1000}-',
+		None,
+	]
+	assert journal.artifact('framework')['hash'] == hash_file(wheel_path)
@@ -0,0 +1,120 @@
+import os, json, http.client, urllib.parse
+
+import pytest
+
+from nawah_cli.cache import hash_file
+from nawah_cli.mirror import MirrorRequestHandler, mirror_sync, MIRROR_INDEX
+
+from conftest import http_server
+
+
+@pytest.fixture
+def mirror_connection(tmp_path):
+	'''Yields keep-alive connection to mirror serving file of 100 KiB, with path of mirror'''
+	path = str(tmp_path / 'mirror')
+	os.makedirs(path)
+	with open(os.path.join(path, 'file.bin'), 'wb') as f:
+		f.write(os.urandom(100 * 1024))
+	with http_server(path=path, handler=MirrorRequestHandler) as base_url:
+		connection = http.client.HTTPConnection(urllib.parse.urlsplit(base_url).netloc, timeout=10)
+		yield connection, path
+		connection.close()
+
+
+def _get(connection: http.client.HTTPConnection, path: str, **headers: str):
+	connection.request('GET', path, headers=headers)
+	response = connection.getresponse()
+	return response, response.read()
+
+
+def _content(path: str) -> bytes:
+	with open(path, 'rb') as f:
+		return f.read()
+
+
+def test_mirror_serve(mirror_connection):
+	connection, path = mirror_connection
+	response, body = _get(connection, '/file.bin')
+	assert response.status == 200
+	assert body == _content(os.path.join(path, 'file.bin'))
+	assert response.headers['Accept-Ranges'] == 'bytes'
+	assert response.headers['ETag']
+	assert response.headers['Last-Modified']
+
+	response, body = _get(connection, '/missing.bin')
+	assert response.status == 404
+
+
+def test_mirror_serve_not_modified(mirror_connection):
+	connection, path = mirror_connection
+	response, _ = _get(connection, '/file.bin')
+	etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+
+	for headers in [
+		{'If-None-Match': etag},
+		{'If-None-Match': f'"other", {etag}'},
+		{'If-Modified-Since': last_modified},
+	]:
+		response, body = _get(connection, '/file.bin', **headers)
+		assert response.status == 304
+		assert response.headers['ETag'] == etag
+		assert body == b''
+
+	# [DOC] Connection is kept alive after responses with no body
+	response, body = _get(connection, '/file.bin', **{'If-None-Match': '"other"'})
+	assert response.status == 200
+	assert len(body) == 100 * 1024
+
+	os.utime(os.path.join(path, 'file.bin'), (0, 0))
+	response, _ = _get(connection, '/file.bin', **{'If-None-Match': etag})
+	assert response.status == 200
+	assert response.headers['ETag'] != etag
+
+
+def test_mirror_serve_range(mirror_connection):
+	connection, path = mirror_connection
+	content = _content(os.path.join(path, 'file.bin'))
+	etag = _get(connection, '/file.bin')[0].headers['ETag']
+
+	for byte_range, first, last in [
+		('bytes=1000-1999', 1000, 1999),
+		('bytes=1000-', 1000, len(content) - 1),
+		('bytes=-500', len(content) - 500, len(content) - 1),
+		('bytes=1000-999999999', 1000, len(content) - 1),
+	]:
+		response, body = _get(connection, '/file.bin', Range=byte_range)
+		assert response.status == 206
+		assert response.headers['Content-Range'] == f'bytes {first}-{last}/{len(content)}'
+		assert body == content[first : last + 1]
+
+	response, body = _get(connection, '/file.bin', Range='bytes=1000-', **{'If-Range': etag})
+	assert response.status == 206
+	assert body == content[1000:]
+
+	# [DOC] Range is ignored if file changed since If-Range ETag, or if many ranges are requested
+	for headers in [
+		{'Range': 'bytes=1000-', 'If-Range': '"other"'},
+		{'Range': 'bytes=0-9,20-29'},
+	]:
+		response, body = _get(connection, '/file.bin', **headers)
+		assert response.status == 200
+		assert body == content
+
+	response, body = _get(connection, '/file.bin', Range=f'bytes={len(content)}-')
+	assert response.status == 416
+	assert response.headers['Content-Range'] == f'bytes */{len(content)}'
+	assert body == b''
+
+
+def test_mirror_sync(artifacts_server, tmp_path):
+	path = str(tmp_path / 'mirror')
+	index = mirror_sync(path=path, api_levels=['1.0'])
+	assert index['latest'] == '1.0'
+	artifacts = index['api_levels']['1.0']['artifacts']
+	assert sorted(artifacts.keys()) == ['framework', 'requirements', 'stubs', 'template']
+	for artifact in artifacts.values():
+		mirror_path = os.path.join(path, artifact['path'])
+		assert artifact['hash'] == hash_file(mirror_path)
+		assert _content(mirror_path) == _content(os.path.join(str(tmp_path / 'artifacts'), artifact['path']))
+	with open(os.path.join(path, MIRROR_INDEX), 'r') as index_file:
+		assert json.loads(index_file.read()) == index
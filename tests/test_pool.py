@@ -0,0 +1,116 @@
+import os, json, asyncio, logging
+
+import pytest
+
+import nawah_cli.create
+from nawah_cli.api import create_app
+from nawah_cli.pool import SKELETON_NAME, SKELETON_STEPS, fill_pool, pool_skeletons
+
+from conftest import make_artifacts
+
+
+@pytest.fixture
+def refills(monkeypatch) -> list:
+	'''Records API Levels of pools refilled, instead of filling them in background processes'''
+	refilled = []
+	monkeypatch.setattr(nawah_cli.create, 'refill_pool', lambda *, api_level: refilled.append(api_level))
+	return refilled
+
+
+def _create(tmp_path, *, app_name: str, api_level: str = '1.0') -> dict:
+	return asyncio.run(create_app(app_name=app_name, app_path=str(tmp_path / 'apps'), api_level=api_level))
+
+
+def test_fill_pool(artifacts_server):
+	'''Pool is filled with skeletons up to its size, with template not rendered, and artifacts written'''
+	assert fill_pool(api_level='1.0', size=2) == 2
+	assert fill_pool(api_level='1.0', size=2) == 0
+	skeletons = pool_skeletons('1.0')
+	assert len(skeletons) == 2
+	for skeleton_path in skeletons:
+		assert os.path.exists(os.path.join(skeleton_path, 'framework-1.0.whl'))
+		assert os.path.exists(os.path.join(skeleton_path, 'nawah', 's0.pyi'))
+		assert os.path.exists(os.path.join(skeleton_path, '.git'))
+		assert os.path.exists(os.path.join(skeleton_path, 'packages', 'PROJECT_NAME', '__init__.py'))
+		with open(os.path.join(skeleton_path, SKELETON_NAME), 'r') as skeleton_file:
+			skeleton = json.loads(skeleton_file.read())
+		assert sorted(skeleton['hashes'].keys()) == ['framework', 'requirements', 'stubs', 'template']
+		assert 'packages/PROJECT_NAME/__init__.py' in skeleton['files']
+
+
+def test_claim_skeleton(artifacts_server, tmp_path, refills, caplog):
+	'''Apps are created from skeletons of pool, rendered for them, with pool refilled'''
+	fill_pool(api_level='1.0', size=1)
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		result = _create(tmp_path, app_name='app_one')
+	assert 'Claimed pre-built app skeleton from warm pool.' in caplog.text
+	assert pool_skeletons('1.0') == []
+	assert refills == ['1.0']
+	assert set(SKELETON_STEPS) <= set(result['steps'])
+	assert 'render skeleton' in result['steps']
+	app_path = result['app_path']
+	assert os.listdir(os.path.join(app_path, 'packages')) == ['app_one']
+	with open(os.path.join(app_path, 'nawah_app.py'), 'r') as f:
+		assert result['config']['admin_password'] in f.read()
+	assert not os.path.exists(os.path.join(app_path, SKELETON_NAME))
+	assert not os.path.exists(os.path.join(app_path, 'progress.json'))
+
+
+def test_claim_skeleton_interrupted(artifacts_server, tmp_path, monkeypatch, refills):
+	'''Progress is saved once skeleton is claimed, so app interrupted right after is created again from it'''
+	fill_pool(api_level='1.0', size=1)
+
+	interrupted = []
+	run_steps = nawah_cli.create.run_steps
+
+	def interrupt_steps(**kwargs):
+		if not interrupted:
+			interrupted.append(True)
+			raise KeyboardInterrupt
+		return run_steps(**kwargs)
+
+	monkeypatch.setattr(nawah_cli.create, 'run_steps', interrupt_steps)
+	with pytest.raises(KeyboardInterrupt):
+		_create(tmp_path, app_name='app_one')
+	app_path = str(tmp_path / 'apps' / 'app_one')
+	with open(os.path.join(app_path, 'progress.json'), 'r') as progress_file:
+		progress = json.loads(progress_file.read())
+	assert progress['steps'] == SKELETON_STEPS
+	assert sorted(progress['artifacts'].keys()) == ['framework', 'requirements', 'stubs', 'template']
+
+	result = _create(tmp_path, app_name='app_one')
+	assert os.listdir(os.path.join(result['app_path'], 'packages')) == ['app_one']
+	assert not os.path.exists(os.path.join(app_path, SKELETON_NAME))
+
+
+def test_claim_skeleton_exhausted(artifacts_server, tmp_path, refills, caplog):
+	'''Apps are created from artifacts once pool has no skeletons left'''
+	fill_pool(api_level='1.0', size=1)
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		results = [_create(tmp_path, app_name=app_name) for app_name in ['app_one', 'app_two']]
+	assert caplog.text.count('Claimed pre-built app skeleton from warm pool.') == 1
+	assert 'render skeleton' in results[0]['steps']
+	assert 'render skeleton' not in results[1]['steps']
+	for result in results:
+		assert os.listdir(os.path.join(result['app_path'], 'packages')) == [result['app_name']]
+		with open(os.path.join(result['app_path'], 'framework-1.0.whl'), 'rb') as app_file:
+			with open(str(tmp_path / 'artifacts' / '1.0' / 'nawah.whl'), 'rb') as artifact_file:
+				assert app_file.read() == artifact_file.read()
+
+
+def test_claim_skeleton_api_level(artifacts_server, tmp_path, refills, caplog):
+	'''Skeletons are only claimed by apps of API Level of their pool'''
+	make_artifacts(path=str(tmp_path / 'artifacts'), api_level='1.1')
+	fill_pool(api_level='1.1', size=1)
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		result = _create(tmp_path, app_name='app_one')
+	assert 'Claimed pre-built app skeleton from warm pool.' not in caplog.text
+	assert len(pool_skeletons('1.1')) == 1
+	assert refills == []
+	assert os.path.exists(os.path.join(result['app_path'], 'framework-1.0.whl'))
+	assert not os.path.exists(os.path.join(result['app_path'], 'framework-1.1.whl'))
+
+	result = _create(tmp_path, app_name='app_two', api_level='1.1')
+	assert 'render skeleton' in result['steps']
+	assert pool_skeletons('1.1') == []
+	assert refills == ['1.1']
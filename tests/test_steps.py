@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from nawah_cli.steps import Step, StepError, run_steps
+
+
+def _steps(ran: list, *, failing: str = None, events: dict = None):
+	'''Returns steps of create: config, and template first, then framework, and stubs concurrently, then finish'''
+
+	def func(name: str):
+		def run():
+			if events and name in events:
+				# [DOC] Wait for concurrent step to start, which deadlocks if steps ran one by one
+				events[name].set()
+				assert events['stubs' if name == 'framework' else 'framework'].wait(timeout=5)
+			if name == failing:
+				raise ValueError(f'{name} failed')
+			ran.append(name)
+
+		return run
+
+	return [
+		Step(name='finish', func=func('finish'), requires=['framework', 'stubs']),
+		Step(name='stubs', func=func('stubs'), requires=['config']),
+		Step(name='framework', func=func('framework'), requires=['config'], provides=['wheel']),
+		Step(name='template', func=func('template'), requires=['config']),
+		Step(name='config', func=func('config')),
+	]
+
+
+def test_run_steps():
+	'''Steps run once their requires are provided, with independent steps running concurrently'''
+	ran = []
+	completed = []
+	events = {'framework': threading.Event(), 'stubs': threading.Event()}
+	run_order = run_steps(steps=_steps(ran, events=events), on_complete=lambda step: completed.append(step.name))
+	assert run_order == completed
+	assert sorted(run_order) == sorted(ran)
+	assert run_order[0] == 'config'
+	assert run_order.index('finish') > max(run_order.index('framework'), run_order.index('stubs'))
+	assert sorted(run_order) == ['config', 'finish', 'framework', 'stubs', 'template']
+
+
+def test_run_steps_provides():
+	'''Steps can require outputs provided by other steps, besides their names'''
+	ran = []
+	steps = _steps(ran)
+	steps.append(Step(name='compile', func=lambda: ran.append('compile'), requires=['wheel']))
+	run_order = run_steps(steps=steps, max_workers=1)
+	assert run_order.index('compile') > run_order.index('framework')
+
+
+def test_run_steps_failed():
+	'''Failing step raises StepError once running steps finish, with steps requiring it not run'''
+	ran = []
+	completed = []
+	with pytest.raises(StepError) as exc_info:
+		run_steps(
+			steps=_steps(ran, failing='stubs'),
+			on_complete=lambda step: completed.append(step.name),
+			max_workers=1,
+		)
+	assert exc_info.value.step.name == 'stubs'
+	assert isinstance(exc_info.value.error, ValueError)
+	assert str(exc_info.value) == 'Step \'stubs\' failed: stubs failed'
+	assert 'finish' not in ran
+	assert 'stubs' not in completed
+	assert sorted(ran) == sorted(completed) == ['config', 'framework', 'template']
+
+
+def test_run_steps_completed():
+	'''Steps completed earlier are skipped, and provide their outputs to steps requiring them'''
+	ran = []
+	steps = _steps(ran)
+	steps.append(Step(name='compile', func=lambda: ran.append('compile'), requires=['wheel']))
+	run_order = run_steps(steps=steps, completed=['config', 'framework', 'template'])
+	assert sorted(run_order) == ['compile', 'finish', 'stubs']
+	assert sorted(run_order) == sorted(ran)
+	assert run_steps(steps=steps, completed=[step.name for step in steps]) == []
+
+
+def test_run_steps_invalid():
+	'''Steps requiring outputs no step provides, or depending on each other, are never run'''
+	ran = []
+	with pytest.raises(ValueError, match='requires missing'):
+		run_steps(steps=[Step(name='config', func=lambda: ran.append('config'), requires=['missing'])])
+	with pytest.raises(ValueError, match='depend on each other'):
+		run_steps(
+			steps=[
+				Step(name='config', func=lambda: ran.append('config'), requires=['template']),
+				Step(name='template', func=lambda: ran.append('template'), requires=['config']),
+			]
+		)
+	assert ran == []
@@ -0,0 +1,99 @@
+import os, io, stat, shutil, tarfile
+
+import pytest
+
+from nawah_cli.store import (
+	link_file,
+	link_tree,
+	linked_method,
+	prune_store,
+	store_file,
+	store_tree,
+)
+
+
+@pytest.fixture
+def file_path(tmp_path) -> str:
+	path = str(tmp_path / 'framework-1.0.whl')
+	with open(path, 'wb') as f:
+		f.write(b'wheel')
+	return path
+
+
+@pytest.fixture
+def archive_path(tmp_path) -> str:
+	path = str(tmp_path / 'stubs.tar.gz')
+	with tarfile.open(path, 'w:gz') as archive:
+		for name in ['./s0.pyi', './sub/s1.pyi']:
+			file_info = tarfile.TarInfo(name)
+			file_info.size = 4
+			archive.addfile(file_info, io.BytesIO(b'stub'))
+	return path
+
+
+def _links(store_path: str) -> list:
+	with open(f'{store_path}.links', 'r') as links_file:
+		return links_file.read().splitlines()
+
+
+def test_link_file(tmp_path, file_path):
+	'''Files in store are read-only, and symlinks to them are recorded, while hardlinks are detected by inode'''
+	store_path = store_file(path=file_path, object_hash='a' * 64)
+	assert not os.stat(store_path).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+	assert store_file(path=file_path, object_hash='a' * 64) == store_path
+
+	for app_name, method in [('app_one', 'symlink'), ('app_two', 'symlink'), ('app_three', 'hardlink')]:
+		os.makedirs(str(tmp_path / app_name))
+		assert link_file(store_path=store_path, path=str(tmp_path / app_name / 'framework-1.0.whl'), method=method)
+	assert _links(store_path) == [
+		os.path.join(os.path.realpath(str(tmp_path / app_name)), 'framework-1.0.whl')
+		for app_name in ['app_one', 'app_two']
+	]
+	assert linked_method(path=str(tmp_path / 'app_one' / 'framework-1.0.whl')) == 'symlink'
+	assert linked_method(path=str(tmp_path / 'app_three' / 'framework-1.0.whl'), object_hash='a' * 64) == 'hardlink'
+	assert linked_method(path=file_path, object_hash='a' * 64) is None
+
+
+def test_prune_store(tmp_path, file_path, archive_path):
+	'''Entries are pruned once no recorded symlink, or hardlink links to them anymore'''
+	symlinked_path = store_file(path=file_path, object_hash='a' * 64)
+	hardlinked_path = store_file(path=file_path, object_hash='b' * 64)
+	tree_path = store_tree(archive_path=archive_path, object_hash='c' * 64, root_path='.')
+	unused_path = store_file(path=file_path, object_hash='d' * 64)
+	app_path = str(tmp_path / 'app_one')
+	os.makedirs(app_path)
+	link_file(store_path=symlinked_path, path=os.path.join(app_path, 'framework-1.0.whl'), method='symlink')
+	link_file(store_path=hardlinked_path, path=os.path.join(app_path, 'framework-1.1.whl'), method='hardlink')
+	link_tree(store_path=tree_path, path=os.path.join(app_path, 'nawah'), method='hardlink')
+
+	assert prune_store() == [{'kind': 'files', 'hash': 'd' * 64}]
+	assert not os.path.exists(unused_path)
+	assert all(os.path.exists(path) for path in [symlinked_path, hardlinked_path, tree_path])
+
+	# [DOC] Symlinks recorded, but replaced by files, no longer link to store
+	os.remove(os.path.join(app_path, 'framework-1.0.whl'))
+	shutil.copyfile(file_path, os.path.join(app_path, 'framework-1.0.whl'))
+	# [DOC] Trees are in use while any of their files is hardlinked
+	os.remove(os.path.join(app_path, 'nawah', 's0.pyi'))
+	assert prune_store() == [{'kind': 'files', 'hash': 'a' * 64}]
+	assert not os.path.exists(f'{symlinked_path}.links')
+
+	shutil.rmtree(app_path)
+	assert sorted(entry['hash'] for entry in prune_store()) == ['b' * 64, 'c' * 64]
+	assert not os.path.exists(tree_path)
+
+
+def test_prune_store_symlinked_tree(tmp_path, archive_path):
+	'''Trees symlinked by many apps are kept until last of them is unlinked'''
+	tree_path = store_tree(archive_path=archive_path, object_hash='c' * 64, root_path='.')
+	for app_name in ['app_one', 'app_two']:
+		os.makedirs(str(tmp_path / app_name))
+		link_tree(store_path=tree_path, path=str(tmp_path / app_name / 'nawah'), method='symlink')
+	assert len(_links(tree_path)) == 2
+
+	os.remove(str(tmp_path / 'app_one' / 'nawah'))
+	assert prune_store() == []
+	shutil.rmtree(str(tmp_path / 'app_two'))
+	assert prune_store() == [{'kind': 'trees', 'hash': 'c' * 64}]
+	assert not os.path.exists(tree_path)
+	assert not os.path.exists(f'{tree_path}.links')
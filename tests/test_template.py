@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from nawah_cli.template import TemplateRenderer, materialise_template
+
+VARIABLES = {
+	'__PROJECT_NAME__': 'app0',
+	'PROJECT_NAME': 'app0',
+	'__DATA_NAME__': 'app0_data',
+	'__ADMIN_DOC_EMAIL__': 'admin@app0.localhost',
+}
+
+
+def test_default_manifest_nawah_app():
+	'''Default rules substitute '__PROJECT_NAME__' twice, and every placeholder of app config once, as 'create' always did'''
+	renderer = TemplateRenderer(variables=VARIABLES)
+	content = (
+		'# PROJECT_NAME comment\n'
+		'name=\'__PROJECT_NAME__\', packages=\'__PROJECT_NAME__\', other=\'__PROJECT_NAME__\'\n'
+		'data_name=\'__DATA_NAME__\', again=\'__DATA_NAME__\', email=\'__ADMIN_DOC_EMAIL__\'\n'
+	)
+	assert renderer.render(content=content, rules=renderer.file_rules('nawah_app.py')) == (
+		'# PROJECT_NAME comment\n'
+		'name=\'app0\', packages=\'app0\', other=\'__PROJECT_NAME__\'\n'
+		'data_name=\'app0_data\', again=\'__DATA_NAME__\', email=\'admin@app0.localhost\'\n'
+	)
+
+
+def test_default_manifest_gitignore():
+	renderer = TemplateRenderer(variables=VARIABLES)
+	assert (
+		renderer.render(
+			content='PROJECT_NAME.log\nPROJECT_NAME.bak\n', rules=renderer.file_rules('.gitignore')
+		)
+		== 'app0.log\nPROJECT_NAME.bak\n'
+	)
+	assert renderer.file_rules('packages/PROJECT_NAME/__init__.py') is None
+	assert renderer.render_path('packages/PROJECT_NAME/__init__.py') == 'packages/app0/__init__.py'
+
+
+def test_manifest_rules():
+	renderer = TemplateRenderer(variables=VARIABLES)
+	renderer.load_manifest({'render': {'docs/*.md': ['__PROJECT_NAME__', '__DATA_NAME__']}})
+	assert (
+		renderer.render(
+			content='__PROJECT_NAME__ __PROJECT_NAME__ __DATA_NAME__',
+			rules=renderer.file_rules('docs/index.md'),
+		)
+		== 'app0 app0 app0_data'
+	)
+
+
+def _make_template(template_path: str):
+	os.makedirs(os.path.join(template_path, 'packages', 'PROJECT_NAME'))
+	for rel_path, content in {
+		'nawah_app.py': 'name=\'__PROJECT_NAME__\', data_name=\'__DATA_NAME__\'\n',
+		'.gitignore': 'PROJECT_NAME.log\n',
+		'packages/PROJECT_NAME/__init__.py': '# package\n',
+		'README.md': '# App\n',
+	}.items():
+		with open(os.path.join(template_path, rel_path), 'w') as f:
+			f.write(content)
+
+
+@pytest.mark.parametrize('method', ['hardlink', 'copy'])
+def test_materialise_template_resume(tmp_path, method):
+	'''Materialising template again, as create resumed after being interrupted, replaces files already written, and never writes through hardlinks into template'''
+	template_path, app_path = str(tmp_path / 'template'), str(tmp_path / 'app')
+	_make_template(template_path)
+	for _ in range(2):
+		results = materialise_template(
+			template_path=template_path,
+			app_path=app_path,
+			renderer=TemplateRenderer(variables=VARIABLES),
+			method=method,
+		)
+		assert results['method'] == method
+
+	with open(os.path.join(template_path, 'nawah_app.py'), 'r') as f:
+		assert f.read() == 'name=\'__PROJECT_NAME__\', data_name=\'__DATA_NAME__\'\n'
+	with open(os.path.join(app_path, 'nawah_app.py'), 'r') as f:
+		assert f.read() == 'name=\'app0\', data_name=\'app0_data\'\n'
+	assert os.path.exists(os.path.join(app_path, 'packages', 'app0', '__init__.py'))
+
+
+def test_materialise_template_hardlinked_render(tmp_path):
+	'''Files hardlinked into app by earlier run are rendered by replacing them'''
+	template_path, app_path = str(tmp_path / 'template'), str(tmp_path / 'app')
+	_make_template(template_path)
+	os.makedirs(app_path)
+	os.link(os.path.join(template_path, 'nawah_app.py'), os.path.join(app_path, 'nawah_app.py'))
+	materialise_template(
+		template_path=template_path,
+		app_path=app_path,
+		renderer=TemplateRenderer(variables=VARIABLES),
+		method='hardlink',
+	)
+	with open(os.path.join(template_path, 'nawah_app.py'), 'r') as f:
+		assert '__PROJECT_NAME__' in f.read()
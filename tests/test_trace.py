@@ -0,0 +1,109 @@
+import os, sys, json, logging, threading
+
+import pytest
+
+from nawah_cli.trace import span, tracing
+
+
+def test_span_not_tracing(tmp_path):
+	'''Spans outside of tracing are not recorded, and write nothing'''
+	with span('download framework', category='download') as download_span:
+		download_span.bytes = 100
+	with tracing():
+		with span('download framework', category='download'):
+			pass
+	assert os.listdir(str(tmp_path)) == []
+
+
+def test_tracing(tmp_path, caplog):
+	'''Spans of all threads are written as Chrome trace events, and as profile with totals of every category'''
+	trace_path = str(tmp_path / 'trace.json')
+	profile_path = str(tmp_path / 'profile.json')
+
+	def extract():
+		with span('extract stubs', category='extract') as extract_span:
+			extract_span.bytes = 2048
+			extract_span.files = 4
+
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		with tracing(trace_path=trace_path, profile_path=profile_path):
+			with span('download framework', category='download', url='http://localhost/nawah.whl') as download_span:
+				download_span.bytes = 1024
+			thread = threading.Thread(target=extract)
+			thread.start()
+			thread.join()
+			with span('extract template', category='extract') as extract_span:
+				extract_span.files = 2
+
+	with open(trace_path, 'r') as trace_file:
+		trace = json.loads(trace_file.read())
+	events = trace['traceEvents']
+	assert [event['name'] for event in events] == ['download framework', 'extract stubs', 'extract template']
+	assert [event['tid'] for event in events] == [0, 1, 0]
+	assert all(event['ph'] == 'X' and event['pid'] == os.getpid() for event in events)
+	assert events[0]['ts'] <= events[1]['ts'] <= events[2]['ts']
+	assert events[0]['args']['bytes'] == 1024
+	assert events[0]['args']['url'] == 'http://localhost/nawah.whl'
+	assert events[1]['args']['files'] == 4
+	assert 'bytes' not in events[2]['args']
+
+	with open(profile_path, 'r') as profile_file:
+		profile = json.loads(profile_file.read())
+	assert profile['categories']['download']['count'] == 1
+	assert profile['categories']['download']['bytes'] == 1024
+	assert profile['categories']['extract']['count'] == 2
+	assert profile['categories']['extract']['bytes'] == 2048
+	assert profile['categories']['extract']['files'] == 6
+	assert profile['categories']['extract']['duration'] == pytest.approx(
+		sum(span['duration'] for span in profile['spans'] if span['category'] == 'extract')
+	)
+	assert profile['duration'] >= sum(span['duration'] for span in profile['spans'])
+	assert [span['name'] for span in profile['spans']] == [event['name'] for event in events]
+	assert '- extract: 2 spans in' in caplog.text
+
+
+def test_tracing_failed(tmp_path):
+	'''Spans are written even if operations traced fail, with failing span recorded'''
+	profile_path = str(tmp_path / 'profile.json')
+	with pytest.raises(ValueError):
+		with tracing(profile_path=profile_path):
+			with span('render template', category='template'):
+				raise ValueError('Failed')
+	with open(profile_path, 'r') as profile_file:
+		profile = json.loads(profile_file.read())
+	assert [span['name'] for span in profile['spans']] == ['render template']
+
+
+def test_create_trace(artifacts_server, tmp_path, monkeypatch):
+	'''Creating app with 'trace', and 'profile' CLI Args writes spans of its steps, and downloads'''
+	from nawah_cli.cli import nawah_cli
+
+	trace_path = str(tmp_path / 'trace.json')
+	profile_path = str(tmp_path / 'profile.json')
+	monkeypatch.setattr(
+		sys,
+		'argv',
+		[
+			'nawah',
+			'create',
+			'app_one',
+			str(tmp_path / 'apps'),
+			'--default-config',
+			'--trace',
+			trace_path,
+			'--profile',
+			profile_path,
+		],
+	)
+	nawah_cli()
+
+	with open(trace_path, 'r') as trace_file:
+		trace = json.loads(trace_file.read())
+	with open(profile_path, 'r') as profile_file:
+		profile = json.loads(profile_file.read())
+	step_names = {event['name'] for event in trace['traceEvents'] if event['cat'] == 'step'}
+	assert {'config', 'template', 'framework'} <= step_names
+	assert profile['categories']['step']['count'] == len(
+		[event for event in trace['traceEvents'] if event['cat'] == 'step']
+	)
+	assert profile['categories']['download']['bytes'] > 0
@@ -0,0 +1,166 @@
+from typing import Dict
+
+import os, sys, asyncio, logging, zipfile, importlib.util
+
+import pytest
+
+from nawah_cli.api import create_app
+
+from conftest import make_artifacts
+
+
+def _template_files(api_level: str) -> Dict[str, bytes]:
+	return {
+		'nawah_app.py': b'from nawah.classes import APP_CONFIG\nconfig = APP_CONFIG(name=\'__PROJECT_NAME__\', admin_password=\'__ADMIN_PASSWORD__\')\n',
+		'.gitignore': b'__pycache__/\nPROJECT_NAME.log\n',
+		'packages/PROJECT_NAME/__init__.py': b'',
+		'packages/PROJECT_NAME/module_0.py': f'x = \'{api_level}\'\n'.encode('utf-8'),
+		'packages/PROJECT_NAME/module_1.py': f'y = \'{api_level}\'\n'.encode('utf-8'),
+		'packages/PROJECT_NAME/module_2.py': b'z = 2\n',
+	}
+
+
+@pytest.fixture
+def artifacts_path(artifacts_server, tmp_path) -> str:
+	'''Writes artifacts of API Level 1.1, with template, stubs, and framework changed from those of 1.0'''
+	path = str(tmp_path / 'artifacts')
+	make_artifacts(path=path, template_files=_template_files('1.0'))
+	template_files = _template_files('1.1')
+	del template_files['packages/PROJECT_NAME/module_2.py']
+	template_files['packages/PROJECT_NAME/module_3.py'] = b'w = 3\n'
+	make_artifacts(
+		path=path,
+		api_level='1.1',
+		template_files=template_files,
+		stubs_files={
+			's0.pyi': b'def f0() -> str: ...\n',
+			's1.pyi': b'def f1() -> int: ...\n',
+			'sub/s2.pyi': b'def f2() -> int: ...\n',
+		},
+	)
+	with zipfile.ZipFile(os.path.join(path, '1.1', 'nawah.whl'), 'a') as wheel:
+		wheel.writestr('nawah/m40.py', 'def f():\n\treturn 40\n')
+	return path
+
+
+def _create(tmp_path, *, app_name: str, **kwargs) -> str:
+	result = asyncio.run(create_app(app_name=app_name, app_path=str(tmp_path / 'apps'), **kwargs))
+	return result['app_path']
+
+
+def _update(monkeypatch, *app_paths: str, api_level: str = '1.1'):
+	from nawah_cli.cli import nawah_cli
+
+	monkeypatch.setattr(sys, 'argv', ['nawah', 'update', *app_paths, '--api-level', api_level])
+	nawah_cli()
+
+
+def _read(path: str) -> bytes:
+	with open(path, 'rb') as f:
+		return f.read()
+
+
+def _snapshot(path: str) -> Dict[str, int]:
+	return {
+		os.path.join(root, root_file): os.lstat(os.path.join(root, root_file)).st_mtime_ns
+		for root, _, root_files in os.walk(path)
+		for root_file in root_files
+	}
+
+
+@pytest.mark.parametrize('link_framework', [None, 'hardlink', 'symlink'])
+def test_update_app(artifacts_path, tmp_path, monkeypatch, caplog, link_framework):
+	'''Changed files are written, files removed from stubs are removed, and files changed in app are reported as conflicts, with apps sharing store left as they are'''
+	app_path = _create(tmp_path, app_name='app_one', link_framework=link_framework)
+	other_app_path = _create(tmp_path, app_name='app_two', link_framework=link_framework)
+	other_snapshot = {path: _read(path) for path in _snapshot(other_app_path)}
+	stubs_path = os.path.join(app_path, 'nawah')
+	if not link_framework == 'symlink':
+		# [DOC] Files of stubs dir not in stubs, such as bytecode, are never removed
+		os.makedirs(os.path.join(stubs_path, '__pycache__'))
+		with open(os.path.join(stubs_path, '__pycache__', 's9.cpython.pyc'), 'wb') as f:
+			f.write(b'')
+		with open(os.path.join(stubs_path, 'notes.txt'), 'w') as f:
+			f.write('notes')
+	module_path = os.path.join(app_path, 'packages', 'app_one')
+	with open(os.path.join(module_path, 'module_1.py'), 'w') as f:
+		f.write('y = \'app\'\n')
+
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		_update(monkeypatch, app_path)
+
+	assert not os.path.exists(os.path.join(app_path, 'framework-1.0.whl'))
+	assert _read(os.path.join(app_path, 'framework-1.1.whl')) == _read(
+		os.path.join(artifacts_path, '1.1', 'nawah.whl')
+	)
+	assert sorted(
+		os.path.relpath(os.path.join(root, root_file), stubs_path)
+		for root, _, root_files in os.walk(stubs_path)
+		for root_file in root_files
+	) == (
+		['s0.pyi', 's1.pyi', 'sub/s2.pyi']
+		if link_framework == 'symlink'
+		else ['__pycache__/s9.cpython.pyc', 'notes.txt', 's0.pyi', 's1.pyi', 'sub/s2.pyi']
+	)
+	assert _read(os.path.join(stubs_path, 's0.pyi')) == b'def f0() -> str: ...\n'
+	assert _read(os.path.join(module_path, 'module_0.py')) == b'x = \'1.1\'\n'
+	assert _read(os.path.join(module_path, 'module_1.py')) == b'y = \'app\'\n'
+	# [DOC] Files removed from template are left in app, as they could be used by it
+	assert _read(os.path.join(module_path, 'module_2.py')) == b'z = 2\n'
+	assert _read(os.path.join(module_path, 'module_3.py')) == b'w = 3\n'
+	assert (
+		'\'packages/app_one/module_1.py\' was changed in app, and in template. Update it yourself.'
+		in caplog.text
+	)
+	assert {path: _read(path) for path in _snapshot(other_app_path)} == other_snapshot
+
+	# [DOC] Updating app again writes nothing
+	snapshot = _snapshot(app_path)
+	caplog.clear()
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		_update(monkeypatch, app_path)
+	assert _snapshot(app_path) == snapshot
+	for artifact in ['framework', 'requirements', 'stubs', 'template']:
+		assert f'- {artifact}: 0 files to write, 0 to remove' in caplog.text
+
+
+def test_update_app_compiled(artifacts_path, tmp_path, monkeypatch):
+	'''Compiled apps are compiled again with same invalidation mode, with framework unpacked from wheel replaced'''
+	app_path = _create(tmp_path, app_name='app_one', compile=True, invalidation_mode='unchecked-hash')
+	assert os.path.exists(os.path.join(app_path, 'framework-1.0', '.wheel'))
+
+	_update(monkeypatch, app_path)
+	assert not os.path.exists(os.path.join(app_path, 'framework-1.0'))
+	framework_path = os.path.join(app_path, 'framework-1.1', 'nawah', 'm40.py')
+	module_path = os.path.join(app_path, 'packages', 'app_one', 'module_0.py')
+	for py_path in [framework_path, module_path]:
+		with open(importlib.util.cache_from_source(py_path), 'rb') as pyc_file:
+			# [DOC] Unchecked hash-based bytecode
+			assert int.from_bytes(pyc_file.read(8)[4:8], 'little') == 1
+	with open(importlib.util.cache_from_source(module_path), 'rb') as pyc_file:
+		assert b'1.1' in pyc_file.read()
+
+	snapshot = _snapshot(app_path)
+	_update(monkeypatch, app_path)
+	assert _snapshot(app_path) == snapshot
+
+
+def test_update_app_template(artifacts_path, tmp_path, monkeypatch, caplog):
+	'''Template files of apps of specified 'template' are not updated from template of API Level'''
+	template_path = str(tmp_path / 'template')
+	for rel_path, content in _template_files('custom').items():
+		os.makedirs(os.path.dirname(os.path.join(template_path, rel_path)), exist_ok=True)
+		with open(os.path.join(template_path, rel_path), 'wb') as f:
+			f.write(content)
+	app_path = _create(tmp_path, app_name='app_one', template=template_path)
+
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		_update(monkeypatch, app_path)
+	assert (
+		f'App was created with specified \'template\' \'{os.path.realpath(template_path)}\', so its template files are not updated. Skipping.'
+		in caplog.text
+	)
+	module_path = os.path.join(app_path, 'packages', 'app_one')
+	assert _read(os.path.join(module_path, 'module_0.py')) == b'x = \'custom\'\n'
+	assert not os.path.exists(os.path.join(module_path, 'module_3.py'))
+	assert _read(os.path.join(app_path, 'nawah', 's0.pyi')) == b'def f0() -> str: ...\n'
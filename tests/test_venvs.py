@@ -0,0 +1,57 @@
+import os, time, threading
+
+import pytest
+
+from nawah_cli.venvs import VENV_MAX_AGE, _venv_lock, venvs_dir, prune_venvs, clone_venv
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='Locks are only supported on POSIX')
+
+
+def _make_golden(key: str, *, age: int = 0) -> str:
+	golden_path = os.path.join(venvs_dir(), key)
+	os.makedirs(os.path.join(golden_path, 'bin'))
+	with open(os.path.join(golden_path, 'pyvenv.cfg'), 'w') as f:
+		f.write(f'home = {golden_path}\n')
+	os.utime(golden_path, (time.time() - age, time.time() - age))
+	return golden_path
+
+
+def test_prune_venvs(cache_path):
+	old_path = _make_golden('old', age=VENV_MAX_AGE + 60)
+	new_path = _make_golden('new')
+	prune_venvs(keep='other')
+	assert not os.path.exists(old_path)
+	assert os.path.exists(new_path)
+
+
+def test_prune_venvs_busy(cache_path):
+	'''Golden venvs being cloned are never pruned'''
+	golden_path = _make_golden('busy', age=VENV_MAX_AGE + 60)
+	locked, release = threading.Event(), threading.Event()
+
+	def clone():
+		with _venv_lock('busy', shared=True):
+			locked.set()
+			release.wait()
+
+	thread = threading.Thread(target=clone)
+	thread.start()
+	locked.wait()
+	try:
+		prune_venvs(keep='other')
+		assert os.path.exists(golden_path)
+	finally:
+		release.set()
+		thread.join()
+	prune_venvs(keep='other')
+	assert not os.path.exists(golden_path)
+
+
+def test_clone_venv_marks_used(cache_path, tmp_path):
+	golden_path = _make_golden('used', age=VENV_MAX_AGE + 60)
+	stats = clone_venv(golden_path=golden_path, venv_path=str(tmp_path / 'app' / '.venv'))
+	assert stats['files'] == 1
+	with open(tmp_path / 'app' / '.venv' / 'pyvenv.cfg', 'r') as f:
+		assert str(tmp_path / 'app' / '.venv') in f.read()
+	prune_venvs(keep='other')
+	assert os.path.exists(golden_path)
@@ -0,0 +1,124 @@
+from typing import Callable, Dict, List
+
+import os, sys, time, types, logging
+
+from nawah_cli import watch
+
+TEMPLATE_FILES = {
+	'nawah_app.py': 'config = APP_CONFIG(name=\'__PROJECT_NAME__\', admin_password=\'__ADMIN_PASSWORD__\')\n',
+	'.gitignore': '__pycache__/\nPROJECT_NAME.log\n',
+	'packages/PROJECT_NAME/__init__.py': '',
+	'packages/PROJECT_NAME/module.py': 'x = 1\n',
+}
+
+
+def _write(path: str, content: str):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, 'w') as f:
+		f.write(content)
+
+
+def _app_files(app_path: str) -> Dict[str, str]:
+	'''Returns content of template-owned files of app, leaving out framework, stubs, and files written by 'create' itself'''
+	app_files = {}
+	for root, dirs, root_files in os.walk(app_path):
+		dirs[:] = [root_dir for root_dir in dirs if root_dir not in ['.git', 'nawah']]
+		for root_file in root_files:
+			rel_path = os.path.relpath(os.path.join(root, root_file), app_path)
+			if rel_path in ['LICENSE', 'README.md', 'requirements.txt', '.nawah_template_source']:
+				continue
+			if rel_path.startswith('framework-'):
+				continue
+			with open(os.path.join(root, root_file), 'r') as f:
+				app_files[rel_path] = f.read()
+	return app_files
+
+
+def _watch(monkeypatch, *, template_path: str, apps_path: str, changes: List[Callable[[], None]]) -> List[Dict[str, str]]:
+	'''Creates app_one with 'watch' CLI Arg, making changes to template one per scan, and returns files of app before every change, and once last change is synced'''
+	from nawah_cli.cli import nawah_cli
+
+	app_states = []
+	pending_changes = iter(changes)
+
+	def sleep(seconds: float):
+		app_states.append(_app_files(os.path.join(apps_path, 'app_one')))
+		try:
+			change = next(pending_changes)
+		except StopIteration:
+			raise KeyboardInterrupt
+		change()
+
+	# [DOC] Only time of watch is faked, as downloads of 'create' sleep between retries
+	monkeypatch.setattr(
+		watch, 'time', types.SimpleNamespace(sleep=sleep, perf_counter=time.perf_counter)
+	)
+	monkeypatch.setattr(
+		sys,
+		'argv',
+		['nawah', 'create', 'app_one', apps_path, '--default-config', '--template', template_path, '--watch'],
+	)
+	nawah_cli()
+	return app_states
+
+
+def test_watch_template(artifacts_server, tmp_path, monkeypatch, caplog):
+	'''Files added, modified, and deleted from template are synced to app, rendered, and renamed as when created'''
+	template_path = str(tmp_path / 'template')
+	for rel_path, content in TEMPLATE_FILES.items():
+		_write(os.path.join(template_path, rel_path), content)
+	apps_path = str(tmp_path / 'apps')
+
+	def add_files():
+		_write(os.path.join(template_path, 'packages', 'PROJECT_NAME', 'module.py'), 'x = 100\n')
+		_write(os.path.join(template_path, 'packages', 'PROJECT_NAME', 'new.py'), 'y = 1\n')
+		_write(os.path.join(template_path, 'docs', 'index.md'), '# Docs\n')
+
+	def delete_files():
+		os.remove(os.path.join(template_path, 'packages', 'PROJECT_NAME', 'new.py'))
+		os.remove(os.path.join(template_path, 'docs', 'index.md'))
+
+	def modify_rendered():
+		_write(
+			os.path.join(template_path, 'nawah_app.py'),
+			'config = APP_CONFIG(name=\'__PROJECT_NAME__\', debug=True, admin_password=\'__ADMIN_PASSWORD__\')\n',
+		)
+
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		app_states = _watch(
+			monkeypatch,
+			template_path=template_path,
+			apps_path=apps_path,
+			changes=[add_files, delete_files, modify_rendered, lambda: None],
+		)
+	assert len(app_states) == 5
+	created, added, deleted, modified, unchanged = app_states
+	assert sorted(created) == ['.gitignore', 'nawah_app.py', 'packages/app_one/__init__.py', 'packages/app_one/module.py']
+	assert 'name=\'app_one\'' in created['nawah_app.py']
+	admin_password = created['nawah_app.py'].split('admin_password=\'')[1].split('\'')[0]
+
+	assert added == {
+		**created,
+		'packages/app_one/module.py': 'x = 100\n',
+		'packages/app_one/new.py': 'y = 1\n',
+		'docs/index.md': '# Docs\n',
+	}
+	assert deleted == {**created, 'packages/app_one/module.py': 'x = 100\n'}
+	# [DOC] Dirs emptied by deleting files are removed
+	assert not os.path.exists(os.path.join(apps_path, 'app_one', 'docs'))
+	assert modified['nawah_app.py'] == (
+		f'config = APP_CONFIG(name=\'app_one\', debug=True, admin_password=\'{admin_password}\')\n'
+	)
+	assert unchanged == modified
+	assert 'Synced template changes, with 3 files written, and 0 removed' in caplog.text
+	assert 'Synced template changes, with 0 files written, and 2 removed' in caplog.text
+	assert 'Stopped watching template.' in caplog.text
+
+	# [DOC] Apps created already are synced with template changed while not watching, with same config
+	_write(os.path.join(template_path, 'packages', 'PROJECT_NAME', 'module.py'), 'x = 1000\n')
+	caplog.clear()
+	with caplog.at_level(logging.INFO, logger='nawah'):
+		app_states = _watch(monkeypatch, template_path=template_path, apps_path=apps_path, changes=[])
+	assert app_states == [{**modified, 'packages/app_one/module.py': 'x = 1000\n'}]
+	assert 'App synced with template, with 1 files written' in caplog.text
+	assert 'Congrats!' not in caplog.text
@@ -0,0 +1,120 @@
+import os, subprocess
+
+import pytest
+
+from nawah_cli.wheelhouse import (
+	PipError,
+	install_requirements,
+	read_requirements,
+	requirements_fingerprint,
+	requirements_satisfied,
+	wheelhouse_dir,
+)
+
+
+class PipCalls(list):
+	failing: list
+
+
+@pytest.fixture
+def pip_calls(monkeypatch) -> PipCalls:
+	'''Records pip calls, with args after 'pip', instead of running them. 'pip download' writes one file to its dest. Calls with args in failing fail'''
+	calls = PipCalls()
+	calls.failing = []
+
+	def call(command, **kwargs):
+		pip_args = command[3:]
+		calls.append(pip_args)
+		if any(failing_args == pip_args[: len(failing_args)] for failing_args in calls.failing):
+			return 1
+		if pip_args[0] == 'download':
+			dest = pip_args[pip_args.index('--dest') + 1]
+			with open(os.path.join(dest, f'{pip_args[-1]}-1.0-py3-none-any.whl'), 'w'):
+				pass
+		return 0
+
+	monkeypatch.setattr(subprocess, 'call', call)
+	return calls
+
+
+@pytest.fixture
+def req_path(tmp_path) -> str:
+	return str(tmp_path / 'requirements.txt')
+
+
+def _write_requirements(req_path: str, content: str):
+	with open(req_path, 'w') as req_file:
+		req_file.write(content)
+
+
+def test_read_requirements(req_path):
+	_write_requirements(req_path, '# Requirements\npytest  # tests\n\nsetuptools>=40\n')
+	assert read_requirements(req_path=req_path) == ['pytest', 'setuptools>=40']
+
+
+def test_requirements_fingerprint():
+	assert requirements_fingerprint(requirements=['a', 'b']) == requirements_fingerprint(
+		requirements=['b', 'a']
+	)
+	assert requirements_fingerprint(requirements=['a', 'b']) != requirements_fingerprint(
+		requirements=['a', 'b==1.0']
+	)
+
+
+def test_requirements_satisfied():
+	assert requirements_satisfied(requirements=['pytest'])
+	assert requirements_satisfied(requirements=[f'pytest=={pytest.__version__}'])
+	assert not requirements_satisfied(requirements=['pytest==0.0.1'])
+	assert not requirements_satisfied(requirements=['nawah-not-installed'])
+	assert not requirements_satisfied(requirements=['pytest>=1.0'])
+
+
+def test_install_requirements(req_path, pip_calls):
+	'''Requirements are installed from wheelhouse once, then skipped while fingerprint is unchanged'''
+	_write_requirements(req_path, 'pytest\n')
+	install_requirements(req_path=req_path)
+	assert [call[0] for call in pip_calls] == ['download', 'install']
+	assert pip_calls[1][-5:] == ['--no-index', '--find-links', wheelhouse_dir(), '-r', req_path]
+	assert sorted(os.listdir(wheelhouse_dir())) == ['.tmp', 'pytest-1.0-py3-none-any.whl']
+
+	pip_calls.clear()
+	_write_requirements(req_path, '# Same requirements\npytest\n')
+	install_requirements(req_path=req_path)
+	assert pip_calls == []
+
+
+def test_install_requirements_changed(req_path, pip_calls):
+	'''Changed requirements are prefetched to wheelhouse, and installed from it again'''
+	_write_requirements(req_path, 'pytest\n')
+	install_requirements(req_path=req_path)
+
+	pip_calls.clear()
+	_write_requirements(req_path, 'pytest\nsetuptools\n')
+	install_requirements(req_path=req_path)
+	assert sorted(call[-1] for call in pip_calls if call[0] == 'download') == ['pytest', 'setuptools']
+	assert [call for call in pip_calls if call[0] == 'install'] == [
+		['install', '--user', '--no-index', '--find-links', wheelhouse_dir(), '-r', req_path]
+	]
+
+
+def test_install_requirements_not_satisfied(req_path, pip_calls):
+	'''Requirements installed earlier, but no longer satisfied, are installed again from wheelhouse, with no prefetch'''
+	_write_requirements(req_path, 'nawah-not-installed\n')
+	install_requirements(req_path=req_path)
+
+	pip_calls.clear()
+	install_requirements(req_path=req_path)
+	assert [call[0] for call in pip_calls] == ['install']
+	assert '--no-index' in pip_calls[0]
+
+
+def test_install_requirements_wheelhouse_failed(req_path, pip_calls):
+	'''Requirements that fail to install from wheelhouse are installed from index'''
+	_write_requirements(req_path, 'pytest\n')
+	pip_calls.failing.append(['install', '--user', '--no-index'])
+	install_requirements(req_path=req_path)
+	assert pip_calls[-1] == ['install', '--user', '-r', req_path]
+
+	pip_calls.failing.append(['install', '--user', '-r'])
+	with pytest.raises(PipError):
+		install_requirements(req_path=req_path, use_cache=False)